@@ -0,0 +1,42 @@
+"""Frames per second and grab latency for each available capture backend"""
+
+import argparse
+import statistics
+import time
+
+from src.tools.capture import BACKENDS
+
+def measure(backend, frames: int) -> tuple[float, float, float]:
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(frames):
+        begin = time.perf_counter()
+        backend.grab()
+        latencies.append(time.perf_counter() - begin)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p95 = latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)]
+    return frames / elapsed, statistics.median(latencies) * 1000, p95 * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--frames", type=int, default=50)
+    parser.add_argument("--backends", nargs="*", default=list(BACKENDS))
+    args = parser.parse_args()
+
+    for name in args.backends:
+        try:
+            backend = BACKENDS[name]()
+        except Exception as e:  # pyautogui fails on import without a display
+            print(f"{name:>10}: unavailable ({e})")
+            continue
+        try:
+            backend.grab()  # Warm up
+            fps, p50, p95 = measure(backend, args.frames)
+            print(f"{name:>10}: {fps:.1f} fps, p50 {p50:.1f} ms, p95 {p95:.1f} ms")
+        finally:
+            backend.close()
+
+if __name__ == "__main__":
+    main()
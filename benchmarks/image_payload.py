@@ -0,0 +1,80 @@
+"""Peak memory and CPU per session: base64 strings against image payloads"""
+
+import argparse
+import base64
+import random
+import tempfile
+import time
+import tracemalloc
+from io import BytesIO
+from pathlib import Path
+
+from PIL import Image
+
+from src.utils.imaging import ImagePayload
+
+def screen(seed: int, size: tuple[int, int]) -> Image.Image:
+    """Noisy screen so PNG compression stays realistic"""
+    rng = random.Random(seed)
+    image = Image.new("RGB", size, "white")
+    for _ in range(400):
+        x, y = rng.randrange(size[0]), rng.randrange(size[1])
+        image.paste(
+            (rng.randrange(256), rng.randrange(256), rng.randrange(256)),
+            (x, y, x + rng.randrange(8, 120), y + rng.randrange(8, 40)),
+        )
+    return image
+
+def strings_session(frames: list[Image.Image], tmp: Path, renders: int) -> list:
+    """Old path: disk round trip, base64 in history, decode on every render"""
+    history = []
+    for index, frame in enumerate(frames):
+        path = tmp / f"screenshot_{index}.png"
+        frame.save(path)
+        history.append({"image": base64.b64encode(path.read_bytes()).decode()})
+
+        # Request body and UI re-render of the whole history each turn
+        request = [dict(message) for message in history]
+        for _ in range(renders):
+            for message in history:
+                Image.open(BytesIO(base64.b64decode(message["image"]))).load()
+    return request
+
+def payload_session(frames: list[Image.Image], tmp: Path, renders: int) -> list:
+    """New path: encode in memory once, base64 cached at the API boundary"""
+    history = []
+    for frame in frames:
+        history.append({"image": ImagePayload.from_image(frame)})
+
+        request = [{"image": message["image"].base64} for message in history]
+        for _ in range(renders):
+            for message in history:
+                # Streamlit receives the encoded bytes without a decode
+                message["image"].data
+    return request
+
+def measure(session, frames, tmp, renders) -> tuple[float, float]:
+    tracemalloc.start()
+    start = time.process_time()
+    session(frames, tmp, renders)
+    cpu = time.process_time() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return cpu, peak / 2**20
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--frames", type=int, default=20)
+    parser.add_argument("--renders", type=int, default=1)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=800)
+    args = parser.parse_args()
+
+    frames = [screen(seed, (args.width, args.height)) for seed in range(args.frames)]
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, session in (("strings", strings_session), ("payload", payload_session)):
+            cpu, peak = measure(session, frames, Path(tmp), args.renders)
+            print(f"{name:>8}: {cpu:.2f}s CPU, {peak:.1f} MiB peak")
+
+if __name__ == "__main__":
+    main()
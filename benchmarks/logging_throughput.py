@@ -0,0 +1,86 @@
+"""Logging throughput and event loop stall from many concurrent sessions"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from src.utils.logging import JsonFormatter, log_context, setup_logging, shutdown_logging
+
+async def session(logger: logging.Logger, number: int, records: int):
+    with log_context(session=f"session-{number}", device="mac"):
+        for step in range(records):
+            with log_context(step=step):
+                logger.info("Executed action %s", step)
+            if step % 50 == 0:
+                await asyncio.sleep(0)
+
+async def stall_monitor(stop: asyncio.Event, interval: float = 0.001) -> float:
+    """Longest gap between loop ticks"""
+    worst = 0.0
+    last = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(interval)
+        now = time.perf_counter()
+        worst = max(worst, now - last - interval)
+        last = now
+    return worst
+
+async def run(logger: logging.Logger, sessions: int, records: int) -> tuple[float, float]:
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(stall_monitor(stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(session(logger, n, records) for n in range(sessions)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    return elapsed, await monitor
+
+def direct_logger(path: Path) -> logging.Logger:
+    """Synchronous file logging, as before the queue handler"""
+    logger = logging.getLogger("benchmark-direct")
+    logger.propagate = False
+    handler = logging.FileHandler(path)
+    handler.setFormatter(JsonFormatter())
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    return logger
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--records", type=int, default=2000)
+    args = parser.parse_args()
+    total = args.sessions * args.records
+
+    with tempfile.TemporaryDirectory() as tmp, open(os.devnull, "w") as devnull:
+        # Console output goes nowhere so only the file write cost is measured
+        sys.stdout = devnull
+        try:
+            queued = setup_logging(Path(tmp) / "queued.log")
+            results = []
+            for name, logger in (
+                ("direct", direct_logger(Path(tmp) / "direct.log")),
+                ("queued", queued),
+            ):
+                results.append((name, *asyncio.run(run(logger, args.sessions, args.records))))
+
+            start = time.perf_counter()
+            dropped = queued.handlers[0].dropped
+            shutdown_logging()
+            drain = time.perf_counter() - start
+        finally:
+            sys.stdout = sys.__stdout__
+
+    for name, elapsed, stall in results:
+        print(
+            f"{name:>6}: {total / elapsed:,.0f} records/s, "
+            f"worst loop stall {stall * 1000:.1f} ms"
+        )
+    print(f"queued: drained in {drain:.2f}s after the run, {dropped} records dropped")
+
+if __name__ == "__main__":
+    main()
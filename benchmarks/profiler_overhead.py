@@ -0,0 +1,86 @@
+"""Slowdown of a mixed event loop and worker thread load under the sampling profiler"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from io import BytesIO
+from typing import Optional
+
+import numpy as np
+from PIL import Image
+
+from src.utils.logging import log_context
+from src.utils.profiler import SamplingProfiler
+
+def encode_screenshot(pixels: np.ndarray) -> int:
+    """Device side work, run in a worker thread like a real capture"""
+    buffer = BytesIO()
+    Image.fromarray(pixels).save(buffer, format="PNG", compress_level=1)
+    return buffer.tell()
+
+def parse_events(count: int) -> int:
+    """Loop side work, like decoding streamed model events"""
+    total = 0
+    for index in range(count):
+        event = json.loads(json.dumps({"type": "delta", "index": index, "text": "x" * 40}))
+        total += len(event["text"])
+    return total
+
+async def session(number: int, steps: int, pixels: np.ndarray):
+    with log_context(session=f"session-{number}"):
+        for step in range(steps):
+            with log_context(step=step):
+                parse_events(300)
+                await asyncio.to_thread(encode_screenshot, pixels)
+
+async def workload(sessions: int, steps: int) -> float:
+    pixels = np.random.default_rng(0).integers(0, 255, (200, 320, 3), dtype=np.uint8)
+    start = time.perf_counter()
+    await asyncio.gather(*(session(n, steps, pixels) for n in range(sessions)))
+    return time.perf_counter() - start
+
+def measure(sessions: int, steps: int, interval: Optional[float]) -> tuple[float, float]:
+    """Wall time of one run, and the profiler's own share of a core"""
+    profiler = None
+    if interval is not None:
+        profiler = SamplingProfiler(interval=interval)
+        profiler.enable()
+    try:
+        elapsed = asyncio.run(workload(sessions, steps))
+        busy = profiler.overhead if profiler else 0.0
+    finally:
+        if profiler:
+            profiler.disable()
+    return elapsed, busy
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--steps", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=7)
+    args = parser.parse_args()
+
+    intervals = [None, 0.01, 0.005, 0.001]
+    times: dict[Optional[float], list[float]] = {interval: [] for interval in intervals}
+    busy: dict[Optional[float], list[float]] = {interval: [] for interval in intervals}
+    # Interleaved so drift in machine load hits every setting alike
+    for _ in range(args.rounds):
+        for interval in intervals:
+            elapsed, share = measure(args.sessions, args.steps, interval)
+            times[interval].append(elapsed)
+            busy[interval].append(share)
+
+    baseline = statistics.median(times[None])
+    print(f"   off: {baseline:.3f}s")
+    for interval in intervals[1:]:
+        elapsed = statistics.median(times[interval])
+        print(
+            f"{interval * 1000:4.0f}ms: {elapsed:.3f}s, "
+            f"{(elapsed / baseline - 1) * 100:+.1f}% wall time, "
+            f"sampling used {statistics.median(busy[interval]) * 100:.1f}% of a core"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,32 @@
 """Anthropic API integration"""
 
 import asyncio
+import json
 from datetime import datetime
 from typing import Any, Callable, Optional
+from uuid import uuid4
 
-from anthropic import Anthropic, AnthropicBedrock, AnthropicVertex
-from anthropic.types import (
-    MessageParam,
-    MessageStreamEvent,
-)
+from anthropic.types import MessageParam
 
-from ..config import CONFIG, PROVIDER_TO_MODEL, APIProvider
-from ..tools import ToolCollection, ToolResult
+from ..config import CACHE_DIR, CONFIG, SESSIONS_DIR
+from ..tools.base import ToolResult
+from ..tools.capture_policy import CapturePolicy
+from ..tools.collection import ToolCollection
+from ..tools.scheduler import release_focus
+from ..tools.trajectory import Trajectory, TrajectoryCache
+from ..utils.deadline import Deadline, DeadlineExceeded, current_deadline, use_deadline
+from ..utils.imaging import ImagePayload, screen_fingerprint
+from ..utils.logging import log_context
+from .context import ContextManager, TokenBudget, text_tokens
+from .journal import SessionJournal
+from .ratelimit import (
+    AdmissionController,
+    Priority,
+    RequestCost,
+    get_admission_controller,
+)
+from .router import ProviderRouter, get_router
+from .tool_stream import ToolCall
 
 SYSTEM_PROMPT = f"""You are an AI assistant with the ability to control Mac and iOS devices.
 
@@ -29,6 +44,16 @@ Guidelines:
 5. Chain multiple actions when efficient
 """
 
+# Upper bound for one streamed request when the task has no deadline
+REQUEST_TIMEOUT = 600.0
+
+def serialize_message(message: dict) -> dict:
+    """Message as sent to the API, with image payloads as base64 text"""
+    content = message["content"]
+    if isinstance(content, dict) and isinstance(content.get("image"), ImagePayload):
+        return {**message, "content": {**content, "image": content["image"].base64}}
+    return message
+
 class AnthropicClient:
     """Client for Anthropic API interaction"""
 
@@ -37,68 +62,286 @@ class AnthropicClient:
         tools: ToolCollection,
         on_content: Optional[Callable[[str], None]] = None,
         on_tool_result: Optional[Callable[[ToolResult], None]] = None,
+        trajectories: Optional[TrajectoryCache] = None,
+        router: Optional[ProviderRouter] = None,
+        session_id: Optional[str] = None,
+        priority: Priority = Priority.INTERACTIVE,
+        admission: Optional[AdmissionController] = None,
+        journal: Optional[SessionJournal] = None,
+        journaled: bool = True,
     ):
         self.tools = tools
         self.on_content = on_content
         self.on_tool_result = on_tool_result
         self.messages: list[MessageParam] = []
-        
-        # Initialize client based on provider
-        provider = CONFIG["api_provider"]
-        if provider == APIProvider.ANTHROPIC:
-            self.client = Anthropic(api_key=CONFIG["api_key"])
-        elif provider == APIProvider.BEDROCK:
-            self.client = AnthropicBedrock()
-        elif provider == APIProvider.VERTEX:
-            self.client = AnthropicVertex()
-        else:
-            raise ValueError(f"Invalid API provider: {provider}")
-
-    async def send_message(self, message: str) -> None:
+        self.context = ContextManager(
+            overhead_tokens=(
+                text_tokens(SYSTEM_PROMPT)
+                + text_tokens(json.dumps(self.tools.to_params()))
+            )
+        )
+
+        if trajectories is None and CONFIG["trajectory_cache"]:
+            trajectories = TrajectoryCache(CACHE_DIR / "trajectories.json")
+        self.trajectories = trajectories
+
+        # Route requests across every configured provider, sharing latency
+        # statistics with every other session and connections with its loop
+        self.router = router or get_router()
+
+        # Share rate limits with every other session in the process
+        self.session_id = session_id or uuid4().hex
+        self.priority = priority
+        self.admission = admission or get_admission_controller()
+        if router is not None:
+            self.router.on_headers = self.admission.update_from_headers
+        self.tools.bind(self.session_id, priority)
+
+        # Persist the session, resuming from an existing journal
+        if journal is None and journaled and CONFIG["session_journal"]:
+            journal = SessionJournal.open(SESSIONS_DIR, self.session_id)
+        self.journal = journal
+        if journal is not None:
+            self.messages = journal.load(CONFIG["journal_window"])
+
+    def close(self):
+        """Release the journal; the session can be resumed by id later"""
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+    def set_turn_budget(
+        self,
+        max_output_tokens: int,
+        max_input_tokens: Optional[int] = None,
+    ) -> None:
+        """Limit tokens per turn, trading quality for latency"""
+        self.context.budget = TokenBudget(max_output_tokens, max_input_tokens)
+
+    async def send_message(
+        self,
+        message: str,
+        capture: Optional[CapturePolicy] = None,
+        deadline: Optional[Deadline] = None,
+    ) -> None:
         """Send message to Claude and handle response"""
-        self.messages.append({"role": "user", "content": message})
-
-        # Stream response from Claude
-        stream = await self.client.messages.create(
-            model=PROVIDER_TO_MODEL[CONFIG["api_provider"]],
-            max_tokens=4096,
-            messages=self.messages,
-            system=SYSTEM_PROMPT,
-            tools=self.tools.to_params(),
-            stream=True,
+        if deadline is None:
+            deadline = Deadline.after(CONFIG["task_timeout"])
+
+        # Capture policy applies to this task only
+        if capture is not None:
+            self.tools.set_capture_policy(capture)
+        try:
+            # Every API call and device action below sizes its timeouts from this
+            with use_deadline(deadline), log_context(session=self.session_id):
+                async with deadline.scope():
+                    await self._run_task(message)
+        except DeadlineExceeded:
+            self._append({
+                "role": "assistant",
+                "content": "Stopped: task deadline exceeded"
+            })
+            raise
+        finally:
+            release_focus(self.session_id)
+            if capture is not None:
+                self.tools.set_capture_policy(CapturePolicy.from_config())
+
+    async def _run_task(self, message: str) -> None:
+        """Run a task, replaying a cached trajectory when one matches"""
+        self._append({"role": "user", "content": message})
+
+        if not self.trajectories:
+            await self._stream_response()
+            return
+
+        match = await self._find_trajectory(message)
+        recorder = self.tools.start_recording()
+        try:
+            if match:
+                trajectory, screenshot = match
+                recorder.set_start(trajectory.tool, screenshot)
+                if await self._replay(message, trajectory):
+                    return
+            else:
+                self.trajectories.record_lookup(message, None)
+
+            await self._stream_response()
+        finally:
+            self.tools.stop_recording()
+
+        # A task cut short by its deadline did not finish, even if nothing raised
+        if not current_deadline().expired:
+            self.trajectories.store(message, recorder)
+
+    async def _find_trajectory(
+        self,
+        message: str,
+    ) -> Optional[tuple[Trajectory, ToolResult]]:
+        """Match the current screen against cached trajectories for a task"""
+        for tool in {t.tool for t in self.trajectories.candidates(message)}:
+            screenshot = await self.tools.run(
+                name=tool,
+                tool_input={"action": "screenshot"}
+            )
+            if not screenshot.image:
+                continue
+
+            fingerprint = screen_fingerprint(screenshot.image)
+            if trajectory := self.trajectories.lookup(message, tool, fingerprint):
+                return trajectory, screenshot
+
+        return None
+
+    async def _replay(self, message: str, trajectory: Trajectory) -> bool:
+        """Replay a cached trajectory, returning True if the task completed"""
+        replay = await self.trajectories.replay(trajectory, self.tools)
+        self.trajectories.record_lookup(message, replay)
+
+        for result in replay.results:
+            self._add_tool_result(result)
+
+        if replay.completed:
+            self._append({
+                "role": "assistant",
+                "content": (
+                    f"Completed from cached trajectory ({replay.steps_replayed} "
+                    f"steps, {replay.time_saved:.1f}s saved)"
+                )
+            })
+            return True
+
+        # Hand control back to the model from the divergent screen
+        self._append({
+            "role": "user",
+            "content": (
+                f"{replay.steps_replayed} cached steps were replayed, but the "
+                f"screen diverged at step {replay.diverged_at + 1}. Continue "
+                "the task from the current screen."
+            )
+        })
+        return False
+
+    async def _stream_response(self) -> None:
+        """Stream a response from Claude and execute tool calls"""
+        if self.context.needs_compaction(self.messages):
+            self.messages = self.context.compact(self.messages)
+            if self.journal:
+                self.journal.write_checkpoint(self.messages)
+
+        # Tool results are appended while streaming, so remember what was sent
+        sent = len(self.messages)
+        ticket = await self.admission.acquire(
+            self.session_id,
+            RequestCost(
+                input_tokens=self.context.estimate(self.messages),
+                output_tokens=self.context.budget.max_output_tokens,
+            ),
+            self.priority,
         )
 
         current_text = ""
-        async for event in stream:
-            if isinstance(event, MessageStreamEvent):
-                if event.type == "content_block_delta":
+        input_tokens = output_tokens = 0
+        calls: dict[int, ToolCall] = {}
+        try:
+            stream = self.router.stream(
+                max_tokens=self.context.budget.max_output_tokens,
+                messages=[serialize_message(message) for message in self.messages],
+                system=SYSTEM_PROMPT,
+                tools=self.tools.to_params(),
+                timeout=current_deadline().timeout(cap=REQUEST_TIMEOUT),
+            )
+            async for event in stream:
+                if event.type == "message_start":
+                    input_tokens = event.message.usage.input_tokens
+
+                elif event.type == "message_delta":
+                    output_tokens = event.usage.output_tokens
+
+                elif event.type == "content_block_start" and event.content_block.type == "tool_use":
+                    calls[event.index] = ToolCall(event.content_block.id, event.content_block.name)
+
+                elif event.type == "content_block_delta" and event.delta.type == "text_delta":
                     current_text += event.delta.text
                     if self.on_content:
                         self.on_content(current_text)
-                        
-                elif event.type == "tool_use":
-                    # Execute tool
-                    result = await self.tools.run(
-                        name=event.tool_name,
-                        tool_input=event.parameters
-                    )
-                    
-                    if self.on_tool_result:
-                        self.on_tool_result(result)
-
-                    # Add tool result to messages
-                    self.messages.append({
-                        "role": "tool",
-                        "content": {
-                            "output": result.output,
-                            "error": result.error,
-                            "image": result.base64_image
-                        }
-                    })
+
+                elif event.type == "content_block_delta" and event.delta.type == "input_json_delta":
+                    if call := calls.get(event.index):
+                        call.input.feed(event.delta.partial_json)
+                        self._speculate(call)
+
+                elif event.type == "content_block_stop" and event.index in calls:
+                    await self._run_tool_call(calls.pop(event.index))
+        finally:
+            # Failed requests settle too, with what was billed or nothing,
+            # or their reservation would hold the shared budget forever
+            self.admission.settle(ticket, input_tokens, output_tokens)
+            # Calls cut off mid-stream never run, so undo what they prepared
+            for call in calls.values():
+                await self._abandon(call)
+
+        if input_tokens:
+            self.context.record_usage(self.messages[:sent], input_tokens, output_tokens)
 
         # Add final response to message history
         if current_text:
-            self.messages.append({
+            self._append({
                 "role": "assistant",
                 "content": current_text
-            }) 
\ No newline at end of file
+            })
+
+    def _speculate(self, call: ToolCall) -> None:
+        """Start preparing a tool call from the input members seen so far"""
+        if call.preparing and not (call.preparing.done() and call.preparing.result() is None):
+            return
+
+        # Retry a declined preparation only once more of the input has arrived
+        members = call.input.members()
+        if members and frozenset(members) != call.prepared_keys:
+            call.prepared_keys = frozenset(members)
+            call.preparing = asyncio.create_task(self.tools.prepare(call.name, dict(members)))
+
+    async def _run_tool_call(self, call: ToolCall) -> None:
+        """Execute a tool call whose input block has closed"""
+        preparation = await call.preparing if call.preparing else None
+        try:
+            tool_input = call.input.result()
+        except ValueError as e:
+            if preparation:
+                await self.tools.rollback(call.name, preparation)
+            self._add_tool_result(ToolResult(error=f"Invalid tool input: {str(e)}"))
+            return
+
+        result = await self.tools.run(
+            name=call.name,
+            tool_input=tool_input,
+            preparation=preparation,
+        )
+        self._add_tool_result(result)
+
+    async def _abandon(self, call: ToolCall) -> None:
+        if not call.preparing:
+            return
+        preparation = await call.preparing
+        if preparation:
+            await self.tools.rollback(call.name, preparation)
+
+    def _append(self, message: dict) -> None:
+        self.messages.append(message)
+        if self.journal:
+            self.journal.append(message)
+
+    def _add_tool_result(self, result: ToolResult) -> None:
+        """Report a tool result and add it to message history"""
+        if self.on_tool_result:
+            self.on_tool_result(result)
+
+        self._append({
+            "role": "tool",
+            "content": {
+                "output": result.output,
+                "error": result.error,
+                "image": result.image
+            }
+        })
@@ -0,0 +1,211 @@
+"""Context window accounting and history compaction"""
+
+from dataclasses import dataclass
+from typing import Any, Optional, Union
+
+from ..config import CONFIG
+from ..utils.imaging import ImagePayload
+
+# Rough text density for Claude tokenization
+CHARS_PER_TOKEN = 4
+# Images are billed at about width * height / 750, capped by API downscaling
+IMAGE_TOKEN_DIVISOR = 750
+MAX_IMAGE_TOKENS = 1600
+SUMMARY_PREFIX = "Summary of earlier turns:"
+
+@dataclass
+class MessageTokens:
+    """Token accounting for a single message"""
+    estimated: int
+    actual: Optional[int] = None
+
+@dataclass
+class TokenBudget:
+    """Per-turn token limits"""
+    max_output_tokens: int
+    max_input_tokens: Optional[int] = None
+
+def image_tokens(image: Union[ImagePayload, str]) -> int:
+    """Estimate tokens for an image, or base64 text, from its dimensions"""
+    try:
+        if isinstance(image, str):
+            image = ImagePayload.from_base64(image)
+        # Only the header is parsed to read the size
+        width, height = image.open().size
+    except Exception:
+        return MAX_IMAGE_TOKENS
+    return min(width * height // IMAGE_TOKEN_DIVISOR, MAX_IMAGE_TOKENS)
+
+def text_tokens(text: str) -> int:
+    """Estimate tokens for text"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def content_tokens(content: Any) -> int:
+    """Estimate tokens for message content of any supported shape"""
+    if content is None:
+        return 0
+    if isinstance(content, str):
+        return text_tokens(content)
+    if isinstance(content, list):
+        return sum(content_tokens(block) for block in content)
+    if isinstance(content, dict):
+        total = 0
+        for key, value in content.items():
+            if key == "image" and value:
+                total += image_tokens(value)
+            elif key == "source" and isinstance(value, dict) and value.get("data"):
+                total += image_tokens(value["data"])
+            elif isinstance(value, (str, list, dict)):
+                total += content_tokens(value)
+        return total
+    if isinstance(content, ImagePayload):
+        return image_tokens(content)
+    return text_tokens(str(content))
+
+def summarize_content(content: Any, limit: int = 200) -> str:
+    """One-line text record of message content"""
+    if isinstance(content, str):
+        text = content
+    elif isinstance(content, dict):
+        parts = []
+        if content.get("error"):
+            parts.append(f"error: {content['error']}")
+        if content.get("output"):
+            parts.append(str(content["output"]))
+        if content.get("image"):
+            parts.append("[screenshot]")
+        text = "; ".join(parts)
+    elif isinstance(content, list):
+        text = " ".join(summarize_content(block, limit) for block in content)
+    else:
+        text = str(content)
+
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+class ContextManager:
+    """Track token usage and compact history before it overflows"""
+
+    def __init__(
+        self,
+        context_window: Optional[int] = None,
+        watermark: Optional[float] = None,
+        max_output_tokens: Optional[int] = None,
+        max_input_tokens: Optional[int] = None,
+        keep_recent: int = 6,
+        overhead_tokens: int = 0,
+    ):
+        self.context_window = context_window or CONFIG["context_window"]
+        self.watermark = watermark or CONFIG["compaction_watermark"]
+        self.budget = TokenBudget(
+            max_output_tokens=max_output_tokens or CONFIG["max_tokens"],
+            max_input_tokens=max_input_tokens or CONFIG["max_input_tokens"],
+        )
+        self.keep_recent = keep_recent
+        self.overhead_tokens = overhead_tokens  # System prompt and tool schemas
+        self.records: list[MessageTokens] = []
+        self.calibration = 1.0  # Ratio of actual to estimated tokens
+        self.last_input_tokens = 0
+        self.total_input_tokens = 0
+        self.total_output_tokens = 0
+        self.compactions = 0
+
+    def sync(self, messages: list[dict]) -> None:
+        """Estimate tokens for messages added since the last call"""
+        for message in messages[len(self.records):]:
+            self.records.append(MessageTokens(content_tokens(message["content"])))
+
+    def estimate(self, messages: list[dict]) -> int:
+        """Calibrated estimate of the input tokens for a request"""
+        self.sync(messages)
+        raw = sum(record.estimated for record in self.records) + self.overhead_tokens
+        return round(raw * self.calibration)
+
+    def record_usage(
+        self,
+        messages: list[dict],
+        input_tokens: int,
+        output_tokens: int = 0,
+    ) -> None:
+        """Attribute reported usage to the messages that were sent and recalibrate estimates"""
+        self.sync(messages)
+        self.total_input_tokens += input_tokens
+        self.total_output_tokens += output_tokens
+
+        # Messages added after the request went out are not part of its usage
+        sent = self.records[:len(messages)]
+        estimated = sum(record.estimated for record in sent) + self.overhead_tokens
+        if estimated:
+            self.calibration = 0.7 * self.calibration + 0.3 * input_tokens / estimated
+
+        # Spread new input tokens over messages not yet measured
+        pending = [record for record in sent if record.actual is None]
+        delta = input_tokens - self.last_input_tokens
+        weight = sum(record.estimated for record in pending)
+        if pending and delta > 0 and weight:
+            for record in pending:
+                record.actual = round(delta * record.estimated / weight)
+        self.last_input_tokens = input_tokens
+
+    def needs_compaction(self, messages: list[dict]) -> bool:
+        """Check whether the next request would cross the watermark"""
+        projected = self.estimate(messages) + self.budget.max_output_tokens
+        if projected > self.context_window * self.watermark:
+            return True
+        limit = self.budget.max_input_tokens
+        return limit is not None and projected - self.budget.max_output_tokens > limit
+
+    def compact(self, messages: list[dict]) -> list[dict]:
+        """Summarize old turns and drop stale images, keeping recent state"""
+        compacted = messages
+        if len(messages) > self.keep_recent:
+            old, recent = messages[:-self.keep_recent], messages[-self.keep_recent:]
+            lines = []
+            for message in old:
+                content = message["content"]
+                if isinstance(content, str) and content.startswith(SUMMARY_PREFIX):
+                    lines.extend(content.splitlines()[1:])
+                    continue
+                if summary := summarize_content(content):
+                    lines.append(f"- {message['role']}: {summary}")
+
+            summary = {"role": "user", "content": "\n".join([SUMMARY_PREFIX, *lines])}
+            compacted = [summary, *recent]
+
+        compacted = self._drop_stale_images(compacted)
+        self.compactions += 1
+        self.records = []
+        self.last_input_tokens = 0
+        self.sync(compacted)
+        return compacted
+
+    def _drop_stale_images(self, messages: list[dict]) -> list[dict]:
+        """Remove every image except the most recent one"""
+        latest = max(
+            (
+                index for index, message in enumerate(messages)
+                if isinstance(message["content"], dict) and message["content"].get("image")
+            ),
+            default=None,
+        )
+
+        result = []
+        for index, message in enumerate(messages):
+            content = message["content"]
+            if index != latest and isinstance(content, dict) and content.get("image"):
+                message = {**message, "content": {**content, "image": None}}
+            result.append(message)
+        return result
+
+    def report(self) -> dict[str, Any]:
+        """Token usage summary for operators"""
+        return {
+            "estimated_input_tokens": round(
+                sum(record.estimated for record in self.records) * self.calibration
+            ),
+            "last_input_tokens": self.last_input_tokens,
+            "total_input_tokens": self.total_input_tokens,
+            "total_output_tokens": self.total_output_tokens,
+            "compactions": self.compactions,
+            "budget": self.budget,
+        }
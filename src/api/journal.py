@@ -0,0 +1,198 @@
+"""Append-only session journal with a content-addressed image store"""
+
+import hashlib
+import json
+import os
+import re
+import struct
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+from ..utils.imaging import ImagePayload
+from ..utils.logging import setup_logging
+
+logger = setup_logging()
+
+# Record header: payload length, CRC32 of the payload, record kind
+HEADER = struct.Struct("<IIB")
+MESSAGE, CHECKPOINT = 1, 2
+
+SESSION_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+class JournalError(Exception):
+    """Journal record that cannot be read"""
+
+class BlobStore:
+    """Images stored once by content hash"""
+
+    EXTENSIONS = {"image/png": ".png", "image/jpeg": ".jpg"}
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path(self, digest: str, media_type: str) -> Path:
+        return self.root / digest[:2] / f"{digest}{self.EXTENSIONS.get(media_type, '.bin')}"
+
+    def put(self, image: ImagePayload) -> dict[str, str]:
+        """Store an image and return the reference journal entries carry"""
+        digest = hashlib.blake2b(image.view(), digest_size=20).hexdigest()
+        path = self.path(digest, image.media_type)
+        if not path.exists():
+            # Written in full before any record points at it
+            path.parent.mkdir(exist_ok=True)
+            tmp = path.with_suffix(".tmp")
+            with open(tmp, "wb") as f:
+                f.write(image.view())
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        return {"blob": digest, "media_type": image.media_type}
+
+    def get(self, ref: dict[str, str]) -> ImagePayload:
+        path = self.path(ref["blob"], ref["media_type"])
+        return ImagePayload(path.read_bytes(), ref["media_type"])
+
+def _encode_message(message: dict, blobs: BlobStore) -> dict:
+    content = message["content"]
+    if isinstance(content, dict) and isinstance(content.get("image"), ImagePayload):
+        return {**message, "content": {**content, "image": blobs.put(content["image"])}}
+    return message
+
+def _decode_message(message: dict, blobs: BlobStore) -> dict:
+    content = message["content"]
+    if isinstance(content, dict) and isinstance(content.get("image"), dict):
+        try:
+            image = blobs.get(content["image"])
+        except OSError:
+            logger.warning(f"Missing journal blob {content['image']['blob']}")
+            image = None
+        return {**message, "content": {**content, "image": image}}
+    return message
+
+class SessionJournal:
+    """Compressed, append-only log of one session's messages"""
+
+    def __init__(
+        self,
+        path: Path,
+        blobs: BlobStore,
+        fsync: bool = True,
+        cache_size: int = 64,
+    ):
+        self.path = path
+        self.blobs = blobs
+        self.fsync = fsync
+        self.offsets: list[int] = []  # Start of every message record
+        self.checkpoint: Optional[int] = None  # Offset of the latest checkpoint
+        self.checkpoint_at = 0  # Messages journaled before that checkpoint
+        self._cache: OrderedDict[int, dict] = OrderedDict()
+        self._cache_size = cache_size
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.touch(exist_ok=True)
+        self._recover()
+        self._file = open(path, "ab")
+
+    @classmethod
+    def open(cls, root: Path, session_id: str, **kwargs) -> "SessionJournal":
+        """Journal for a session under a directory of sessions sharing one blob store"""
+        if not SESSION_ID.match(session_id):
+            raise ValueError(f"Invalid session id: {session_id}")
+        return cls(root / session_id / "journal.log", BlobStore(root / "blobs"), **kwargs)
+
+    def _recover(self):
+        """Index records from their headers and cut off a torn tail"""
+        size = self.path.stat().st_size
+        offset = last = 0
+        with open(self.path, "rb") as f:
+            while offset < size:
+                header = f.read(HEADER.size)
+                if len(header) < HEADER.size:
+                    break
+                length, crc, kind = HEADER.unpack(header)
+                end = offset + HEADER.size + length
+                if end > size or kind not in (MESSAGE, CHECKPOINT):
+                    break
+                if end == size:
+                    # Only the final record can be partly written
+                    if zlib.crc32(f.read(length)) != crc:
+                        break
+                else:
+                    f.seek(length, os.SEEK_CUR)
+
+                if kind == MESSAGE:
+                    self.offsets.append(offset)
+                else:
+                    self.checkpoint, self.checkpoint_at = offset, len(self.offsets)
+                offset = last = end
+
+        if last < size:
+            logger.warning(f"Truncating torn journal tail at {last} of {size} bytes: {self.path}")
+            with open(self.path, "r+b") as f:
+                f.truncate(last)
+
+    def _write(self, kind: int, body: Any) -> int:
+        payload = zlib.compress(json.dumps(body, separators=(",", ":")).encode())
+        offset = self._file.tell()
+        self._file.write(HEADER.pack(len(payload), zlib.crc32(payload), kind) + payload)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        return offset
+
+    def _read(self, offset: int) -> tuple[int, Any]:
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            length, crc, kind = HEADER.unpack(f.read(HEADER.size))
+            payload = f.read(length)
+        if len(payload) != length or zlib.crc32(payload) != crc:
+            raise JournalError(f"Corrupt journal record at {offset}: {self.path}")
+        return kind, json.loads(zlib.decompress(payload))
+
+    def append(self, message: dict):
+        """Journal a message, storing its image in the blob store first"""
+        self.offsets.append(self._write(MESSAGE, _encode_message(message, self.blobs)))
+
+    def write_checkpoint(self, messages: list[dict]):
+        """Record a compacted working set so resume can skip older records"""
+        encoded = [_encode_message(message, self.blobs) for message in messages]
+        self.checkpoint = self._write(CHECKPOINT, encoded)
+        self.checkpoint_at = len(self.offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def read(self, index: int) -> dict:
+        """One journaled message, paged in from disk"""
+        if index in self._cache:
+            self._cache.move_to_end(index)
+            return self._cache[index]
+        _, message = self._read(self.offsets[index])
+        message = _decode_message(message, self.blobs)
+        self._cache[index] = message
+        while len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return message
+
+    def history(self, start: int = 0, stop: Optional[int] = None) -> Iterator[dict]:
+        """Cold history, read lazily in order"""
+        for index in range(start, len(self) if stop is None else min(stop, len(self))):
+            yield self.read(index)
+
+    def load(self, window: int = 200) -> list[dict]:
+        """Working set to resume from: the last checkpoint and what followed"""
+        messages = []
+        if self.checkpoint is not None:
+            _, encoded = self._read(self.checkpoint)
+            messages = [_decode_message(message, self.blobs) for message in encoded]
+
+        start = max(self.checkpoint_at, len(self) - window)
+        messages.extend(self.history(start))
+        # Never hand back more than the window, older turns stay on disk
+        return messages[-window:]
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,288 @@
+"""Process-wide admission control for API requests"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from enum import IntEnum
+from typing import Mapping, Optional
+
+from ..config import CONFIG
+from ..utils.logging import setup_logging
+
+logger = setup_logging()
+
+class Priority(IntEnum):
+    """Lower values are admitted first"""
+    INTERACTIVE = 0
+    BATCH = 1
+
+@dataclass(frozen=True)
+class RequestCost:
+    """Estimated cost of a request"""
+    input_tokens: int
+    output_tokens: int
+    requests: int = 1
+
+class TokenBucket:
+    """Token bucket refilled continuously over a one-minute window"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until amount can be taken, zero if available now"""
+        self.refill(now)
+        amount = min(amount, self.capacity)
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+    def refund(self, amount: float):
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def sync(self, remaining: float, reset_in: Optional[float], now: float):
+        """Align with the server's view of remaining capacity"""
+        self.refill(now)
+        self.tokens = min(self.tokens, remaining)
+        if remaining <= 0 and reset_in:
+            self.paused_until = max(self.paused_until, now + reset_in)
+
+@dataclass
+class Ticket:
+    """Admission granted to one request"""
+    session_id: str
+    priority: Priority
+    cost: RequestCost
+    enqueued: float
+    admitted: float = 0.0
+    # Sessions run on their own loops, so admission is delivered to the waiter's loop
+    loop: asyncio.AbstractEventLoop = field(default=None, repr=False)
+    future: asyncio.Future = field(default=None, repr=False)
+
+    @property
+    def wait_time(self) -> float:
+        return self.admitted - self.enqueued
+
+def _admit(ticket: Ticket):
+    if not ticket.future.done():
+        ticket.future.set_result(ticket)
+
+class AdmissionController:
+    """Fair, priority-aware admission against request and token limits"""
+
+    def __init__(
+        self,
+        requests_per_minute: int = 0,
+        input_tokens_per_minute: int = 0,
+        output_tokens_per_minute: int = 0,
+        wait_window: int = 500,
+    ):
+        # A limit of zero means unlimited
+        self.buckets: dict[str, TokenBucket] = {}
+        for name, limit in (
+            ("requests", requests_per_minute),
+            ("input_tokens", input_tokens_per_minute),
+            ("output_tokens", output_tokens_per_minute),
+        ):
+            if limit:
+                self.buckets[name] = TokenBucket(limit)
+
+        # Per-priority round robin over per-session FIFO queues
+        self.queues: dict[Priority, dict[str, deque[Ticket]]] = {
+            priority: {} for priority in Priority
+        }
+        self.waits: deque[float] = deque(maxlen=wait_window)
+        self.admitted = 0
+        # Sessions on different threads share the controller, so state is guarded by a lock
+        self._lock = threading.Lock()
+
+    async def acquire(
+        self,
+        session_id: str,
+        cost: RequestCost,
+        priority: Priority = Priority.INTERACTIVE,
+    ) -> Ticket:
+        """Wait until the request may be sent"""
+        loop = asyncio.get_running_loop()
+        ticket = Ticket(
+            session_id=session_id,
+            priority=priority,
+            cost=cost,
+            enqueued=time.monotonic(),
+            loop=loop,
+            future=loop.create_future(),
+        )
+        with self._lock:
+            self.queues[priority].setdefault(session_id, deque()).append(ticket)
+            delay = self._dispatch()
+
+        try:
+            while not ticket.future.done():
+                # Nothing else wakes waiters when capacity refills, so recheck then
+                await asyncio.wait([ticket.future], timeout=delay)
+                with self._lock:
+                    delay = self._dispatch()
+        except asyncio.CancelledError:
+            with self._lock:
+                self._remove(ticket)
+            raise
+        return ticket
+
+    def settle(self, ticket: Ticket, input_tokens: int, output_tokens: int):
+        """Correct the buckets once actual usage is known"""
+        with self._lock:
+            for name, estimated, actual in (
+                ("input_tokens", ticket.cost.input_tokens, input_tokens),
+                ("output_tokens", ticket.cost.output_tokens, output_tokens),
+            ):
+                if bucket := self.buckets.get(name):
+                    if actual < estimated:
+                        bucket.refund(estimated - actual)
+                    else:
+                        bucket.take(actual - estimated)
+            self._dispatch()
+
+    def update_from_headers(self, headers: Mapping[str, str]):
+        """Back off according to rate-limit response headers"""
+        now = time.monotonic()
+
+        with self._lock:
+            if retry_after := headers.get("retry-after"):
+                try:
+                    until = now + float(retry_after)
+                except ValueError:
+                    until = now
+                for bucket in self.buckets.values():
+                    bucket.paused_until = max(bucket.paused_until, until)
+                logger.warning(f"Rate limited, pausing admissions for {retry_after}s")
+
+            for name, bucket in self.buckets.items():
+                prefix = f"anthropic-ratelimit-{name.replace('_', '-')}"
+                remaining = headers.get(f"{prefix}-remaining")
+                if remaining is None:
+                    continue
+                bucket.sync(float(remaining), _seconds_until(headers.get(f"{prefix}-reset")), now)
+
+    def metrics(self) -> dict[str, float]:
+        """Queue depth and wait-time statistics"""
+        with self._lock:
+            waits = sorted(self.waits)
+            depth = self.queue_depth
+        return {
+            "queue_depth": depth,
+            "admitted": self.admitted,
+            "wait_p50": waits[len(waits) // 2] if waits else 0.0,
+            "wait_p95": waits[min(int(len(waits) * 0.95), len(waits) - 1)] if waits else 0.0,
+            "wait_max": waits[-1] if waits else 0.0,
+        }
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(
+            len(queue)
+            for sessions in self.queues.values()
+            for queue in sessions.values()
+        )
+
+    def _next_ticket(self) -> Optional[Ticket]:
+        """Head of the next session in line at the best priority"""
+        for priority in Priority:
+            sessions = self.queues[priority]
+            if sessions:
+                return next(iter(sessions.values()))[0]
+        return None
+
+    def _dispatch(self) -> Optional[float]:
+        """Admit queued requests as capacity allows; the caller holds the lock
+
+        Returns the seconds until the next request could be admitted, None if
+        nothing is queued.
+        """
+        while True:
+            ticket = self._next_ticket()
+            if ticket is None:
+                return None
+
+            now = time.monotonic()
+            delay = max(
+                (
+                    bucket.wait_time(self._amount(name, ticket.cost), now)
+                    for name, bucket in self.buckets.items()
+                ),
+                default=0.0,
+            )
+            if delay > 0:
+                return delay
+
+            self._pop(ticket)
+            try:
+                ticket.loop.call_soon_threadsafe(_admit, ticket)
+            except RuntimeError:
+                continue  # The waiter's loop is gone, so nobody will send this request
+
+            for name, bucket in self.buckets.items():
+                bucket.take(self._amount(name, ticket.cost))
+            ticket.admitted = now
+            self.waits.append(ticket.wait_time)
+            self.admitted += 1
+
+    @staticmethod
+    def _amount(name: str, cost: RequestCost) -> float:
+        return getattr(cost, name)
+
+    def _pop(self, ticket: Ticket):
+        """Remove an admitted ticket and rotate its session to the back"""
+        sessions = self.queues[ticket.priority]
+        queue = sessions.pop(ticket.session_id)
+        queue.popleft()
+        if queue:
+            sessions[ticket.session_id] = queue
+
+    def _remove(self, ticket: Ticket):
+        """Drop a cancelled ticket from its queue; the caller holds the lock"""
+        sessions = self.queues[ticket.priority]
+        queue = sessions.get(ticket.session_id)
+        if queue and ticket in queue:
+            queue.remove(ticket)
+            if not queue:
+                del sessions[ticket.session_id]
+        self._dispatch()
+
+def _seconds_until(reset: Optional[str]) -> Optional[float]:
+    """Seconds until an RFC 3339 reset timestamp"""
+    if not reset:
+        return None
+    try:
+        moment = datetime.fromisoformat(reset.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return max((moment - datetime.now(moment.tzinfo)).total_seconds(), 0.0)
+
+_controller: Optional[AdmissionController] = None
+
+def get_admission_controller() -> AdmissionController:
+    """Admission controller shared by every session in the process"""
+    global _controller
+    if _controller is None:
+        _controller = AdmissionController(
+            requests_per_minute=CONFIG["requests_per_minute"],
+            input_tokens_per_minute=CONFIG["input_tokens_per_minute"],
+            output_tokens_per_minute=CONFIG["output_tokens_per_minute"],
+        )
+    return _controller
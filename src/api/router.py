@@ -0,0 +1,301 @@
+"""Latency-aware routing and hedging across API providers"""
+
+import asyncio
+import threading
+import time
+import weakref
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Mapping, Optional, Sequence, Union
+
+from anthropic import AsyncAnthropic, AsyncAnthropicBedrock, AsyncAnthropicVertex
+
+from ..config import CONFIG, PROVIDER_TO_MODEL, APIProvider
+from ..utils.logging import setup_logging
+from .ratelimit import get_admission_controller
+
+logger = setup_logging()
+
+# message_start arrives before generation begins, so latency is measured to
+# the first of these: output, or the end of a reply that has none
+FIRST_TOKEN_EVENTS = frozenset({"content_block_delta", "message_delta", "message_stop"})
+
+@dataclass
+class ProviderStats:
+    """Rolling latency and error statistics for a provider"""
+    window: int = 50
+    ttft: deque[float] = field(default_factory=deque)
+    outcomes: deque[bool] = field(default_factory=deque)  # True for errors
+    cooldown_until: float = 0.0
+
+    def _push(self, samples: deque, value):
+        samples.append(value)
+        while len(samples) > self.window:
+            samples.popleft()
+
+    def record_success(self, ttft: float):
+        self._push(self.ttft, ttft)
+        self._push(self.outcomes, False)
+
+    def record_error(self, cooldown: float):
+        self._push(self.outcomes, True)
+        # Back off from a provider that keeps failing
+        if self.error_rate >= 0.5 and len(self.outcomes) >= 2:
+            self.cooldown_until = time.monotonic() + cooldown
+
+    def record_slow(self, elapsed: float):
+        """Record a censored sample from a request abandoned by hedging"""
+        self._push(self.ttft, elapsed)
+
+    @property
+    def error_rate(self) -> float:
+        return sum(self.outcomes) / len(self.outcomes) if self.outcomes else 0.0
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.cooldown_until
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self.ttft:
+            return None
+        ordered = sorted(self.ttft)
+        return ordered[min(int(p * len(ordered)), len(ordered) - 1)]
+
+@dataclass
+class _Attempt:
+    """An in-flight request to one provider"""
+    provider: APIProvider
+    started: float
+    task: asyncio.Task
+
+def create_client(provider: APIProvider) -> Any:
+    """Create an async API client for a provider"""
+    if provider == APIProvider.ANTHROPIC:
+        return AsyncAnthropic(api_key=CONFIG["api_key"])
+    elif provider == APIProvider.BEDROCK:
+        return AsyncAnthropicBedrock()
+    elif provider == APIProvider.VERTEX:
+        return AsyncAnthropicVertex()
+    raise ValueError(f"Invalid API provider: {provider}")
+
+class ProviderRouter:
+    """Send each request to the fastest healthy provider, optionally hedged
+
+    Clients are either fixed, or built by a factory once per event loop, since
+    their connection pools bind to the loop that first uses them. Latency and
+    health statistics are shared by every loop.
+    """
+
+    def __init__(
+        self,
+        clients: Union[dict[APIProvider, Any], Callable[[APIProvider], Any]],
+        models: Optional[dict[APIProvider, str]] = None,
+        hedge: bool = False,
+        hedge_percentile: float = 0.9,
+        default_deadline: float = 3.0,
+        cooldown: float = 30.0,
+        providers: Optional[Sequence[APIProvider]] = None,
+    ):
+        if callable(clients):
+            self.providers = list(providers or ())
+            self._factory: Optional[Callable[[APIProvider], Any]] = clients
+            self._fixed: dict[APIProvider, Any] = {}
+        else:
+            self.providers = list(clients)
+            self._factory = None
+            self._fixed = clients
+        if not self.providers:
+            raise ValueError("At least one API provider is required")
+        self._loop_clients: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, dict[APIProvider, Any]
+        ] = weakref.WeakKeyDictionary()
+        self._clients_lock = threading.Lock()
+        self.models = models or PROVIDER_TO_MODEL
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.default_deadline = default_deadline
+        self.cooldown = cooldown
+        self.stats = {provider: ProviderStats() for provider in self.providers}
+        self.on_headers: Optional[Callable[[Mapping[str, str]], None]] = None
+
+    @classmethod
+    def from_config(cls) -> "ProviderRouter":
+        providers = [APIProvider(name) for name in CONFIG["api_providers"]]
+        return cls(
+            create_client,
+            hedge=CONFIG["hedge_requests"],
+            hedge_percentile=CONFIG["hedge_percentile"],
+            providers=providers,
+        )
+
+    def client(self, provider: APIProvider) -> Any:
+        """Client for a provider, built for the running loop unless fixed"""
+        if self._factory is None:
+            return self._fixed[provider]
+        loop = asyncio.get_running_loop()
+        with self._clients_lock:
+            clients = self._loop_clients.setdefault(loop, {})
+            if provider not in clients:
+                clients[provider] = self._factory(provider)
+            return clients[provider]
+
+    def ranked(self) -> list[APIProvider]:
+        """Providers ordered by health, then median time to first token"""
+        def key(provider: APIProvider) -> tuple:
+            stats = self.stats[provider]
+            # Unmeasured providers sort first so they get explored
+            return (not stats.healthy, stats.percentile(0.5) or 0.0)
+
+        return sorted(self.providers, key=key)
+
+    def hedge_deadline(self, provider: APIProvider) -> float:
+        """Time to wait for a first token before hedging"""
+        deadline = self.stats[provider].percentile(self.hedge_percentile)
+        return deadline if deadline is not None else self.default_deadline
+
+    async def stream(self, **request: Any) -> AsyncIterator[Any]:
+        """Stream events from whichever provider starts generating first"""
+        provider, stream, events = await self._first_token(request)
+        try:
+            for event in events:
+                yield event
+            async for event in stream:
+                yield event
+        except Exception:
+            self.stats[provider].record_error(self.cooldown)
+            raise
+        finally:
+            await _close(stream)
+
+    async def _first_token(
+        self,
+        request: dict[str, Any],
+    ) -> tuple[APIProvider, Any, list[Any]]:
+        """Open streams until one yields a first token"""
+        queue = self.ranked()
+        pending: list[_Attempt] = []
+        last_error: Optional[Exception] = None
+
+        try:
+            while queue or pending:
+                if not pending:
+                    pending.append(self._start(queue.pop(0), request))
+
+                timeout = None
+                if self.hedge and queue and len(pending) == 1:
+                    attempt = pending[0]
+                    elapsed = time.monotonic() - attempt.started
+                    timeout = max(self.hedge_deadline(attempt.provider) - elapsed, 0.0)
+
+                done, _ = await asyncio.wait(
+                    [attempt.task for attempt in pending],
+                    timeout=timeout,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+
+                if not done:
+                    # Primary is slower than usual, fire a hedge request
+                    logger.info(f"Hedging request to {queue[0]}")
+                    pending.append(self._start(queue.pop(0), request))
+                    continue
+
+                for attempt in [a for a in pending if a.task in done]:
+                    pending.remove(attempt)
+                    try:
+                        stream, events = attempt.task.result()
+                    except Exception as e:
+                        last_error = e
+                        self.stats[attempt.provider].record_error(self.cooldown)
+                        logger.warning(f"Provider {attempt.provider} failed: {e}")
+                        continue
+
+                    self.stats[attempt.provider].record_success(
+                        time.monotonic() - attempt.started
+                    )
+                    return attempt.provider, stream, events
+        finally:
+            # Cancel whichever requests lost the race
+            for attempt in pending:
+                self.stats[attempt.provider].record_slow(time.monotonic() - attempt.started)
+                attempt.task.cancel()
+                asyncio.ensure_future(_discard(attempt.task))
+
+        raise last_error or RuntimeError("No API provider available")
+
+    def _start(self, provider: APIProvider, request: dict[str, Any]) -> _Attempt:
+        return _Attempt(
+            provider=provider,
+            started=time.monotonic(),
+            task=asyncio.create_task(self._open(provider, request)),
+        )
+
+    async def _open(
+        self,
+        provider: APIProvider,
+        request: dict[str, Any],
+    ) -> tuple[Any, list[Any]]:
+        """Open a stream and read events up to its first token"""
+        try:
+            stream = await self.client(provider).messages.create(
+                model=self.models[provider],
+                stream=True,
+                **request,
+            )
+        except Exception as e:
+            # Rate-limit errors carry the headers that say when to retry
+            if (response := getattr(e, "response", None)) is not None:
+                self._report_headers(response.headers)
+            raise
+
+        self._report_headers(stream.response.headers)
+        events = []
+        try:
+            async for event in stream:
+                events.append(event)
+                if event.type in FIRST_TOKEN_EVENTS:
+                    break
+            return stream, events
+        except BaseException:
+            await _close(stream)
+            raise
+
+    def _report_headers(self, headers: Mapping[str, str]):
+        if self.on_headers:
+            self.on_headers(headers)
+
+    def report(self) -> dict[str, dict[str, Any]]:
+        """Per-provider latency and error statistics"""
+        return {
+            str(provider): {
+                "ttft_p50": stats.percentile(0.5),
+                "ttft_p90": stats.percentile(0.9),
+                "error_rate": stats.error_rate,
+                "healthy": stats.healthy,
+            }
+            for provider, stats in self.stats.items()
+        }
+
+_router: Optional[ProviderRouter] = None
+
+def get_router() -> ProviderRouter:
+    """Router shared by every session in the process"""
+    global _router
+    if _router is None:
+        _router = ProviderRouter.from_config()
+        _router.on_headers = get_admission_controller().update_from_headers
+    return _router
+
+async def _close(stream: Any):
+    """Close a stream, ignoring errors from already-closed connections"""
+    try:
+        await stream.close()
+    except Exception:
+        pass
+
+async def _discard(task: asyncio.Task):
+    """Wait for a cancelled request and close its stream if it opened one"""
+    try:
+        stream, _ = await task
+    except BaseException:
+        return
+    await _close(stream)
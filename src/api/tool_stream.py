@@ -0,0 +1,67 @@
+"""Incremental assembly of streamed tool-use input"""
+
+import json
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+class PartialObject:
+    """JSON object fed in chunks, exposing members as soon as they complete"""
+
+    def __init__(self):
+        self.text = ""
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.boundary = 0  # End of the last complete top-level member
+        self.complete = False
+        self._members: dict[str, Any] = {}
+        self._parsed_to = 0
+
+    def feed(self, chunk: str):
+        start = len(self.text)
+        self.text += chunk
+
+        # Only new characters are scanned, so total work stays linear
+        for index in range(start, len(self.text)):
+            char = self.text[index]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == "\\":
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.depth += 1
+            elif char in "}]":
+                self.depth -= 1
+                if self.depth == 0:
+                    self.boundary = index
+                    self.complete = True
+            elif char == "," and self.depth == 1:
+                self.boundary = index
+
+    def members(self) -> dict[str, Any]:
+        """Top-level members whose values have fully arrived"""
+        if self.boundary > self._parsed_to:
+            try:
+                self._members = json.loads(self.text[:self.boundary] + "}")
+            except ValueError:
+                pass
+            self._parsed_to = self.boundary
+        return self._members
+
+    def result(self) -> dict[str, Any]:
+        """The whole object once the block has closed"""
+        return json.loads(self.text) if self.text.strip() else {}
+
+@dataclass
+class ToolCall:
+    """A tool-use block being streamed"""
+    id: str
+    name: str
+    input: PartialObject = field(default_factory=PartialObject)
+    preparing: Optional[Any] = None  # Task running the tool's prepare step
+    prepared_keys: frozenset = frozenset()
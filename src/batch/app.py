@@ -0,0 +1,77 @@
+"""Batch runs driven by Anthropic clients"""
+
+import asyncio
+from pathlib import Path
+from typing import Optional
+
+from ..api.anthropic import AnthropicClient
+from ..api.ratelimit import Priority
+from ..config import CONFIG
+from ..tools.base import ToolResult
+from ..tools.collection import ToolCollection
+from ..utils.deadline import Deadline
+from .runner import BatchRunner, BatchTask, Progress, TaskResult, TaskTrace, load_tasks
+
+class ClientAgent:
+    """Runs each task in a fresh conversation on one device's tools"""
+
+    def __init__(self, device: str):
+        self.device = device
+        self.tools = ToolCollection(devices=[device])
+
+    async def __call__(self, task: BatchTask, trace: TaskTrace, deadline: Deadline) -> None:
+        def on_tool_result(result: ToolResult):
+            trace.write(
+                "tool_result",
+                output=result.output,
+                error=result.error,
+                image=result.image is not None,
+            )
+            if result.image:
+                trace.screenshot = result.image
+
+        client = AnthropicClient(
+            tools=self.tools,
+            on_tool_result=on_tool_result,
+            session_id=BatchRunner.session_id(self.device),
+            priority=Priority.BATCH,
+            # Tasks share the worker's session id, so each must start from scratch
+            journaled=False,
+        )
+        try:
+            await client.send_message(task.task, deadline=deadline)
+        finally:
+            client.close()
+            for message in client.messages:
+                if message["role"] == "assistant":
+                    trace.write("assistant", text=message["content"])
+
+async def create_agent(device: str) -> ClientAgent:
+    return ClientAgent(device)
+
+def available_devices() -> list[str]:
+    """Mac always, iOS when a device is configured"""
+    return ["mac", "ios"] if CONFIG["ios_device_id"] else ["mac"]
+
+def run_batch(
+    tasks_path: Path,
+    output_dir: Path,
+    devices: Optional[list[str]],
+    retries: int,
+    timeout: Optional[float],
+    echo=print,
+) -> Progress:
+    """Run a task file and report progress after each task"""
+    def on_progress(result: TaskResult, progress: Progress):
+        echo(f"{progress.describe()} - {result.id}: {result.status}")
+
+    runner = BatchRunner(
+        load_tasks(tasks_path),
+        output_dir,
+        devices or available_devices(),
+        create_agent,
+        retries=retries,
+        timeout=timeout or CONFIG["task_timeout"],
+        on_progress=on_progress,
+    )
+    return asyncio.run(runner.run())
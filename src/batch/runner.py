@@ -0,0 +1,292 @@
+"""Batch task runner with one worker per device"""
+
+import asyncio
+import json
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional, Protocol
+
+from ..utils.deadline import Deadline, DeadlineExceeded
+from ..utils.imaging import ImagePayload
+from ..utils.logging import log_context, setup_logging
+from ..utils.profiler import get_profiler
+from ..utils.resilience import RetryPolicy
+
+logger = setup_logging()
+
+@dataclass
+class BatchTask:
+    """One line of a task file"""
+    id: str
+    task: str
+    device: Optional[str] = None
+    timeout: Optional[float] = None
+
+@dataclass
+class TaskResult:
+    """Outcome of a task, one line of results.jsonl"""
+    id: str
+    task: str
+    device: str
+    status: str  # completed, failed or timed_out
+    attempts: int
+    duration: float
+    error: Optional[str] = None
+    trace: Optional[str] = None
+    screenshot: Optional[str] = None
+    profile: Optional[str] = None
+    finished_at: str = field(default_factory=lambda: datetime.now().isoformat())
+
+class TaskTrace:
+    """Append-only record of one task's steps"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.screenshot: Optional[ImagePayload] = None
+
+    def write(self, kind: str, **data: Any):
+        with self.path.open("a") as f:
+            f.write(json.dumps({"kind": kind, "at": time.time(), **data}, default=str) + "\n")
+
+class Agent(Protocol):
+    """Runs one task on the device a worker owns"""
+
+    async def __call__(self, task: BatchTask, trace: TaskTrace, deadline: Deadline) -> None: ...
+
+AgentFactory = Callable[[str], Awaitable[Agent]]
+
+def load_tasks(path: Path) -> list[BatchTask]:
+    """Read tasks from JSONL, one object or bare string per line"""
+    tasks = []
+    with path.open() as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if isinstance(entry, str):
+                entry = {"task": entry}
+            tasks.append(BatchTask(
+                id=str(entry.get("id", number)),
+                task=entry["task"],
+                device=entry.get("device"),
+                timeout=entry.get("timeout"),
+            ))
+    return tasks
+
+def load_checkpoint(path: Path) -> set[str]:
+    """IDs of tasks already completed by an earlier run"""
+    done = set()
+    if not path.exists():
+        return done
+    with path.open() as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # Torn final line from a crash
+            if entry.get("status") == "completed":
+                done.add(entry["id"])
+    return done
+
+@dataclass
+class Progress:
+    total: int
+    skipped: int
+    started: float = field(default_factory=time.monotonic)
+    completed: int = 0
+    failed: int = 0
+
+    @property
+    def finished(self) -> int:
+        return self.completed + self.failed
+
+    @property
+    def throughput(self) -> float:
+        """Tasks per minute in this run"""
+        elapsed = time.monotonic() - self.started
+        return self.finished / elapsed * 60 if elapsed > 0 else 0.0
+
+    @property
+    def eta(self) -> Optional[float]:
+        """Seconds until every remaining task is done at the current rate"""
+        if not self.throughput:
+            return None
+        return (self.total - self.skipped - self.finished) / self.throughput * 60
+
+    def describe(self) -> str:
+        eta = f"{self.eta / 60:.1f} min" if self.eta is not None else "unknown"
+        return (
+            f"[{self.skipped + self.finished}/{self.total}] "
+            f"{self.completed} ok, {self.failed} failed, "
+            f"{self.throughput:.2f} tasks/min, ETA {eta}"
+        )
+
+class BatchRunner:
+    """Spread tasks over device workers, recording results as they finish"""
+
+    def __init__(
+        self,
+        tasks: list[BatchTask],
+        output_dir: Path,
+        devices: list[str],
+        agent_factory: AgentFactory,
+        retries: int = 2,
+        timeout: Optional[float] = None,
+        backoff: RetryPolicy = RetryPolicy(base_delay=5.0, max_delay=60.0, deadline=None),
+        on_progress: Optional[Callable[[TaskResult, Progress], None]] = None,
+    ):
+        if not devices:
+            raise ValueError("At least one device is required")
+        self.tasks = tasks
+        self.output_dir = Path(output_dir)
+        self.devices = devices
+        self.agent_factory = agent_factory
+        self.retries = retries
+        self.timeout = timeout
+        self.backoff = backoff
+        self.on_progress = on_progress
+
+        self.results_path = self.output_dir / "results.jsonl"
+        self.trace_dir = self.output_dir / "traces"
+        self.screenshot_dir = self.output_dir / "screenshots"
+
+    async def run(self) -> Progress:
+        """Run every task not completed by an earlier run"""
+        for directory in (self.output_dir, self.trace_dir, self.screenshot_dir):
+            directory.mkdir(parents=True, exist_ok=True)
+
+        done = load_checkpoint(self.results_path)
+        self._terminate_torn_line()
+        pending = [task for task in self.tasks if task.id not in done]
+        progress = Progress(total=len(self.tasks), skipped=len(self.tasks) - len(pending))
+
+        # Pinned tasks wait for their device, the rest go to any worker
+        queues: dict[Optional[str], asyncio.Queue] = {
+            device: asyncio.Queue() for device in [None, *self.devices]
+        }
+        for task in pending:
+            if task.device is not None and task.device not in self.devices:
+                # Failed rather than dropped, so a rerun with the device picks it up
+                error = f"Device {task.device} is not available"
+                logger.warning(f"Task {task.id}: {error}")
+                self._finish(TaskResult(
+                    id=task.id,
+                    task=task.task,
+                    device=task.device,
+                    status="failed",
+                    attempts=0,
+                    duration=0.0,
+                    error=error,
+                ), progress)
+                continue
+            queues[task.device].put_nowait(task)
+
+        await asyncio.gather(*(
+            self._worker(device, queues[device], queues[None], progress)
+            for device in self.devices
+        ))
+        return progress
+
+    async def _worker(
+        self,
+        device: str,
+        own: asyncio.Queue,
+        shared: asyncio.Queue,
+        progress: Progress,
+    ):
+        agent = await self.agent_factory(device)
+        while True:
+            queue = own if not own.empty() else shared
+            try:
+                task = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+
+            with log_context(session=self.session_id(device), device=device):
+                result = await self._run_task(agent, device, task)
+            self._finish(result, progress)
+
+    def _finish(self, result: TaskResult, progress: Progress):
+        """Record a result and count it towards progress"""
+        self._record(result)
+        if result.status == "completed":
+            progress.completed += 1
+        else:
+            progress.failed += 1
+        if self.on_progress:
+            self.on_progress(result, progress)
+
+    @staticmethod
+    def session_id(device: str) -> str:
+        """Session every task on a device's worker runs under"""
+        return f"batch-{device}"
+
+    async def _run_task(self, agent: Agent, device: str, task: BatchTask) -> TaskResult:
+        """Run a task, retrying failures with backoff"""
+        trace_path = self.trace_dir / f"{task.id}.jsonl"
+        trace_path.unlink(missing_ok=True)
+        trace = TaskTrace(trace_path)
+        profile_path = trace_path.with_suffix(".collapsed")
+        profile_path.unlink(missing_ok=True)
+        profiler = get_profiler()
+        profiler.take(self.session_id(device))  # Drop samples from between tasks
+        start = time.monotonic()
+        status, error = "failed", None
+
+        for attempt in range(self.retries + 1):
+            if attempt:
+                delay = self.backoff.delay(attempt)
+                logger.warning(f"Retrying task {task.id} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+            trace.write("attempt", number=attempt + 1, task=task.task, device=device)
+            try:
+                await agent(task, trace, Deadline.after(task.timeout or self.timeout))
+            except DeadlineExceeded:
+                status, error = "timed_out", "Task deadline exceeded"
+            except Exception as e:
+                status, error = "failed", str(e)
+            else:
+                status, error = "completed", None
+                break
+            trace.write("error", error=error)
+
+        screenshot = None
+        if trace.screenshot is not None:
+            path = self.screenshot_dir / f"{task.id}.png"
+            path.write_bytes(trace.screenshot.data)
+            screenshot = str(path.relative_to(self.output_dir))
+
+        profile = profiler.export(profile_path, self.session_id(device))
+
+        return TaskResult(
+            id=task.id,
+            task=task.task,
+            device=device,
+            status=status,
+            attempts=attempt + 1,
+            duration=round(time.monotonic() - start, 3),
+            error=error,
+            trace=str(trace_path.relative_to(self.output_dir)),
+            screenshot=screenshot,
+            profile=str(profile.relative_to(self.output_dir)) if profile else None,
+        )
+
+    def _terminate_torn_line(self):
+        """Keep new results off a partial line left by a crash"""
+        if not self.results_path.exists() or not self.results_path.stat().st_size:
+            return
+        with self.results_path.open("rb+") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+
+    def _record(self, result: TaskResult):
+        """Append a result durably; this file is also the resume checkpoint"""
+        with self.results_path.open("a") as f:
+            f.write(json.dumps(asdict(result)) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
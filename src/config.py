@@ -34,12 +34,51 @@ MAX_SCALING_TARGETS = {
 CONFIG = {
     "api_key": os.getenv("ANTHROPIC_API_KEY"),
     "api_provider": os.getenv("API_PROVIDER", "anthropic"),
+    "api_providers": [
+        name.strip()
+        for name in os.getenv("API_PROVIDERS", os.getenv("API_PROVIDER", "anthropic")).split(",")
+        if name.strip()
+    ],
+    "hedge_requests": os.getenv("HEDGE_REQUESTS", "false").lower() == "true",
+    "hedge_percentile": float(os.getenv("HEDGE_PERCENTILE", "0.9")),
     "screen_width": int(os.getenv("SCREEN_WIDTH", "1280")),
     "screen_height": int(os.getenv("SCREEN_HEIGHT", "800")),
     "ios_device_id": os.getenv("IOS_DEVICE_ID"),
+    "appium_command": os.getenv("APPIUM_COMMAND", "appium"),
+    "appium_servers": int(os.getenv("APPIUM_SERVERS", "1")),
+    "appium_port": int(os.getenv("APPIUM_PORT", "4723")),
+    "requests_per_minute": int(os.getenv("REQUESTS_PER_MINUTE", "0")),
+    "input_tokens_per_minute": int(os.getenv("INPUT_TOKENS_PER_MINUTE", "0")),
+    "output_tokens_per_minute": int(os.getenv("OUTPUT_TOKENS_PER_MINUTE", "0")),
+    "max_tokens": int(os.getenv("MAX_TOKENS", "4096")),
+    "max_input_tokens": int(os.getenv("MAX_INPUT_TOKENS", "0")) or None,
+    "context_window": int(os.getenv("CONTEXT_WINDOW", "200000")),
+    "compaction_watermark": float(os.getenv("COMPACTION_WATERMARK", "0.75")),
+    "capture_mode": os.getenv("CAPTURE_MODE", "thumbnail"),
+    "thumbnail_width": int(os.getenv("THUMBNAIL_WIDTH", "640")),
+    "capture_backend": os.getenv("CAPTURE_BACKEND", "auto"),
+    "frame_ring": os.getenv("FRAME_RING", "false").lower() == "true",
+    "frame_ring_size": int(os.getenv("FRAME_RING_SIZE", "8")),
+    "type_paste_threshold": int(os.getenv("TYPE_PASTE_THRESHOLD", "40")),
+    "action_lease_time": float(os.getenv("ACTION_LEASE_TIME", "3")),
+    "action_lease_actions": int(os.getenv("ACTION_LEASE_ACTIONS", "5")),
+    "session_journal": os.getenv("SESSION_JOURNAL", "false").lower() == "true",
+    "journal_window": int(os.getenv("JOURNAL_WINDOW", "200")),
+    "trajectory_cache": os.getenv("TRAJECTORY_CACHE", "false").lower() == "true",
+    "task_timeout": float(os.getenv("TASK_TIMEOUT", "900")),
+    "server_max_sessions": int(os.getenv("SERVER_MAX_SESSIONS", "16")),
+    "server_idle_timeout": float(os.getenv("SERVER_IDLE_TIMEOUT", "600")),
+    "profile": os.getenv("PROFILE", "false").lower() == "true",
+    "profile_interval": float(os.getenv("PROFILE_INTERVAL", "0.01")),
+    "log_level": os.getenv("LOG_LEVEL", "INFO"),
+    "log_format": os.getenv("LOG_FORMAT", "json"),
+    "log_debug_sample": int(os.getenv("LOG_DEBUG_SAMPLE", "10")),
+    "log_queue_size": int(os.getenv("LOG_QUEUE_SIZE", "10000")),
 }
 
 # Paths
 ROOT_DIR = Path(__file__).parent.parent
 TEMP_DIR = ROOT_DIR / "temp"
-TEMP_DIR.mkdir(exist_ok=True) 
\ No newline at end of file
+TEMP_DIR.mkdir(exist_ok=True)
+CACHE_DIR = ROOT_DIR / "cache"
+SESSIONS_DIR = ROOT_DIR / "sessions" 
\ No newline at end of file
@@ -2,12 +2,17 @@
 
 import asyncio
 import click
+from pathlib import Path
 from typing import Optional
 
+from .batch.app import run_batch
+from .config import CONFIG
+from .server.app import serve as serve_sessions
 from .ui.streamlit_app import main as streamlit_main
 from .utils.system_check import print_system_status
 from .utils.validation import validate_config
 from .utils.logging import setup_logging
+from .utils.profiler import get_profiler
 
 logger = setup_logging()
 
@@ -46,5 +51,61 @@ def ui():
     # Start UI
     streamlit_main()
 
+@cli.command()
+@click.option("--host", default="127.0.0.1", help="Interface to listen on")
+@click.option("--port", default=8765, help="Port to listen on")
+@click.option("--max-sessions", default=CONFIG["server_max_sessions"], help="Concurrent session limit")
+@click.option("--idle-timeout", default=CONFIG["server_idle_timeout"], help="Seconds before idle sessions are evicted")
+@click.option("--profile", is_flag=True, default=CONFIG["profile"], help="Sample stacks of every session")
+def serve(host: str, port: int, max_sessions: int, idle_timeout: float, profile: bool):
+    """Host agent sessions over HTTP with server-sent events"""
+    if errors := validate_config():
+        logger.error("Configuration errors found:")
+        for error in errors:
+            logger.error(error)
+        exit(1)
+
+    if profile:
+        get_profiler().enable()
+
+    serve_sessions(host, port, max_sessions, idle_timeout)
+
+@cli.command()
+@click.argument("tasks", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option("--output", "-o", default="runs/latest", type=click.Path(file_okay=False, path_type=Path), help="Directory for results, traces and screenshots")
+@click.option("--devices", help="Comma-separated devices to run on (default: all available)")
+@click.option("--retries", default=2, help="Retries for a failed task")
+@click.option("--timeout", type=float, help="Seconds per task (default: TASK_TIMEOUT)")
+@click.option("--profile", is_flag=True, default=CONFIG["profile"], help="Write a collapsed-stack profile next to each trace")
+def run(
+    tasks: Path,
+    output: Path,
+    devices: Optional[str],
+    retries: int,
+    timeout: Optional[float],
+    profile: bool,
+):
+    """Run tasks from a JSONL file, resuming from earlier results in the output directory"""
+    if errors := validate_config():
+        logger.error("Configuration errors found:")
+        for error in errors:
+            logger.error(error)
+        exit(1)
+
+    if profile:
+        get_profiler().enable()
+
+    progress = run_batch(
+        tasks,
+        output,
+        devices.split(",") if devices else None,
+        retries,
+        timeout,
+        echo=click.echo,
+    )
+    click.echo(f"Done: {progress.describe()}")
+    if progress.failed:
+        exit(1)
+
 if __name__ == "__main__":
     cli() 
\ No newline at end of file
@@ -0,0 +1,58 @@
+"""Headless server wiring sessions to Anthropic clients"""
+
+import asyncio
+from typing import Any, Optional
+
+from ..api.anthropic import AnthropicClient
+from ..config import CONFIG
+from ..tools.base import Preparation, ToolResult
+from ..tools.collection import ToolCollection
+from .http import AgentServer
+from .sessions import EventChannel, Session, SessionManager
+
+class BackpressureTools:
+    """Tool collection that holds each action until the subscriber catches up"""
+
+    def __init__(self, tools: ToolCollection, channel: EventChannel):
+        self.tools = tools
+        self.channel = channel
+
+    async def run(
+        self,
+        *,
+        name: str,
+        tool_input: dict[str, Any],
+        preparation: Optional[Preparation] = None,
+    ) -> ToolResult:
+        await self.channel.writable()
+        return await self.tools.run(name=name, tool_input=tool_input, preparation=preparation)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.tools, name)
+
+async def create_agent(session: Session) -> AnthropicClient:
+    """Anthropic client that reports to a session's event channel"""
+    channel = session.channel
+    return AnthropicClient(
+        tools=BackpressureTools(ToolCollection(), channel),
+        on_content=lambda text: channel.publish("content", {"text": text}),
+        on_tool_result=lambda result: channel.publish("tool_result", {
+            "output": result.output,
+            "error": result.error,
+            "image": result.image,
+        }),
+        session_id=session.id,
+    )
+
+def serve(host: str, port: int, max_sessions: int, idle_timeout: float):
+    """Run the session server until interrupted"""
+    sessions = SessionManager(
+        create_agent,
+        max_sessions=max_sessions,
+        idle_timeout=idle_timeout,
+    )
+    server = AgentServer(sessions, host=host, port=port)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
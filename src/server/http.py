@@ -0,0 +1,258 @@
+"""Minimal HTTP and server-sent events front end for agent sessions"""
+
+import asyncio
+import json
+from dataclasses import dataclass
+from typing import Any, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from ..api.journal import SESSION_ID
+from ..tools.scheduler import device_metrics
+from ..utils.imaging import ImagePayload
+from ..utils.logging import setup_logging
+from ..utils.profiler import get_profiler
+from .sessions import Event, SessionLimitError, SessionManager
+
+logger = setup_logging()
+
+MAX_BODY = 1 << 20
+REASONS = {
+    200: "OK", 201: "Created", 202: "Accepted", 204: "No Content",
+    400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    408: "Request Timeout", 409: "Conflict", 413: "Payload Too Large", 429: "Too Many Requests",
+    500: "Internal Server Error",
+}
+
+@dataclass
+class Request:
+    method: str
+    path: list[str]
+    query: dict[str, list[str]]
+    headers: dict[str, str]
+    body: bytes
+
+    def json(self) -> dict[str, Any]:
+        return json.loads(self.body or b"{}")
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+def encode_event(event: Event, images: bool) -> bytes:
+    """Format an event as an SSE frame"""
+    data = {}
+    for key, value in event.data.items():
+        if isinstance(value, ImagePayload):
+            # Screenshots are large, only sent to subscribers that ask
+            value = value.base64 if images else None
+        data[key] = value
+    return f"id: {event.id}\nevent: {event.type}\ndata: {json.dumps(data)}\n\n".encode()
+
+class AgentServer:
+    """Serve session endpoints over plain asyncio streams
+
+    POST   /sessions               create a session, {"session_id": ...} resumes one
+    POST   /sessions/{id}/tasks    submit {"task": "..."}
+    GET    /sessions/{id}/events   stream events as SSE (?images=1 for screenshots)
+    PUT    /sessions/{id}/profile  {"enabled": true} samples the session's stacks
+    DELETE /sessions/{id}          close a session
+    GET    /health                 session counts and device queue waits
+    """
+
+    def __init__(
+        self,
+        sessions: SessionManager,
+        host: str = "127.0.0.1",
+        port: int = 8765,
+        keepalive: float = 15.0,
+        read_timeout: float = 30.0,
+    ):
+        self.sessions = sessions
+        self.host = host
+        self.port = port
+        self.keepalive = keepalive
+        self.read_timeout = read_timeout  # Whole request, so slow clients cannot pin a connection
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> int:
+        """Start listening and return the bound port"""
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        logger.info(f"Serving agent sessions on http://{self.host}:{self.port}")
+        return self.port
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+        await self.sessions.close_all()
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            try:
+                request = await asyncio.wait_for(self._read_request(reader), self.read_timeout)
+            except asyncio.TimeoutError:
+                raise HTTPError(408, "Timed out reading the request")
+            await self._route(request, writer)
+        except HTTPError as e:
+            await self._respond(writer, e.status, {"error": e.message})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            logger.error(f"Request failed: {str(e)}")
+            await self._respond(writer, 500, {"error": "Internal error"})
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Request:
+        head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1")
+        request_line, *lines = head.split("\r\n")
+        try:
+            method, target, _ = request_line.split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "Malformed request line")
+
+        headers = {}
+        for line in lines:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            length = -1
+        if length < 0:
+            raise HTTPError(400, "Invalid Content-Length")
+        if length > MAX_BODY:
+            raise HTTPError(413, "Request body too large")
+        body = await reader.readexactly(length) if length else b""
+
+        url = urlsplit(target)
+        return Request(
+            method=method.upper(),
+            path=[part for part in url.path.split("/") if part],
+            query=parse_qs(url.query),
+            headers=headers,
+            body=body,
+        )
+
+    async def _route(self, request: Request, writer: asyncio.StreamWriter):
+        method, path = request.method, request.path
+
+        if path == ["health"] and method == "GET":
+            return await self._respond(writer, 200, {
+                **self.sessions.stats(),
+                "devices": device_metrics(),
+            })
+
+        if path == ["sessions"] and method == "POST":
+            try:
+                session_id = request.json().get("session_id")
+            except (ValueError, AttributeError):
+                raise HTTPError(400, "Body must be a JSON object")
+            if session_id is not None and not (
+                isinstance(session_id, str) and SESSION_ID.match(session_id)
+            ):
+                raise HTTPError(400, "Invalid session_id")
+            if session_id in self.sessions.sessions:
+                raise HTTPError(409, f"Session {session_id} is already open")
+            try:
+                session = await self.sessions.create(session_id)
+            except SessionLimitError as e:
+                raise HTTPError(429, str(e))
+            return await self._respond(writer, 201, {"session_id": session.id})
+
+        if len(path) < 2 or path[0] != "sessions":
+            raise HTTPError(404, "Not found")
+
+        session = self.sessions.get(path[1])
+        if session is None:
+            raise HTTPError(404, f"Unknown session {path[1]}")
+
+        if len(path) == 2 and method == "DELETE":
+            await self.sessions.close(session.id)
+            return await self._respond(writer, 204)
+
+        if path[2:] == ["tasks"] and method == "POST":
+            try:
+                task = request.json().get("task")
+            except (ValueError, AttributeError):
+                raise HTTPError(400, "Body must be a JSON object")
+            if not isinstance(task, str) or not task.strip():
+                raise HTTPError(400, "Missing task")
+            try:
+                task_id = session.submit(task)
+            except SessionLimitError as e:
+                raise HTTPError(429, str(e))
+            return await self._respond(writer, 202, {"task_id": task_id})
+
+        if path[2:] == ["profile"] and method == "PUT":
+            try:
+                enabled = request.json().get("enabled")
+            except (ValueError, AttributeError):
+                raise HTTPError(400, "Body must be a JSON object")
+            if not isinstance(enabled, bool):
+                raise HTTPError(400, "enabled must be true or false")
+            profiler = get_profiler()
+            if enabled:
+                profiler.enable(session.id)
+            else:
+                profiler.disable(session.id)
+            return await self._respond(writer, 200, {"profiling": profiler.active_for(session.id)})
+
+        if path[2:] == ["events"] and method == "GET":
+            if session.subscribed:
+                raise HTTPError(409, "Session already has a subscriber")
+            images = request.query.get("images", ["0"])[0] in ("1", "true")
+            return await self._stream(session, writer, images)
+
+        raise HTTPError(405, "Method not allowed")
+
+    async def _stream(self, session, writer: asyncio.StreamWriter, images: bool):
+        """Relay session events until the session closes or the client leaves"""
+        session.channel.attach()
+        writer.write(
+            b"HTTP/1.1 200 OK\r\ncontent-type: text/event-stream\r\n"
+            b"cache-control: no-cache\r\nconnection: close\r\n\r\n"
+        )
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(session.channel.get(), self.keepalive)
+                except asyncio.TimeoutError:
+                    writer.write(b": keepalive\n\n")
+                    await writer.drain()
+                    continue
+
+                if event is None:
+                    break
+                writer.write(encode_event(event, images))
+                # Waits on a slow client, which in turn holds back the agent
+                await writer.drain()
+                session.touch()
+        finally:
+            session.channel.detach()
+
+    async def _respond(
+        self,
+        writer: asyncio.StreamWriter,
+        status: int,
+        body: Optional[dict[str, Any]] = None,
+    ):
+        payload = json.dumps(body).encode() if body is not None else b""
+        headers = [f"HTTP/1.1 {status} {REASONS.get(status, '')}"]
+        if payload:
+            headers.append("content-type: application/json")
+        headers.append(f"content-length: {len(payload)}")
+        headers.append("connection: close")
+        writer.write(("\r\n".join(headers) + "\r\n\r\n").encode() + payload)
+        await writer.drain()
@@ -0,0 +1,275 @@
+"""Agent sessions hosted on one event loop"""
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Optional, Protocol
+from uuid import uuid4
+
+from ..config import SESSIONS_DIR
+from ..utils.deadline import DeadlineExceeded
+from ..utils.logging import log_context, setup_logging
+from ..utils.profiler import get_profiler
+
+logger = setup_logging()
+
+class Agent(Protocol):
+    """What a session drives; AnthropicClient in production"""
+
+    async def send_message(self, message: str) -> None: ...
+
+    def close(self) -> None: ...
+
+class SessionLimitError(Exception):
+    """No room for another session or task"""
+    pass
+
+# Events a client needs to know how a task ended, never dropped on overflow
+TERMINAL_EVENTS = frozenset({"task_finished", "session_closed"})
+
+@dataclass
+class Event:
+    """Something a session reports to its subscriber"""
+    type: str
+    data: dict[str, Any]
+    id: int = 0
+
+class EventChannel:
+    """Bounded event buffer that coalesces text and pauses producers for a subscriber"""
+
+    def __init__(self, maxsize: int = 256, high_water: float = 0.75):
+        self.maxsize = maxsize
+        self.high_water = max(int(maxsize * high_water), 1)
+        self.events: deque[Event] = deque()
+        self.next_id = 1
+        self.dropped = 0
+        self.subscribed = False
+        self._readable = asyncio.Event()
+        self._writable = asyncio.Event()
+        self._writable.set()
+        self.closed = False
+
+    def attach(self):
+        """A subscriber is reading, so producers wait for it to keep up"""
+        self.subscribed = True
+        self._update_writable()
+
+    def detach(self):
+        """Nobody is reading; producers run on and old events are dropped"""
+        self.subscribed = False
+        self._update_writable()
+
+    def publish(self, type: str, data: dict[str, Any]):
+        """Add an event without blocking, callbacks from the agent are sync"""
+        if self.closed:
+            return
+
+        last = self.events[-1] if self.events else None
+        if type == "content" and last is not None and last.type == "content":
+            # Content events carry the full text so far, keep only the newest
+            last.data = data
+            return
+
+        if len(self.events) >= self.maxsize:
+            self._evict()
+
+        self.events.append(Event(type, data, self.next_id))
+        self.next_id += 1
+        self._readable.set()
+        self._update_writable()
+
+    def _evict(self):
+        """Drop the oldest event a client can do without"""
+        for index, event in enumerate(self.events):
+            if event.type not in TERMINAL_EVENTS:
+                del self.events[index]
+                self.dropped += 1
+                return
+
+    def _update_writable(self):
+        # Without a subscriber nothing would drain the buffer, so never block
+        if self.subscribed and not self.closed and len(self.events) >= self.high_water:
+            self._writable.clear()
+        else:
+            self._writable.set()
+
+    async def writable(self):
+        """Wait until the subscriber has caught up below the high-water mark"""
+        await self._writable.wait()
+
+    async def get(self) -> Optional[Event]:
+        """Next event, or None once the channel is closed and drained"""
+        while not self.events:
+            if self.closed:
+                return None
+            self._readable.clear()
+            await self._readable.wait()
+
+        event = self.events.popleft()
+        self._update_writable()
+        return event
+
+    def close(self):
+        self.closed = True
+        self._readable.set()
+        self._writable.set()
+
+@dataclass
+class Session:
+    """One agent with its task queue and event channel"""
+    id: str
+    agent: Optional[Agent]
+    channel: EventChannel
+    max_pending: int
+    created: float = field(default_factory=time.monotonic)
+    last_active: float = field(default_factory=time.monotonic)
+    tasks: asyncio.Queue = field(default_factory=asyncio.Queue)
+    runner: Optional[asyncio.Task] = None
+    current: Optional[str] = None
+
+    @property
+    def subscribed(self) -> bool:
+        return self.channel.subscribed
+
+    def touch(self):
+        self.last_active = time.monotonic()
+
+    @property
+    def busy(self) -> bool:
+        return self.current is not None or not self.tasks.empty()
+
+    def submit(self, task: str) -> str:
+        """Queue a task, run in order after earlier ones"""
+        if self.tasks.qsize() >= self.max_pending:
+            raise SessionLimitError(f"Session {self.id} has {self.max_pending} tasks queued")
+        task_id = uuid4().hex[:12]
+        self.tasks.put_nowait((task_id, task))
+        self.channel.publish("task_queued", {"task_id": task_id, "task": task})
+        self.touch()
+        return task_id
+
+    async def run(self):
+        """Work through submitted tasks one at a time"""
+        while True:
+            task_id, task = await self.tasks.get()
+            self.current = task_id
+            self.channel.publish("task_started", {"task_id": task_id})
+            status, error = "completed", None
+            try:
+                with log_context(session=self.id):
+                    await self.agent.send_message(task)
+            except asyncio.CancelledError:
+                self.channel.publish("task_finished", {"task_id": task_id, "status": "cancelled"})
+                raise
+            except DeadlineExceeded:
+                status, error = "timed_out", "Task deadline exceeded"
+            except Exception as e:
+                logger.error(f"Task {task_id} failed: {str(e)}")
+                status, error = "failed", str(e)
+            finally:
+                self.current = None
+                self.touch()
+                # Samples from each task accumulate beside the session journal
+                get_profiler().export(SESSIONS_DIR / self.id / "profile.collapsed", self.id)
+
+            self.channel.publish(
+                "task_finished",
+                {"task_id": task_id, "status": status, "error": error}
+            )
+
+AgentFactory = Callable[[Session], Awaitable[Agent]]
+
+class SessionManager:
+    """Create, look up and evict sessions under a global limit"""
+
+    def __init__(
+        self,
+        factory: AgentFactory,
+        max_sessions: int = 16,
+        idle_timeout: float = 600.0,
+        max_pending: int = 4,
+        queue_size: int = 256,
+    ):
+        self.factory = factory
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_pending = max_pending
+        self.queue_size = queue_size
+        self.sessions: dict[str, Session] = {}
+        self.evicted = 0
+        self._evictor: Optional[asyncio.Task] = None
+
+    async def create(self, session_id: Optional[str] = None) -> Session:
+        if len(self.sessions) >= self.max_sessions:
+            raise SessionLimitError(f"Session limit of {self.max_sessions} reached")
+
+        session = Session(
+            id=session_id or uuid4().hex,
+            agent=None,
+            channel=EventChannel(self.queue_size),
+            max_pending=self.max_pending,
+        )
+        # Reserve the slot before awaiting the factory
+        self.sessions[session.id] = session
+        try:
+            session.agent = await self.factory(session)
+        except Exception:
+            del self.sessions[session.id]
+            raise
+
+        session.runner = asyncio.create_task(session.run())
+        self._ensure_evictor()
+        logger.info(f"Session {session.id} created ({len(self.sessions)} active)")
+        return session
+
+    def get(self, session_id: str) -> Optional[Session]:
+        session = self.sessions.get(session_id)
+        if session:
+            session.touch()
+        return session
+
+    async def close(self, session_id: str, reason: str = "closed"):
+        session = self.sessions.pop(session_id, None)
+        if session is None:
+            return
+
+        if session.runner:
+            session.runner.cancel()
+            try:
+                await session.runner
+            except (asyncio.CancelledError, Exception):
+                pass
+        if session.agent is not None:
+            session.agent.close()
+        session.channel.publish("session_closed", {"reason": reason})
+        session.channel.close()
+        logger.info(f"Session {session_id} {reason}")
+
+    async def close_all(self):
+        for session_id in list(self.sessions):
+            await self.close(session_id, "shutdown")
+        if self._evictor:
+            self._evictor.cancel()
+
+    def _ensure_evictor(self):
+        if self._evictor is None or self._evictor.done():
+            self._evictor = asyncio.create_task(self._evict_idle())
+
+    async def _evict_idle(self):
+        """Close sessions with no task and no activity for the idle timeout"""
+        while self.sessions:
+            await asyncio.sleep(max(self.idle_timeout / 4, 0.01))
+            now = time.monotonic()
+            for session in list(self.sessions.values()):
+                if not session.busy and now - session.last_active > self.idle_timeout:
+                    self.evicted += 1
+                    await self.close(session.id, "evicted")
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "sessions": len(self.sessions),
+            "max_sessions": self.max_sessions,
+            "busy": sum(session.busy for session in self.sessions.values()),
+            "evicted": self.evicted,
+        }
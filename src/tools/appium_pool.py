@@ -0,0 +1,301 @@
+"""Supervised pool of Appium servers shared across devices"""
+
+import asyncio
+import atexit
+import json
+import os
+import signal
+import socket
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Optional, Sequence
+
+from ..config import CONFIG
+from ..utils.logging import setup_logging
+from ..utils.resilience import RetryPolicy
+
+logger = setup_logging()
+
+BASE_PATH = "/wd/hub"
+
+class AppiumError(ConnectionError):
+    """Appium server that cannot be started"""
+
+def port_free(port: int, host: str = "127.0.0.1") -> bool:
+    """Whether a server could listen on a port, ignoring connections in TIME_WAIT"""
+    with socket.socket() as sock:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            sock.bind((host, port))
+        except OSError:
+            return False
+    return True
+
+@dataclass
+class AppiumServer:
+    """One Appium process and the devices assigned to it"""
+    slot: int
+    port: int = 0
+    process: Optional[asyncio.subprocess.Process] = field(default=None, repr=False)
+    devices: set[str] = field(default_factory=set)
+    log: deque[str] = field(default_factory=lambda: deque(maxlen=200), repr=False)
+    started: float = 0.0
+    restarts: int = 0
+    failures: int = 0  # Consecutive crashes, reset once the server stays up
+    ready: Optional[asyncio.Event] = field(default=None, repr=False)  # Bound to the supervisor loop
+    tasks: list[asyncio.Task] = field(default_factory=list, repr=False)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}{BASE_PATH}"
+
+    @property
+    def running(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+class AppiumSupervisor:
+    """Run Appium servers on their own ports, restart them and spread devices by load
+
+    Servers are started and watched on the supervisor's own event loop thread,
+    so tools on any thread or loop can share them.
+    """
+
+    def __init__(
+        self,
+        command: Sequence[str] = ("appium",),
+        size: int = 1,
+        base_port: int = 4723,
+        startup_timeout: float = 60.0,
+        stable_after: float = 60.0,
+        backoff: Optional[RetryPolicy] = None,
+    ):
+        self.command = list(command)
+        self.servers = [AppiumServer(slot) for slot in range(size)]
+        self.base_port = base_port
+        self.startup_timeout = startup_timeout
+        self.stable_after = stable_after
+        self.backoff = backoff or RetryPolicy(base_delay=1.0, max_delay=30.0)
+        self.assignments: dict[str, AppiumServer] = {}
+        self._lock = asyncio.Lock()
+        self._stopping = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+
+    def _submit(self, coro) -> asyncio.Future:
+        """Run a coroutine on the supervisor loop, awaitable from any other loop"""
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=self._loop.run_forever, name="appium-supervisor", daemon=True
+                ).start()
+        return asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self._loop))
+
+    async def acquire(self, device_id: str) -> str:
+        """URL of the server driving a device, starting one if needed"""
+        return await self._submit(self._acquire(device_id))
+
+    async def _acquire(self, device_id: str) -> str:
+        async with self._lock:
+            server = self.assignments.get(device_id)
+            if server is None:
+                # Least loaded first, an idle slot counts as empty
+                server = min(self.servers, key=lambda s: (len(s.devices), s.failures, s.slot))
+                server.devices.add(device_id)
+                self.assignments[device_id] = server
+                logger.info(f"Assigned {device_id} to Appium slot {server.slot}")
+            if server.ready is None:
+                self._stopping = False
+                await self._start(server)
+
+        try:
+            await asyncio.wait_for(server.ready.wait(), self.startup_timeout)
+        except asyncio.TimeoutError:
+            raise AppiumError(f"Appium on port {server.port} did not start: {self._tail(server)}")
+        return server.url
+
+    def release(self, device_id: str):
+        """Unassign a device; its server keeps running for the next one"""
+        if self._loop is None:
+            self._release(device_id)
+        else:
+            # Queued behind earlier calls, so a later acquire sees it
+            self._loop.call_soon_threadsafe(self._release, device_id)
+
+    def _release(self, device_id: str):
+        server = self.assignments.pop(device_id, None)
+        if server:
+            server.devices.discard(device_id)
+
+    def _allocate_port(self, server: AppiumServer) -> int:
+        """Keep a server's port across restarts, otherwise the next free one"""
+        taken = {s.port for s in self.servers if s is not server}
+        port = server.port or self.base_port + server.slot
+        while port in taken or not port_free(port):
+            port += 1
+        return port
+
+    async def _start(self, server: AppiumServer):
+        server.port = self._allocate_port(server)
+        server.ready = server.ready or asyncio.Event()
+        server.ready.clear()
+        try:
+            server.process = await asyncio.create_subprocess_exec(
+                *self.command,
+                "--address", "127.0.0.1",
+                "--port", str(server.port),
+                "--base-path", BASE_PATH,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+                # Own process group, so shutdown reaches drivers it spawns and nothing else
+                start_new_session=True,
+            )
+        except OSError as e:
+            server.ready = None
+            raise AppiumError(f"Failed to start Appium: {e}")
+
+        server.started = time.monotonic()
+        logger.info(f"Started Appium pid {server.process.pid} on port {server.port}")
+        server.tasks = [
+            asyncio.create_task(self._read_log(server, server.process)),
+            asyncio.create_task(self._wait_ready(server, server.process)),
+            asyncio.create_task(self._watch(server, server.process)),
+        ]
+
+    async def _read_log(self, server: AppiumServer, process: asyncio.subprocess.Process):
+        """Keep recent output so the pipe never fills and crashes can be explained"""
+        async for raw in process.stdout:
+            line = raw.decode(errors="replace").rstrip()
+            server.log.append(line)
+            logger.debug(f"appium:{server.port} {line}")
+
+    async def _wait_ready(self, server: AppiumServer, process: asyncio.subprocess.Process):
+        """Mark the server ready once its status endpoint says so"""
+        while process.returncode is None:
+            if await self._status_ready(server.port):
+                server.ready.set()
+                return
+            await asyncio.sleep(0.1)
+
+    @staticmethod
+    async def _status_ready(port: int) -> bool:
+        """Whether GET /status answers 200 without ready: false"""
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        except OSError:
+            return False
+        try:
+            writer.write(
+                f"GET {BASE_PATH}/status HTTP/1.0\r\nHost: 127.0.0.1:{port}\r\n\r\n".encode()
+            )
+            response = await asyncio.wait_for(reader.read(), 5.0)
+        except (OSError, asyncio.TimeoutError):
+            return False
+        finally:
+            writer.close()
+
+        head, _, body = response.partition(b"\r\n\r\n")
+        if head.split(b" ", 2)[1:2] != [b"200"]:
+            return False
+        try:
+            value = json.loads(body).get("value") or {}
+        except (ValueError, AttributeError):
+            return False
+        return not isinstance(value, dict) or value.get("ready", True) is not False
+
+    async def _watch(self, server: AppiumServer, process: asyncio.subprocess.Process):
+        """Restart a server that exits unexpectedly, backing off on repeated crashes"""
+        code = await process.wait()
+        if self._stopping or server.process is not process:
+            return
+
+        uptime = time.monotonic() - server.started
+        server.failures = 1 if uptime >= self.stable_after else server.failures + 1
+        delay = self.backoff.delay(server.failures - 1)
+        logger.warning(
+            f"Appium on port {server.port} exited with {code} after {uptime:.1f}s, "
+            f"restarting in {delay:.1f}s: {self._tail(server)}"
+        )
+        server.ready.clear()
+        await asyncio.sleep(delay)
+        if self._stopping:
+            return
+        server.restarts += 1
+        try:
+            await self._start(server)
+        except AppiumError as e:
+            logger.error(str(e))
+            server.ready = None  # The next acquire tries again
+
+    def _tail(self, server: AppiumServer, lines: int = 5) -> str:
+        return " | ".join(list(server.log)[-lines:]) or "no output"
+
+    async def stop(self, grace: float = 5.0):
+        """Terminate every server this supervisor started"""
+        if self._loop is not None:
+            await self._submit(self._stop(grace))
+
+    async def _stop(self, grace: float):
+        self._stopping = True
+        for server in self.servers:
+            process = server.process
+            if process and process.returncode is None:
+                _signal_group(process.pid, signal.SIGTERM)
+                try:
+                    await asyncio.wait_for(process.wait(), grace)
+                except asyncio.TimeoutError:
+                    _signal_group(process.pid, signal.SIGKILL)
+                    await process.wait()
+            for task in server.tasks:
+                task.cancel()
+            server.process = None
+            server.ready = None
+        self.assignments.clear()
+        for server in self.servers:
+            server.devices.clear()
+
+    def shutdown(self):
+        """Kill this supervisor's servers without an event loop, e.g. at exit"""
+        self._stopping = True
+        for server in self.servers:
+            if server.running:
+                _signal_group(server.process.pid, signal.SIGTERM)
+
+    def metrics(self) -> list[dict]:
+        return [
+            {
+                "port": server.port,
+                "running": server.running,
+                "devices": sorted(server.devices),
+                "restarts": server.restarts,
+            }
+            for server in self.servers
+        ]
+
+def _signal_group(pid: int, sig: int):
+    try:
+        os.killpg(pid, sig)
+    except ProcessLookupError:
+        pass
+
+_supervisor: Optional[AppiumSupervisor] = None
+
+def get_supervisor() -> AppiumSupervisor:
+    """Process-wide Appium supervisor"""
+    global _supervisor
+    if _supervisor is None:
+        _supervisor = AppiumSupervisor(
+            CONFIG["appium_command"].split(),
+            size=CONFIG["appium_servers"],
+            base_port=CONFIG["appium_port"],
+        )
+        atexit.register(_supervisor.shutdown)
+    return _supervisor
+
+def shutdown_supervisor():
+    """Stop Appium servers started by this process, leaving others alone"""
+    if _supervisor is not None:
+        _supervisor.shutdown()
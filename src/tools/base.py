@@ -1,36 +1,74 @@
 from abc import ABCMeta, abstractmethod
-from dataclasses import dataclass, fields, replace
+from dataclasses import dataclass, field, fields, replace
 from typing import Any, Optional
 
 from anthropic.types.beta import BetaToolUnionParam
 
+from ..utils.imaging import ImagePayload
+
 @dataclass(frozen=True)
 class ToolResult:
     """Result from tool execution"""
     output: Optional[str] = None
     error: Optional[str] = None 
-    base64_image: Optional[str] = None
+    image: Optional[ImagePayload] = None
     system: Optional[str] = None
 
+    @property
+    def base64_image(self) -> Optional[str]:
+        """Image encoded for the API, cached by the payload"""
+        return self.image.base64 if self.image else None
+
     def __bool__(self):
         return any(getattr(self, field.name) for field in fields(self))
 
     def replace(self, **kwargs):
         return replace(self, **kwargs)
 
+@dataclass
+class Preparation:
+    """Reversible work done for a tool call whose input is still streaming"""
+    tool_input: dict[str, Any]
+    state: dict[str, Any] = field(default_factory=dict)
+
+    def matches(self, tool_input: dict[str, Any]) -> bool:
+        """Check the final input agrees with what was prepared for"""
+        return all(tool_input.get(key) == value for key, value in self.tool_input.items())
+
 class ToolError(Exception):
     """Tool execution error"""
     def __init__(self, message: str):
+        super().__init__(message)
         self.message = message
 
 class BaseAnthropicTool(metaclass=ABCMeta):
     """Base class for Anthropic tools"""
+
+    # Read-only actions answered as text, without input or a screenshot
+    query_actions: frozenset[str] = frozenset()
     
     @abstractmethod
     async def __call__(self, **kwargs) -> Any:
         """Execute the tool"""
         pass
 
+    @classmethod
+    def instances(cls) -> list["BaseAnthropicTool"]:
+        """Tools of this type to offer the model"""
+        return [cls()]
+
+    async def prepare(self, **partial_input) -> Optional[Preparation]:
+        """Start safe, idempotent work for a call, None if nothing to do yet"""
+        return None
+
+    async def commit(self, preparation: Preparation, **tool_input) -> Any:
+        """Execute a prepared call with its final input"""
+        return await self(**tool_input)
+
+    async def rollback(self, preparation: Preparation):
+        """Undo preparation for a call that did not go ahead as prepared"""
+        pass
+
     @abstractmethod
     def to_params(self) -> BetaToolUnionParam:
         """Convert tool to API parameters"""
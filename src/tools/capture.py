@@ -0,0 +1,345 @@
+"""Screen capture backends"""
+
+import ctypes
+import ctypes.util
+import os
+import sys
+import threading
+from abc import ABCMeta, abstractmethod
+from itertools import cycle
+from typing import Iterable, Optional
+
+import numpy as np
+from PIL import Image
+
+from ..config import CONFIG
+from ..utils.logging import setup_logging
+from .displays import Display, display_box
+
+logger = setup_logging()
+
+class CaptureError(Exception):
+    """Capture backend unavailable or failed"""
+
+class CaptureBackend(metaclass=ABCMeta):
+    """Source of full-screen RGB frames"""
+
+    name: str
+
+    @abstractmethod
+    def grab(self) -> np.ndarray:
+        """Current screen as a height x width x 3 uint8 array"""
+
+    def image(self) -> Image.Image:
+        """Current screen as a PIL image"""
+        return Image.fromarray(self.grab())
+
+    def grab_into(self, out: np.ndarray, box: Optional[tuple[int, int, int, int]] = None):
+        """Write the screen, or a (left, top, right, bottom) box of it, into a buffer"""
+        np.copyto(out, _crop(self.grab(), box))
+
+    def grab_display(self, display: Display, desktop: tuple[int, int, int, int]) -> np.ndarray:
+        """One display, cut from a grab that spans the desktop's (x, y, width, height)"""
+        frame = self.grab()
+        return _crop(frame, display_box(display, desktop, frame.shape[1]))
+
+    def grab_display_into(
+        self,
+        out: np.ndarray,
+        display: Display,
+        desktop: tuple[int, int, int, int],
+    ):
+        """Write one display into a buffer of its pixel size"""
+        np.copyto(out, _fit(self.grab_display(display, desktop), out.shape))
+
+    def close(self):
+        pass
+
+def _crop(frame: np.ndarray, box: Optional[tuple[int, int, int, int]]) -> np.ndarray:
+    if box is None:
+        return frame
+    left, top, right, bottom = box
+    return frame[top:bottom, left:right]
+
+def _fit(frame: np.ndarray, shape: tuple[int, ...]) -> np.ndarray:
+    """Resize a frame whose source reported points rather than backing pixels"""
+    if frame.shape == shape:
+        return frame
+    return np.asarray(Image.fromarray(frame).resize((shape[1], shape[0])))
+
+class PyAutoGUIBackend(CaptureBackend):
+    """pyautogui screenshots, which may go through an external tool and a file"""
+
+    name = "pyautogui"
+
+    def __init__(self):
+        import pyautogui
+        self._screenshot = pyautogui.screenshot
+
+    def grab(self) -> np.ndarray:
+        return np.asarray(self.image())
+
+    def image(self) -> Image.Image:
+        return self._screenshot().convert("RGB")
+
+    def grab_display(self, display: Display, desktop: tuple[int, int, int, int]) -> np.ndarray:
+        if (display.x, display.y, display.width, display.height) == desktop:
+            return self.grab()
+        # pyautogui only captures the main display, so others are grabbed by their bounds
+        from PIL import ImageGrab
+
+        image = ImageGrab.grab(bbox=display.bounds, all_screens=True)
+        return np.asarray(image.convert("RGB"))
+
+class _XImage(ctypes.Structure):
+    _fields_ = [
+        ("width", ctypes.c_int),
+        ("height", ctypes.c_int),
+        ("xoffset", ctypes.c_int),
+        ("format", ctypes.c_int),
+        ("data", ctypes.c_void_p),
+        ("byte_order", ctypes.c_int),
+        ("bitmap_unit", ctypes.c_int),
+        ("bitmap_bit_order", ctypes.c_int),
+        ("bitmap_pad", ctypes.c_int),
+        ("depth", ctypes.c_int),
+        ("bytes_per_line", ctypes.c_int),
+        ("bits_per_pixel", ctypes.c_int),
+        ("red_mask", ctypes.c_ulong),
+        ("green_mask", ctypes.c_ulong),
+        ("blue_mask", ctypes.c_ulong),
+        ("obdata", ctypes.c_void_p),
+        ("funcs", ctypes.c_void_p * 6),
+    ]
+
+class _ShmSegmentInfo(ctypes.Structure):
+    _fields_ = [
+        ("shmseg", ctypes.c_ulong),
+        ("shmid", ctypes.c_int),
+        ("shmaddr", ctypes.c_void_p),
+        ("readOnly", ctypes.c_int),
+    ]
+
+_ZPIXMAP = 2
+_ALL_PLANES = 0xFFFFFFFF
+_IPC_PRIVATE = 0
+_IPC_CREAT = 0o1000
+_IPC_RMID = 0
+
+def _load(name: str) -> ctypes.CDLL:
+    path = ctypes.util.find_library(name)
+    if not path:
+        raise CaptureError(f"lib{name} not found")
+    return ctypes.CDLL(path)
+
+class X11ShmBackend(CaptureBackend):
+    """MIT-SHM grabs into a shared segment mapped straight into NumPy"""
+
+    name = "x11"
+
+    def __init__(self, display: Optional[str] = None):
+        display = display or os.environ.get("DISPLAY")
+        if not display:
+            raise CaptureError("DISPLAY is not set")
+
+        self.x11 = x11 = _load("X11")
+        self.xext = xext = _load("Xext")
+        self.libc = libc = _load("c")
+        self._declare()
+
+        self.display = x11.XOpenDisplay(display.encode())
+        if not self.display:
+            raise CaptureError(f"Cannot open display {display}")
+        self.image_ptr = None
+        self.shm = _ShmSegmentInfo(shmid=-1)
+        # The segment is shared by tools and the background capture thread
+        self.lock = threading.Lock()
+
+        try:
+            if not xext.XShmQueryExtension(self.display):
+                raise CaptureError("X server has no MIT-SHM extension")
+
+            screen = x11.XDefaultScreen(self.display)
+            self.root = x11.XRootWindow(self.display, screen)
+            self.width = x11.XDisplayWidth(self.display, screen)
+            self.height = x11.XDisplayHeight(self.display, screen)
+
+            self.image_ptr = xext.XShmCreateImage(
+                self.display,
+                x11.XDefaultVisual(self.display, screen),
+                x11.XDefaultDepth(self.display, screen),
+                _ZPIXMAP,
+                None,
+                ctypes.byref(self.shm),
+                self.width,
+                self.height,
+            )
+            if not self.image_ptr:
+                raise CaptureError("XShmCreateImage failed")
+            ximage = self.image_ptr.contents
+            if ximage.bits_per_pixel != 32:
+                raise CaptureError(f"Unsupported pixel size {ximage.bits_per_pixel}")
+
+            size = ximage.bytes_per_line * ximage.height
+            self.shm.shmid = libc.shmget(_IPC_PRIVATE, size, _IPC_CREAT | 0o600)
+            if self.shm.shmid < 0:
+                raise CaptureError("shmget failed")
+            address = libc.shmat(self.shm.shmid, None, 0)
+            if address in (None, ctypes.c_void_p(-1).value):
+                raise CaptureError("shmat failed")
+            self.shm.shmaddr = ximage.data = address
+            self.shm.readOnly = 0
+
+            if not xext.XShmAttach(self.display, ctypes.byref(self.shm)):
+                raise CaptureError("XShmAttach failed")
+            x11.XSync(self.display, 0)
+            # Removed once both sides detach, so a crash cannot leak the segment
+            libc.shmctl(self.shm.shmid, _IPC_RMID, None)
+            self.shm.shmid = -1
+
+            # BGRX rows in the shared segment, viewed without copying
+            buffer = (ctypes.c_ubyte * size).from_address(address)
+            rows = np.frombuffer(buffer, dtype=np.uint8).reshape(
+                ximage.height, ximage.bytes_per_line // 4, 4
+            )
+            self._rgb = rows[:, :ximage.width, 2::-1]
+        except Exception:
+            self.close()
+            raise
+
+    def _declare(self):
+        x11, xext, libc = self.x11, self.xext, self.libc
+        x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        x11.XOpenDisplay.restype = ctypes.c_void_p
+        x11.XDefaultScreen.argtypes = [ctypes.c_void_p]
+        for function in (
+            x11.XDisplayWidth,
+            x11.XDisplayHeight,
+            x11.XDefaultDepth,
+        ):
+            function.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XRootWindow.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XRootWindow.restype = ctypes.c_ulong
+        x11.XDefaultVisual.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XDefaultVisual.restype = ctypes.c_void_p
+        x11.XSync.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XFree.argtypes = [ctypes.c_void_p]
+        x11.XCloseDisplay.argtypes = [ctypes.c_void_p]
+
+        xext.XShmQueryExtension.argtypes = [ctypes.c_void_p]
+        xext.XShmCreateImage.argtypes = [
+            ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int,
+            ctypes.c_void_p, ctypes.POINTER(_ShmSegmentInfo),
+            ctypes.c_uint, ctypes.c_uint,
+        ]
+        xext.XShmCreateImage.restype = ctypes.POINTER(_XImage)
+        xext.XShmAttach.argtypes = [ctypes.c_void_p, ctypes.POINTER(_ShmSegmentInfo)]
+        xext.XShmDetach.argtypes = [ctypes.c_void_p, ctypes.POINTER(_ShmSegmentInfo)]
+        xext.XShmGetImage.argtypes = [
+            ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(_XImage),
+            ctypes.c_int, ctypes.c_int, ctypes.c_ulong,
+        ]
+
+        libc.shmget.argtypes = [ctypes.c_int, ctypes.c_size_t, ctypes.c_int]
+        libc.shmat.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int]
+        libc.shmat.restype = ctypes.c_void_p
+        libc.shmdt.argtypes = [ctypes.c_void_p]
+        libc.shmctl.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_void_p]
+
+    def grab(self) -> np.ndarray:
+        with self.lock:
+            if not self.xext.XShmGetImage(self.display, self.root, self.image_ptr, 0, 0, _ALL_PLANES):
+                raise CaptureError("XShmGetImage failed")
+            # The segment is reused by the next grab, so hand out a copy
+            return np.ascontiguousarray(self._rgb)
+
+    def grab_into(self, out: np.ndarray, box: Optional[tuple[int, int, int, int]] = None):
+        with self.lock:
+            if not self.xext.XShmGetImage(self.display, self.root, self.image_ptr, 0, 0, _ALL_PLANES):
+                raise CaptureError("XShmGetImage failed")
+            # Straight from shared memory into the caller's buffer
+            np.copyto(out, _crop(self._rgb, box))
+
+    def grab_display_into(
+        self,
+        out: np.ndarray,
+        display: Display,
+        desktop: tuple[int, int, int, int],
+    ):
+        # The root window spans every screen at one pixel per point
+        box = display_box(display, desktop, self.width)
+        if (box[3] - box[1], box[2] - box[0]) == out.shape[:2]:
+            self.grab_into(out, box)
+        else:
+            super().grab_display_into(out, display, desktop)
+
+    def close(self):
+        if not self.display:
+            return
+        if self.shm.shmid >= 0:
+            self.libc.shmctl(self.shm.shmid, _IPC_RMID, None)
+        if self.shm.shmaddr:
+            self.xext.XShmDetach(self.display, ctypes.byref(self.shm))
+            self.libc.shmdt(self.shm.shmaddr)
+            self.shm.shmaddr = None
+        if self.image_ptr:
+            # XDestroyImage would free the shared segment as heap memory
+            self.image_ptr.contents.data = None
+            self.x11.XFree(self.image_ptr)
+            self.image_ptr = None
+        self.x11.XCloseDisplay(self.display)
+        self.display = None
+
+class FakeBackend(CaptureBackend):
+    """Frames supplied up front, repeated in order"""
+
+    name = "fake"
+
+    def __init__(self, frames: Optional[Iterable[np.ndarray | Image.Image]] = None):
+        frames = frames or [np.zeros((800, 1280, 3), dtype=np.uint8)]
+        self.frames = [
+            np.asarray(frame.convert("RGB")) if isinstance(frame, Image.Image) else frame
+            for frame in frames
+        ]
+        self._frames = cycle(self.frames)
+        self.grabs = 0
+
+    def grab(self) -> np.ndarray:
+        self.grabs += 1
+        return next(self._frames).copy()
+
+    def grab_into(self, out: np.ndarray, box: Optional[tuple[int, int, int, int]] = None):
+        self.grabs += 1
+        np.copyto(out, _crop(next(self._frames), box))
+
+BACKENDS = {
+    PyAutoGUIBackend.name: PyAutoGUIBackend,
+    X11ShmBackend.name: X11ShmBackend,
+    FakeBackend.name: FakeBackend,
+}
+
+def create_backend(name: Optional[str] = None) -> CaptureBackend:
+    """Backend named in config, or the fastest one that works here"""
+    name = (name or CONFIG["capture_backend"]).lower()
+    if name != "auto":
+        if name not in BACKENDS:
+            raise CaptureError(f"Unknown capture backend: {name}")
+        return BACKENDS[name]()
+
+    if sys.platform.startswith("linux") and os.environ.get("DISPLAY"):
+        try:
+            return X11ShmBackend()
+        except CaptureError as e:
+            logger.warning(f"X11 shared-memory capture unavailable: {str(e)}")
+    return PyAutoGUIBackend()
+
+_backend: Optional[CaptureBackend] = None
+_backend_lock = threading.Lock()
+
+def get_backend() -> CaptureBackend:
+    """Process-wide capture backend shared by every screen tool and session"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_backend()
+        return _backend
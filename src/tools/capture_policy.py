@@ -0,0 +1,93 @@
+"""Screenshot capture policy for action results"""
+
+from collections import deque
+from dataclasses import dataclass, field
+from enum import StrEnum
+from typing import Optional
+
+from PIL import Image
+
+from ..config import CONFIG
+
+class CaptureMode(StrEnum):
+    FULL = "full"
+    THUMBNAIL = "thumbnail"
+    NONE = "none"
+
+# Quality names accepted by the screenshot action
+QUALITY_TO_MODE = {
+    "low": CaptureMode.THUMBNAIL,
+    "high": CaptureMode.FULL,
+}
+
+@dataclass
+class CapturePolicy:
+    """Decide how much image detail to return after each action"""
+    mode: CaptureMode = CaptureMode.THUMBNAIL
+    thumbnail_width: int = 640
+    adaptive: bool = True
+    window: int = 6  # Recent actions considered when adapting
+    escalate_after: int = 2  # Detail requests in the window that switch to full
+    _detail: deque[bool] = field(default_factory=deque, init=False, repr=False)
+
+    @classmethod
+    def from_config(cls) -> "CapturePolicy":
+        return cls(
+            mode=CaptureMode(CONFIG["capture_mode"]),
+            thumbnail_width=CONFIG["thumbnail_width"],
+        )
+
+    def record(self, detail: bool):
+        """Note whether the model explicitly asked for detail"""
+        self._detail.append(detail)
+        while len(self._detail) > self.window:
+            self._detail.popleft()
+
+    def after_action(self) -> CaptureMode:
+        """Capture mode for the screenshot following an action"""
+        if self.adaptive and sum(self._detail) >= self.escalate_after:
+            return CaptureMode.FULL
+        return self.mode
+
+    def for_screenshot(self, quality: Optional[str]) -> CaptureMode:
+        """Capture mode for an explicit screenshot request"""
+        if quality is not None:
+            if quality not in QUALITY_TO_MODE:
+                raise ValueError(f"Unknown screenshot quality: {quality}")
+            mode = QUALITY_TO_MODE[quality]
+            self.record(mode == CaptureMode.FULL)
+            return mode
+
+        self.record(False)
+        mode = self.after_action()
+        return CaptureMode.THUMBNAIL if mode == CaptureMode.NONE else mode
+
+    def thumbnail(self, image: Image.Image) -> tuple[Image.Image, float]:
+        """Downscale an image to thumbnail width, returning the scale used"""
+        if image.width <= self.thumbnail_width:
+            return image, 1.0
+        scale = self.thumbnail_width / image.width
+        size = (self.thumbnail_width, max(round(image.height * scale), 1))
+        return image.resize(size, Image.Resampling.LANCZOS), scale
+
+def thumbnail_note(scale: float, space: str) -> Optional[str]:
+    """Tell the model a thumbnail's coordinates are still in the full space"""
+    if scale >= 1.0:
+        return None
+    return (
+        f"Thumbnail at {scale:.2f}x; coordinates stay in {space}. "
+        "Use zoom or quality=high for detail"
+    )
+
+def clamp_region(
+    region: tuple[int, int, int, int],
+    width: int,
+    height: int,
+) -> tuple[int, int, int, int]:
+    """Clamp an (x, y, w, h) region to image bounds as a PIL box"""
+    x, y, w, h = region
+    left, top = max(x, 0), max(y, 0)
+    right, bottom = min(x + w, width), min(y + h, height)
+    if right <= left or bottom <= top:
+        raise ValueError(f"Region {region} is outside the screen")
+    return left, top, right, bottom
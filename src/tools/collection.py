@@ -1,34 +1,149 @@
 """Collection of tools for device control"""
 
-from typing import Any
+from contextlib import nullcontext
+from dataclasses import replace
+from typing import Any, Optional
 
 from anthropic.types.beta import BetaToolUnionParam
 
-from .base import BaseAnthropicTool, ToolError, ToolResult
+from ..api.ratelimit import Priority
+from ..utils.deadline import current_deadline
+from ..utils.logging import log_context
+from .base import BaseAnthropicTool, Preparation, ToolError, ToolResult
+from .capture_policy import CapturePolicy
 from .mac_tool import MacTool
+from .scheduler import get_scheduler
 from .ios_tool import IOSTool
+from .trajectory import TrajectoryRecorder
 
 class ToolCollection:
     """Collection of control tools"""
 
-    def __init__(self):
-        self.tools = [
-            MacTool(),
-            IOSTool(),
-        ]
+    def __init__(self, devices: Optional[list[str]] = None):
+        tool_types = [MacTool, IOSTool]
+        if devices is not None:
+            # Restrict a worker to the devices it owns
+            tool_types = [t for t in tool_types if t.name in devices]
+        self.tools = [tool for tool_type in tool_types for tool in tool_type.instances()]
         self.tool_map = {tool.to_params()["name"]: tool for tool in self.tools}
+        self.recorder: Optional[TrajectoryRecorder] = None
+        self.steps = 0
+        self.speculation = {"prepared": 0, "committed": 0, "rolled_back": 0}
+        self.session_id = "local"
+        self.priority = Priority.INTERACTIVE
+
+    def bind(self, session_id: str, priority: Priority):
+        """Schedule this collection's actions on behalf of a session"""
+        self.session_id = session_id
+        self.priority = priority
 
     def to_params(self) -> list[BetaToolUnionParam]:
         """Get API parameters for all tools"""
         return [tool.to_params() for tool in self.tools]
 
-    async def run(self, *, name: str, tool_input: dict[str, Any]) -> ToolResult:
-        """Execute a tool by name"""
+    def set_capture_policy(self, policy: CapturePolicy):
+        """Give each screen tool its own copy of a capture policy"""
+        for tool in self.tools:
+            tool.capture = replace(policy)
+
+    def start_recording(self) -> TrajectoryRecorder:
+        """Record successful tool calls until stopped"""
+        self.recorder = TrajectoryRecorder()
+        return self.recorder
+
+    def stop_recording(self) -> Optional[TrajectoryRecorder]:
+        """Stop recording and return what was captured"""
+        recorder, self.recorder = self.recorder, None
+        return recorder
+
+    async def prepare(
+        self,
+        name: str,
+        partial_input: dict[str, Any],
+    ) -> Optional[Preparation]:
+        """Start a tool's reversible preparation while its input streams in"""
+        tool = self.tool_map.get(name)
+        if not tool:
+            return None
+        scheduler = get_scheduler(type(tool).name)
+        async with scheduler.try_turn(self.session_id, self.priority) as turn:
+            if turn is None:
+                # Never touch a device another session is using or waiting for
+                return None
+            try:
+                preparation = await tool.prepare(**partial_input)
+            except Exception:
+                # Speculation is best effort, the real call reports errors
+                return None
+        if preparation:
+            self.speculation["prepared"] += 1
+        return preparation
+
+    async def rollback(self, name: str, preparation: Preparation):
+        """Undo preparation for a call that will not be made as prepared"""
+        self.speculation["rolled_back"] += 1
+        try:
+            await self.tool_map[name].rollback(preparation)
+        except Exception:
+            pass
+
+    async def run(
+        self,
+        *,
+        name: str,
+        tool_input: dict[str, Any],
+        preparation: Optional[Preparation] = None,
+    ) -> ToolResult:
+        """Execute a tool by name within the current task deadline"""
         tool = self.tool_map.get(name)
         if not tool:
             return ToolResult(error=f"Invalid tool: {name}")
 
+        self.steps += 1
+        scheduler = get_scheduler(type(tool).name)
+        with log_context(device=name, step=self.steps):
+            async with current_deadline().scope():
+                # Displays of one machine share its input, so they share a queue.
+                # Read-only queries skip the queue
+                turn = (
+                    nullcontext()
+                    if tool_input.get("action") in tool.query_actions
+                    else scheduler.turn(self.session_id, self.priority)
+                )
+                async with turn:
+                    if preparation and not preparation.matches(tool_input):
+                        await self.rollback(name, preparation)
+                        preparation = None
+                    return await self._run(name, tool, tool_input, preparation)
+
+    async def _run(
+        self,
+        name: str,
+        tool: BaseAnthropicTool,
+        tool_input: dict[str, Any],
+        preparation: Optional[Preparation] = None,
+    ) -> ToolResult:
+        recorder = self.recorder
+        if recorder and recorder.needs_start:
+            # Fingerprint the starting screen of the recorded task
+            start = await self._execute(tool, {"action": "screenshot"})
+            recorder.set_start(name, start)
+
+        result = await self._execute(tool, tool_input, preparation)
+        if recorder:
+            recorder.record(name, tool_input, result)
+        return result
+
+    async def _execute(
+        self,
+        tool: BaseAnthropicTool,
+        tool_input: dict[str, Any],
+        preparation: Optional[Preparation] = None,
+    ) -> ToolResult:
         try:
+            if preparation:
+                self.speculation["committed"] += 1
+                return await tool.commit(preparation, **tool_input)
             return await tool(**tool_input)
         except ToolError as e:
-            return ToolResult(error=e.message) 
\ No newline at end of file
+            return ToolResult(error=e.message)
@@ -1,7 +1,8 @@
 """Device management and coordination"""
 
 import asyncio
-from typing import Dict, Optional
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Iterable, Optional
 
 from ..utils.state import DeviceStatus, StateManager
 from ..utils.logging import setup_logging
@@ -10,6 +11,16 @@ from .system_tool import SystemTool
 
 logger = setup_logging()
 
+@dataclass
+class Heartbeat:
+    """Periodic liveness probe for one device"""
+    probe: Callable[[], Awaitable[bool]]
+    interval: float = 5.0
+    timeout: float = 3.0
+    max_misses: int = 2
+    misses: int = 0
+    task: Optional[asyncio.Task] = field(default=None, repr=False)
+
 class DeviceManager:
     """Coordinate device connections and states"""
     
@@ -17,6 +28,83 @@ class DeviceManager:
         self.state = StateManager()
         self.ios_connection = IOSConnectionManager()
         self.system_tool = SystemTool()
+        self.heartbeats: Dict[str, Heartbeat] = {}
+
+    def register_probe(
+        self,
+        device_type: str,
+        probe: Callable[[], Awaitable[bool]],
+        interval: float = 5.0,
+    ):
+        """Add or replace the liveness probe for a device"""
+        self.stop_heartbeats([device_type])
+        self.heartbeats[device_type] = Heartbeat(probe, interval=interval)
+
+    def watch_tools(self, tools: Iterable, interval: float = 5.0):
+        """Probe each device through the first tool that drives it"""
+        for tool in tools:
+            device_type = type(tool).name
+            if device_type in self.heartbeats or not hasattr(tool, "heartbeat"):
+                continue
+            if device_type == "ios" and not self.ios_connection.is_configured:
+                continue
+            self.register_probe(device_type, tool.heartbeat, interval=interval)
+            self.state.update(device_type, DeviceStatus.CONNECTED)
+
+    def start_heartbeats(self):
+        """Probe each device in the background"""
+        for device_type, heartbeat in self.heartbeats.items():
+            if heartbeat.task is None or heartbeat.task.done():
+                heartbeat.task = asyncio.create_task(
+                    self._heartbeat(device_type, heartbeat)
+                )
+
+    def stop_heartbeats(self, devices: Optional[list] = None):
+        for device_type, heartbeat in self.heartbeats.items():
+            if devices is not None and device_type not in devices:
+                continue
+            if heartbeat.task:
+                heartbeat.task.cancel()
+                heartbeat.task = None
+
+    async def _heartbeat(self, device_type: str, heartbeat: Heartbeat):
+        """Probe a device until stopped; one bad beat never ends the loop"""
+        while True:
+            await asyncio.sleep(heartbeat.interval)
+            try:
+                await self._beat(device_type, heartbeat)
+            except Exception as e:
+                logger.warning(f"{device_type} heartbeat failed: {str(e)}")
+
+    async def _beat(self, device_type: str, heartbeat: Heartbeat):
+        """Mark a device lost after missed probes, recovered once one answers"""
+        state = self.state.get(device_type)
+        if state.status in (DeviceStatus.CONNECTING, DeviceStatus.DISCONNECTED):
+            return
+
+        try:
+            alive = await asyncio.wait_for(heartbeat.probe(), heartbeat.timeout)
+        except Exception:
+            alive = False
+
+        if alive:
+            heartbeat.misses = 0
+            if state.status == DeviceStatus.ERROR:
+                logger.info(f"{device_type} answers heartbeats again")
+                self.state.update(device_type, DeviceStatus.CONNECTED)
+            return
+
+        heartbeat.misses += 1
+        if state.status == DeviceStatus.CONNECTED:
+            if heartbeat.misses < heartbeat.max_misses:
+                return
+            logger.warning(f"{device_type} missed {heartbeat.misses} heartbeats")
+            self.state.update(device_type, DeviceStatus.ERROR, "Heartbeat lost")
+            heartbeat.misses = 0
+
+        # Reconnect now rather than when the next action arrives
+        if device_type == "ios" and self.ios_connection.is_configured:
+            await self.ensure_device_ready(device_type)
         
     async def initialize(self):
         """Initialize device connections"""
@@ -48,7 +136,8 @@ class DeviceManager:
             except Exception as e:
                 self.state.update_ios_state(DeviceStatus.ERROR, str(e))
                 logger.error(f"Failed to connect iOS device: {e}")
-                
+
+        self.start_heartbeats()
         return True
         
     async def ensure_device_ready(self, device_type: str) -> bool:
@@ -0,0 +1,204 @@
+"""Display topology and coordinate transforms"""
+
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from ..config import MAX_SCALING_TARGETS
+from ..utils.logging import setup_logging
+
+logger = setup_logging()
+
+# Largest aspect ratio difference a scaling target may have from the display
+ASPECT_TOLERANCE = 0.02
+
+@dataclass(frozen=True)
+class Display:
+    """One monitor in global point coordinates"""
+    number: int
+    x: int
+    y: int
+    width: int  # Points
+    height: int
+    scale: float = 1.0  # Backing pixels per point, 2.0 on Retina
+
+    @property
+    def bounds(self) -> tuple[int, int, int, int]:
+        """Global (left, top, right, bottom) in points"""
+        return self.x, self.y, self.x + self.width, self.y + self.height
+
+    @property
+    def pixel_size(self) -> tuple[int, int]:
+        """Width and height of a full-resolution capture"""
+        return round(self.width * self.scale), round(self.height * self.scale)
+
+def display_box(
+    display: Display,
+    desktop: tuple[int, int, int, int],
+    frame_width: int,
+) -> tuple[int, int, int, int]:
+    """Pixel box of a display within a frame spanning the desktop's (x, y, width, height)"""
+    left, top, width, _ = desktop
+    ratio = frame_width / width
+    x, y = round((display.x - left) * ratio), round((display.y - top) * ratio)
+    return x, y, x + round(display.width * ratio), y + round(display.height * ratio)
+
+@dataclass(frozen=True, slots=True)
+class Transform:
+    """Axis-aligned affine map (x * sx + tx, y * sy + ty)"""
+    sx: float
+    sy: float
+    tx: float = 0.0
+    ty: float = 0.0
+
+    def apply(self, x: float, y: float) -> tuple[int, int]:
+        return round(x * self.sx + self.tx), round(y * self.sy + self.ty)
+
+    def apply_size(self, width: float, height: float) -> tuple[int, int]:
+        """Map a width and height, which ignore the translation"""
+        return round(width * self.sx), round(height * self.sy)
+
+    def inverse(self) -> "Transform":
+        return Transform(1 / self.sx, 1 / self.sy, -self.tx / self.sx, -self.ty / self.sy)
+
+def scaling_target(width: int, height: int) -> tuple[int, int]:
+    """Largest target no bigger than the display with the same aspect ratio"""
+    ratio = width / height
+    candidates = [
+        target for target in MAX_SCALING_TARGETS.values()
+        if target["width"] <= width
+        and target["height"] <= height
+        and abs(target["width"] / target["height"] - ratio) < ASPECT_TOLERANCE
+    ]
+    if not candidates:
+        # Scaling would distort the screen, so the model works in points
+        return width, height
+    best = max(candidates, key=lambda target: target["width"])
+    return best["width"], best["height"]
+
+@dataclass(frozen=True)
+class DisplayMapping:
+    """Precomputed transforms between model and screen coordinates"""
+    display: Display
+    target: tuple[int, int]  # Size the model sees
+    to_screen: Transform  # Model to global points
+    from_screen: Transform  # Global points to model
+    to_local: Transform  # Model to points within the display
+
+    @classmethod
+    def for_display(cls, display: Display, scaling: bool = True) -> "DisplayMapping":
+        if scaling:
+            target = scaling_target(display.width, display.height)
+        else:
+            target = (display.width, display.height)
+        sx, sy = display.width / target[0], display.height / target[1]
+        to_screen = Transform(sx, sy, display.x, display.y)
+        return cls(display, target, to_screen, to_screen.inverse(), Transform(sx, sy))
+
+    @property
+    def scaled(self) -> bool:
+        return self.target != (self.display.width, self.display.height)
+
+def _quartz_displays() -> list[Display]:
+    """Active displays from Quartz, main display first"""
+    import Quartz
+
+    _, display_ids, count = Quartz.CGGetActiveDisplayList(16, None, None)
+    displays = []
+    for number, display_id in enumerate(display_ids[:count]):
+        bounds = Quartz.CGDisplayBounds(display_id)
+        mode = Quartz.CGDisplayCopyDisplayMode(display_id)
+        points = Quartz.CGDisplayModeGetWidth(mode)
+        scale = Quartz.CGDisplayModeGetPixelWidth(mode) / points if points else 1.0
+        displays.append(Display(
+            number,
+            int(bounds.origin.x),
+            int(bounds.origin.y),
+            int(bounds.size.width),
+            int(bounds.size.height),
+            scale,
+        ))
+    return displays
+
+def _primary_display() -> list[Display]:
+    """Single display reported by pyautogui"""
+    import pyautogui
+
+    width, height = pyautogui.size()
+    return [Display(0, 0, 0, width, height)]
+
+def enumerate_displays() -> list[Display]:
+    """Displays from the best source available on this platform"""
+    try:
+        displays = _quartz_displays()
+        if displays:
+            return displays
+    except ImportError:
+        pass
+    except Exception as e:
+        logger.warning(f"Quartz display query failed: {str(e)}")
+    return _primary_display()
+
+class DisplayTopology:
+    """Cached displays and mappings, re-enumerated when stale"""
+
+    def __init__(
+        self,
+        enumerate: Callable[[], list[Display]] = enumerate_displays,
+        ttl: float = 2.0,
+        scaling: bool = True,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._enumerate = enumerate
+        self.ttl = ttl
+        self.scaling = scaling
+        self.clock = clock
+        self.generation = 0
+        self.displays: tuple[Display, ...] = ()
+        self.mappings: dict[int, DisplayMapping] = {}
+        self.bounds = (0, 0, 0, 0)
+        self._checked = float("-inf")
+        self.refresh()
+
+    def refresh(self) -> bool:
+        """Enumerate displays, returning True if the layout changed"""
+        self._checked = self.clock()
+        displays = tuple(self._enumerate())
+        if not displays:
+            raise RuntimeError("No displays found")
+        if displays == self.displays:
+            return False
+
+        if self.displays:
+            logger.info(f"Display layout changed: {len(displays)} displays")
+        self.displays = displays
+        self.mappings = {
+            display.number: DisplayMapping.for_display(display, self.scaling)
+            for display in displays
+        }
+        left = min(display.x for display in displays)
+        top = min(display.y for display in displays)
+        right = max(display.x + display.width for display in displays)
+        bottom = max(display.y + display.height for display in displays)
+        self.bounds = (left, top, right - left, bottom - top)
+        self.generation += 1
+        return True
+
+    def mapping(self, number: int) -> Optional[DisplayMapping]:
+        """Current mapping for a display, None if it is gone"""
+        if self.clock() - self._checked >= self.ttl:
+            self.refresh()
+        return self.mappings.get(number)
+
+    def frame_box(self, number: int, frame_width: int) -> tuple[int, int, int, int]:
+        """Pixel box of a display within a frame of the whole desktop"""
+        return display_box(self.mappings[number].display, self.bounds, frame_width)
+
+_topology: Optional[DisplayTopology] = None
+
+def get_topology() -> DisplayTopology:
+    """Process-wide display topology"""
+    global _topology
+    if _topology is None:
+        _topology = DisplayTopology()
+    return _topology
@@ -0,0 +1,189 @@
+"""Background display capture into a preallocated ring buffer"""
+
+import asyncio
+import threading
+import time
+import zlib
+from typing import Callable, Hashable, Optional
+
+import numpy as np
+
+from ..utils.logging import setup_logging
+
+logger = setup_logging()
+
+class FrameRing:
+    """Last frames with capture times and sample hashes, in fixed buffers"""
+
+    def __init__(self, capacity: int, shape: tuple[int, ...], sample_step: int = 16):
+        self.capacity = capacity
+        self.shape = shape
+        self.step = sample_step
+
+        # One spare buffer, so the writer fills a frame no reader can see
+        self.buffers = np.zeros((capacity + 1, *shape), dtype=np.uint8)
+        sample_shape = self.buffers[0, ::sample_step, ::sample_step].shape
+        self.samples = np.zeros((capacity + 1, *sample_shape), dtype=np.uint8)
+        self.slots = np.arange(capacity)  # Buffer holding each ring position
+        self.times = np.full(capacity, -np.inf)
+        self.hashes = np.zeros(capacity, dtype=np.uint32)
+        self.spare = capacity
+        self.written = 0
+        self.lock = threading.Lock()
+
+    def writable(self) -> np.ndarray:
+        """Buffer for the next frame, only touched by the writer"""
+        return self.buffers[self.spare]
+
+    def commit(self, timestamp: float) -> bool:
+        """Publish the writable buffer, returning True if the screen changed"""
+        buffer = self.spare
+        sample = self.samples[buffer]
+        np.copyto(sample, self.buffers[buffer, ::self.step, ::self.step])
+        digest = zlib.crc32(sample)
+
+        with self.lock:
+            changed = not self.written or digest != self.hashes[(self.written - 1) % self.capacity]
+            position = self.written % self.capacity
+            self.spare = int(self.slots[position])
+            self.slots[position] = buffer
+            self.times[position] = timestamp
+            self.hashes[position] = digest
+            self.written += 1
+        return changed
+
+    def _newer(self, since: float) -> list[int]:
+        """Buffers captured after a moment, oldest first; caller holds the lock"""
+        start = max(self.written - self.capacity, 0)
+        return [
+            int(self.slots[index % self.capacity])
+            for index in range(start, self.written)
+            if self.times[index % self.capacity] > since
+        ]
+
+    def stable_after(self, since: float, threshold: float = 0.002) -> Optional[np.ndarray]:
+        """First frame after a moment that the next frame did not change"""
+        with self.lock:
+            newer = self._newer(since)
+            for current, following in zip(newer, newer[1:]):
+                a, b = self.samples[current], self.samples[following]
+                changed = np.mean(np.abs(a.astype(np.int16) - b) > 12)
+                if changed <= threshold:
+                    return self.buffers[current].copy()
+        return None
+
+    def latest_after(self, since: float) -> Optional[np.ndarray]:
+        with self.lock:
+            newer = self._newer(since)
+            return self.buffers[newer[-1]].copy() if newer else None
+
+class BackgroundCapture:
+    """Capture thread feeding a ring, fast after input and slow when idle"""
+
+    def __init__(
+        self,
+        grab_into: Callable[[np.ndarray], None],
+        shape: tuple[int, ...],
+        capacity: int = 8,
+        min_interval: float = 0.05,
+        max_interval: float = 1.0,
+        active_period: float = 2.0,
+        max_duty: float = 0.25,
+    ):
+        self.grab_into = grab_into
+        self.ring = FrameRing(capacity, shape)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.active_period = active_period
+        self.max_duty = max_duty  # Share of one core capture may use
+        self.interval = min_interval
+        self.last_input = float("-inf")
+        self.thread: Optional[threading.Thread] = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+
+    @property
+    def running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def poke(self):
+        """Input is about to happen, capture at full rate"""
+        self.last_input = time.monotonic()
+        self.interval = self.min_interval
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            failed = False
+            try:
+                self.grab_into(self.ring.writable())
+                changed = self.ring.commit(started)
+            except Exception as e:
+                logger.warning(f"Background capture failed: {str(e)}")
+                changed, failed = False, True
+            cost = time.monotonic() - started
+
+            if failed:
+                # Back off even right after input, or a broken screen is hammered
+                self.interval = self.max_interval
+            elif changed or started - self.last_input < self.active_period:
+                self.interval = self.min_interval
+            else:
+                self.interval = min(self.interval * 2, self.max_interval)
+
+            delay = max(self.interval, cost / self.max_duty) - cost
+            self._wake.wait(max(delay, 0.0))
+            self._wake.clear()
+
+    async def frame_after(self, since: float, timeout: float) -> Optional[np.ndarray]:
+        """First stable frame captured after a moment, or the latest at the timeout"""
+        deadline = time.monotonic() + timeout
+        while True:
+            frame = self.ring.stable_after(since)
+            if frame is not None:
+                return frame
+            if time.monotonic() >= deadline:
+                return self.ring.latest_after(since)
+            await asyncio.sleep(self.min_interval)
+
+# One capture per screen and display, whichever tools and sessions watch it
+_captures: dict[Hashable, tuple[Hashable, BackgroundCapture]] = {}
+_captures_lock = threading.Lock()
+
+def shared_capture(
+    key: Hashable,
+    layout: Hashable,
+    grab_into: Callable[[np.ndarray], None],
+    shape: tuple[int, ...],
+    capacity: int = 8,
+) -> BackgroundCapture:
+    """Running capture for a display, replaced when its layout changes"""
+    with _captures_lock:
+        current = _captures.get(key)
+        if current and current[0] == layout and current[1].running:
+            return current[1]
+        if current:
+            current[1].stop()
+        capture = BackgroundCapture(grab_into, shape, capacity)
+        capture.start()
+        _captures[key] = (layout, capture)
+        return capture
+
+def stop_captures():
+    """Stop every shared capture thread"""
+    with _captures_lock:
+        captures = [capture for _, capture in _captures.values()]
+        _captures.clear()
+    for capture in captures:
+        capture.stop()
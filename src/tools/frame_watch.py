@@ -0,0 +1,106 @@
+"""Local frame watching for wait-until actions"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from enum import StrEnum
+from typing import Callable, Optional
+
+import numpy as np
+
+from ..utils.deadline import current_deadline
+from .locator import TemplateLocator, downsample
+
+class WaitCondition(StrEnum):
+    CHANGE = "change"
+    REGION_CHANGE = "region_change"
+    MATCH = "match"
+    STABLE = "stable"
+
+@dataclass
+class WaitOutcome:
+    """Result of watching frames for a condition"""
+    met: bool
+    elapsed: float
+    frames: int
+
+    def describe(self, condition: WaitCondition) -> str:
+        if self.met:
+            return f"Condition {condition} met after {self.elapsed:.1f}s ({self.frames} frames)"
+        return f"Timed out waiting for {condition} after {self.elapsed:.1f}s"
+
+def frame_difference(a: np.ndarray, b: np.ndarray, tolerance: float = 12.0) -> float:
+    """Fraction of pixels that changed between two frames"""
+    return float(np.mean(np.abs(a - b) > tolerance))
+
+def crop(frame: np.ndarray, region: Optional[tuple[int, int, int, int]]) -> np.ndarray:
+    """Crop a frame to an (x, y, w, h) region"""
+    if region is None:
+        return frame
+    x, y, w, h = region
+    return frame[y:y + h, x:x + w]
+
+class FrameWatcher:
+    """Poll frames locally until a condition holds"""
+
+    def __init__(
+        self,
+        grab: Callable[[], np.ndarray],
+        locator: Optional[TemplateLocator] = None,
+        change_threshold: float = 0.002,
+        stable_frames: int = 3,
+        pyramid: int = 4,
+    ):
+        self.grab = grab
+        self.locator = locator
+        self.change_threshold = change_threshold
+        self.stable_frames = stable_frames
+        self.pyramid = pyramid
+
+    async def wait(
+        self,
+        condition: WaitCondition,
+        region: Optional[tuple[int, int, int, int]] = None,
+        label: Optional[str] = None,
+        timeout: float = 10.0,
+        interval: float = 0.25,
+    ) -> WaitOutcome:
+        """Watch frames until the condition is met or the timeout expires"""
+        if condition == WaitCondition.REGION_CHANGE and region is None:
+            raise ValueError("Region required for region_change")
+        if condition == WaitCondition.MATCH and (label is None or self.locator is None):
+            raise ValueError("Template label required for match")
+
+        start = time.monotonic()
+        deadline = start + min(timeout, current_deadline().remaining())
+        frames = 0
+        baseline: Optional[np.ndarray] = None
+        stable = 0
+
+        while True:
+            # Grabbing blocks, so keep it off the event loop
+            frame = await asyncio.to_thread(self.grab)
+            frames += 1
+
+            if condition == WaitCondition.MATCH:
+                if self.locator.find(label, frame, region) is not None:
+                    return WaitOutcome(True, time.monotonic() - start, frames)
+            else:
+                small = downsample(crop(frame, region), self.pyramid)
+                if baseline is not None:
+                    changed = frame_difference(baseline, small) > self.change_threshold
+                    if condition == WaitCondition.STABLE:
+                        stable = 0 if changed else stable + 1
+                        if stable >= self.stable_frames:
+                            return WaitOutcome(True, time.monotonic() - start, frames)
+                    elif changed:
+                        return WaitOutcome(True, time.monotonic() - start, frames)
+
+                # Stability compares consecutive frames, change compares the first
+                if baseline is None or condition == WaitCondition.STABLE:
+                    baseline = small
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return WaitOutcome(False, time.monotonic() - start, frames)
+            await asyncio.sleep(min(interval, remaining))
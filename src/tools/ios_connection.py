@@ -2,43 +2,41 @@
 
 import asyncio
 import atexit
-import subprocess
 from typing import Optional
 
 from appium import webdriver
 from appium.webdriver.webdriver import WebDriver
 
 from ..config import CONFIG
+from ..utils.deadline import current_deadline
+from .appium_pool import get_supervisor
 
 class IOSConnectionManager:
     """Manages Appium server and device connections"""
     
     def __init__(self):
         self.driver: Optional[WebDriver] = None
-        self.appium_process: Optional[subprocess.Popen] = None
+        self.device_id = CONFIG["ios_device_id"] or "simulator"
+        self.server_url: Optional[str] = None
         self._setup_cleanup()
 
+    @property
+    def is_configured(self) -> bool:
+        """Check whether an iOS device has been configured"""
+        return bool(CONFIG["ios_device_id"])
+
     def _setup_cleanup(self):
         """Ensure cleanup on exit"""
         atexit.register(self.cleanup)
 
-    async def ensure_appium_running(self):
-        """Start Appium server if not running"""
-        if self.appium_process is None:
-            try:
-                self.appium_process = subprocess.Popen(
-                    ["appium"],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE
-                )
-                # Wait for server to start
-                await asyncio.sleep(5)
-            except Exception as e:
-                raise ConnectionError(f"Failed to start Appium: {e}")
+    async def ensure_appium_running(self) -> str:
+        """URL of the Appium server assigned to this device, started if needed"""
+        self.server_url = await get_supervisor().acquire(self.device_id)
+        return self.server_url
 
     async def connect_device(self) -> WebDriver:
         """Connect to iOS device/simulator"""
-        await self.ensure_appium_running()
+        url = await self.ensure_appium_running()
         
         capabilities = {
             'platformName': 'iOS',
@@ -50,9 +48,14 @@ class IOSConnectionManager:
             capabilities['udid'] = device_id
 
         try:
-            self.driver = webdriver.Remote(
-                'http://localhost:4723/wd/hub',
-                capabilities
+            # Session creation is a blocking HTTP call, bound it by the deadline
+            self.driver = await asyncio.wait_for(
+                asyncio.to_thread(
+                    webdriver.Remote,
+                    url,
+                    capabilities
+                ),
+                current_deadline().timeout(cap=120),
             )
             return self.driver
         except Exception as e:
@@ -67,9 +70,7 @@ class IOSConnectionManager:
                 pass
             self.driver = None
 
-        if self.appium_process:
-            try:
-                self.appium_process.terminate()
-            except:
-                pass
-            self.appium_process = None 
\ No newline at end of file
+        if self.server_url:
+            # The server stays up for other devices, the supervisor stops it at exit
+            get_supervisor().release(self.device_id)
+            self.server_url = None
@@ -1,81 +1,276 @@
 import asyncio
-import base64
+from io import BytesIO
+from pathlib import Path
 from typing import Literal
 from uuid import uuid4
 
+import numpy as np
 from appium import webdriver
 from anthropic.types.beta import BetaToolComputerUse20241022Param
+from PIL import Image
 
-from ..config import TEMP_DIR
-from .base import BaseAnthropicTool, ToolError, ToolResult
+from ..config import CONFIG, TEMP_DIR
+from ..utils.deadline import current_deadline
+from ..utils.imaging import ImagePayload
+from ..utils.resilience import (
+    ErrorClass,
+    RetryPolicy,
+    after_input,
+    classify,
+    get_breaker,
+    retry_async,
+)
+from .appium_pool import get_supervisor
+from .base import BaseAnthropicTool, Preparation, ToolError, ToolResult
+from .capture_policy import CaptureMode, CapturePolicy, clamp_region, thumbnail_note
+from .frame_watch import FrameWatcher, WaitCondition
+from .locator import TemplateLocator, to_gray
+from .queries import shared_cache
+from .text_entry import IOSTextEntry
 
 class IOSTool(BaseAnthropicTool):
     """Tool for controlling iOS devices"""
     
     name: Literal["ios"] = "ios"
     api_type: Literal["computer_20241022"] = "computer_20241022"
+    query_actions = frozenset({
+        "get_current_app",
+        "get_orientation",
+        "get_device_state",
+        "get_screen_size",
+    })
+
+    # XCUITest battery states
+    BATTERY_STATES = {1: "unplugged", 2: "charging", 3: "full"}
 
     def __init__(self):
         self.driver = None
         self._screenshot_delay = 0.5
+        self.locator = TemplateLocator()
+        self.capture = CapturePolicy.from_config()
+        self.retry_policy = RetryPolicy()
+        # One breaker and query cache per device, so a lost phone does not trip the others
+        device = f"{self.name}:{CONFIG['ios_device_id'] or 'simulator'}"
+        self.breaker = get_breaker(device, probe=self._probe)
+        self._last_screenshot: Path | None = None
+        self.query_cache = shared_cache(device)
 
     async def __call__(
         self,
         *,
         action: Literal[
             "tap",
-            "type", 
+            "type",
+            "key",
             "screenshot",
+            "get_current_app",
+            "get_orientation",
+            "get_device_state",
+            "get_screen_size",
             "swipe",
             "launch_app",
-            "close_app"
+            "close_app",
+            "find",
+            "click_template",
+            "wait",
+            "zoom",
         ],
         text: str | None = None,
         position: tuple[int, int] | None = None,
         app_id: str | None = None,
+        label: str | None = None,
+        quality: Literal["low", "high"] | None = None,
+        condition: str | None = None,
+        region: tuple[int, int, int, int] | None = None,
+        timeout: float = 10.0,
+        interval: float = 0.25,
         **kwargs
     ) -> ToolResult:
         try:
-            if not self.driver:
-                await self._init_driver()
-
+            mode = None
             if action == "screenshot":
-                return await self._take_screenshot()
-
-            if action in ("tap", "swipe"):
-                if not position:
-                    raise ToolError("Position required for touch actions")
-                    
-                if action == "tap":
-                    self.driver.tap([position])
-                else:
-                    # Implement swipe
-                    pass
-                    
-                return await self._take_screenshot()
+                mode = self.capture.for_screenshot(quality)
+            elif action == "zoom":
+                if region is None:
+                    raise ToolError("Region required for zoom")
+                self.capture.record(True)
+            elif action not in self.query_actions:
+                self.capture.record(False)
 
-            if action == "type":
-                if not text:
-                    raise ToolError("Text required for keyboard actions")
-                self.driver.keyboard.send_keys(text)
-                return await self._take_screenshot()
-
-            if action in ("launch_app", "close_app"):
-                if not app_id:
-                    raise ToolError("App ID required")
-                    
-                if action == "launch_app":
-                    self.driver.activate_app(app_id)
-                else:
-                    self.driver.terminate_app(app_id)
-                    
-                return await self._take_screenshot()
-
-            raise ToolError(f"Unknown action: {action}")
+            # Transient failures back off and retry, a lost device fails fast
+            return await retry_async(
+                lambda: self._execute_action(
+                    action,
+                    mode=mode,
+                    text=text,
+                    position=position,
+                    app_id=app_id,
+                    label=label,
+                    condition=condition,
+                    region=region,
+                    timeout=timeout,
+                    interval=interval,
+                ),
+                self.retry_policy,
+                self.breaker,
+            )
 
         except Exception as e:
+            if classify(e) == ErrorClass.DEVICE_LOST:
+                self.driver = None  # Reconnect on the next call
             return ToolResult(error=str(e))
 
+    async def prepare(self, action: str | None = None, **partial_input) -> Preparation | None:
+        """Acquire the driver while the rest of the input streams in"""
+        if action is None or not self.breaker.allow():
+            return None
+        if not self.driver:
+            await self._init_driver()
+        return Preparation({"action": action})
+
+    async def _execute_action(
+        self,
+        action: str,
+        *,
+        mode: CaptureMode | None,
+        text: str | None,
+        position: tuple[int, int] | None,
+        app_id: str | None,
+        label: str | None,
+        condition: str | None,
+        region: tuple[int, int, int, int] | None,
+        timeout: float,
+        interval: float,
+    ) -> ToolResult:
+        """Execute the requested action"""
+        if not self.driver:
+            await self._init_driver()
+
+        if action in self.query_actions:
+            return await self._query(action)
+        if action not in ("screenshot", "zoom", "wait"):
+            # Input may change the foreground app or rotate the screen
+            self.query_cache.clear()
+
+        if action == "screenshot":
+            return await self._take_screenshot(mode)
+
+        if action == "zoom":
+            if region is None:
+                raise ToolError("Region required for zoom")
+            return await self._zoom(region)
+
+        if action in ("tap", "swipe"):
+            if not position:
+                raise ToolError("Position required for touch actions")
+                
+            if action == "tap":
+                self._remember_target(*position, label)
+                self.driver.tap([position])
+            else:
+                # Implement swipe
+                pass
+                
+            return await after_input(self._take_screenshot())
+
+        if action in ("find", "click_template"):
+            label = label or "last_click"
+            x, y, score = self._find_template(label)
+
+            if action == "find":
+                return ToolResult(
+                    output=f"Found {label} at ({x}, {y}), score {score:.2f}"
+                )
+
+            self.driver.tap([(x, y)])
+            return await after_input(self._take_screenshot())
+
+        if action == "wait":
+            return await self._wait(
+                WaitCondition(condition or "change"),
+                region,
+                label,
+                timeout,
+                interval,
+            )
+
+        if action in ("type", "key"):
+            if not text:
+                raise ToolError("Text required for keyboard actions")
+
+            entry = IOSTextEntry(self.driver)
+            if action == "type":
+                await entry.type(text)
+            else:
+                await entry.press(text)
+            return await after_input(self._take_screenshot())
+
+        if action in ("launch_app", "close_app"):
+            if not app_id:
+                raise ToolError("App ID required")
+                
+            if action == "launch_app":
+                self.driver.activate_app(app_id)
+            else:
+                self.driver.terminate_app(app_id)
+                
+            return await after_input(self._take_screenshot())
+
+        raise ToolError(f"Unknown action: {action}")
+
+    async def _query(self, action: str) -> ToolResult:
+        """Answer a state query as text, without a screenshot"""
+        driver = self.driver
+
+        if action == "get_current_app":
+            info = await self.query_cache.get(
+                "current_app", 1.0, lambda: driver.execute_script("mobile: activeAppInfo")
+            )
+            app = info.get("bundleId", "unknown")
+            if name := info.get("name"):
+                app = f"{name} ({app})"
+            return ToolResult(output=f"Current app: {app}")
+
+        if action == "get_orientation":
+            orientation = await self.query_cache.get("orientation", 2.0, lambda: driver.orientation)
+            return ToolResult(output=f"Orientation: {orientation.lower()}")
+
+        if action == "get_device_state":
+            battery = await self.query_cache.get(
+                "battery", 30.0, lambda: driver.execute_script("mobile: batteryInfo")
+            )
+            locked = await self.query_cache.get("locked", 2.0, driver.is_locked)
+            level = battery.get("level", -1)
+            state = self.BATTERY_STATES.get(battery.get("state"), "unknown")
+            charge = f"{level:.0%}" if level >= 0 else "unknown"
+            return ToolResult(output=(
+                f"Battery {charge}, {state}; screen {'locked' if locked else 'unlocked'}"
+            ))
+
+        if action == "get_screen_size":
+            size = await self.query_cache.get("screen_size", 60.0, driver.get_window_size)
+            return ToolResult(output=f"Screen {size['width']}x{size['height']} points")
+
+        raise ToolError(f"Unknown query: {action}")
+
+    async def _probe(self) -> bool:
+        """Check the device session still answers"""
+        if not self.driver:
+            await self._init_driver()
+        await asyncio.to_thread(self.driver.get_window_size)
+        return True
+
+    async def heartbeat(self) -> bool:
+        """Check an open session still answers, dropping it if not"""
+        if self.driver is None:
+            return True  # Nothing to lose yet; the next action connects
+        try:
+            await asyncio.to_thread(self.driver.get_window_size)
+        except Exception:
+            self.driver = None  # The next action starts a fresh session
+            raise
+        return True
+
     def to_params(self) -> BetaToolComputerUse20241022Param:
         return {
             "type": self.api_type,
@@ -93,22 +288,112 @@ class IOSTool(BaseAnthropicTool):
             'deviceName': 'iPhone Simulator',
             # Add more capabilities as needed
         }
+        url = await get_supervisor().acquire(CONFIG["ios_device_id"] or "simulator")
         
-        self.driver = webdriver.Remote(
-            'http://localhost:4723/wd/hub',
-            caps
+        # Session creation is a blocking HTTP call, bound it by the deadline
+        self.driver = await asyncio.wait_for(
+            asyncio.to_thread(webdriver.Remote, url, caps),
+            current_deadline().timeout(cap=120),
         )
 
-    async def _take_screenshot(self) -> ToolResult:
+    async def _take_screenshot(self, mode: CaptureMode | None = None) -> ToolResult:
         """Take and save device screenshot"""
+        mode = mode or self.capture.after_action()
+        if mode == CaptureMode.NONE:
+            self._last_screenshot = None
+            return ToolResult(output="Screenshot skipped by capture policy")
+
         path = TEMP_DIR / f"ios_screenshot_{uuid4().hex}.png"
         
-        try:
-            self.driver.get_screenshot_as_file(str(path))
-            await asyncio.sleep(self._screenshot_delay)
-            
-            return ToolResult(
-                base64_image=base64.b64encode(path.read_bytes()).decode()
-            )
-        except Exception as e:
-            return ToolResult(error=f"Screenshot failed: {e}") 
\ No newline at end of file
+        self.driver.get_screenshot_as_file(str(path))
+        self._last_screenshot = path
+        await asyncio.sleep(current_deadline().timeout(cap=self._screenshot_delay))
+
+        output = None
+        if mode == CaptureMode.THUMBNAIL:
+            img, scale = self.capture.thumbnail(Image.open(path))
+            if scale < 1.0:
+                size = self.driver.get_window_size()
+                output = thumbnail_note(scale, f"{size['width']}x{size['height']} points")
+                path = path.with_name(f"{path.stem}_thumb.png")
+                img.save(path)
+        
+        return ToolResult(
+            output=output,
+            image=ImagePayload.from_file(path)
+        )
+
+    async def _zoom(self, region: tuple[int, int, int, int]) -> ToolResult:
+        """Return a full-detail crop of a device screen region"""
+        image = Image.open(BytesIO(self.driver.get_screenshot_as_png()))
+        ratio = image.width / self.driver.get_window_size()["width"]
+        box = clamp_region(
+            tuple(round(value * ratio) for value in region),
+            image.width,
+            image.height,
+        )
+
+        crop = image.crop(box)
+
+        return ToolResult(
+            output=f"Zoom of region {tuple(region)} at {crop.width / region[2]:.2f}x",
+            image=ImagePayload.from_image(crop)
+        )
+
+    async def _wait(
+        self,
+        condition: WaitCondition,
+        region: tuple[int, int, int, int] | None,
+        label: str | None,
+        timeout: float,
+        interval: float,
+    ) -> ToolResult:
+        """Watch the device screen locally and return one screenshot when done"""
+        if region is not None:
+            _, ratio = self._grab_frame()
+            region = tuple(round(value * ratio) for value in region)
+
+        # Polled frames stay in pixels, so only the screenshot is fetched each time
+        watcher = FrameWatcher(lambda: to_gray(self._screen_image()), self.locator)
+        outcome = await watcher.wait(condition, region, label, timeout, interval)
+
+        result = await self._take_screenshot()
+        output = outcome.describe(condition)
+        if result.output:
+            output = f"{output}\n{result.output}"
+        return result.replace(output=output)
+
+    def _screen_image(self) -> Image.Image:
+        return Image.open(BytesIO(self.driver.get_screenshot_as_png()))
+
+    def _grab_frame(self, image: Image.Image | None = None) -> tuple[np.ndarray, float]:
+        """Grayscale frame and its pixel-per-point ratio"""
+        if image is None:
+            image = self._screen_image()
+        points = self.driver.get_window_size()["width"]
+        return to_gray(image), image.width / points
+
+    def _remember_target(self, x: int, y: int, label: str | None):
+        """Store the crop around a tap target for later lookups"""
+        image = None
+        if self._last_screenshot and self._last_screenshot.exists():
+            image = Image.open(self._last_screenshot)
+
+        frame, ratio = self._grab_frame(image)
+        px, py = round(x * ratio), round(y * ratio)
+
+        self.locator.remember("last_click", frame, px, py)
+        if label:
+            self.locator.remember(label, frame, px, py)
+
+    def _find_template(self, label: str) -> tuple[int, int, float]:
+        """Locate a remembered target on the current screen"""
+        if label not in self.locator.templates:
+            raise ToolError(f"No template stored for {label}")
+
+        frame, ratio = self._grab_frame()
+        match = self.locator.find(label, frame)
+        if match is None:
+            raise ToolError(f"Template {label} not found on screen")
+
+        return round(match.x / ratio), round(match.y / ratio), match.score
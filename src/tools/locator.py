@@ -0,0 +1,241 @@
+"""Template matching locator for model-free target verification"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+from PIL import Image
+
+@dataclass(frozen=True)
+class Match:
+    """Location of a template in a frame"""
+    x: int  # Center, in frame pixels
+    y: int
+    score: float
+    scale: float
+
+def to_gray(image: Image.Image) -> np.ndarray:
+    """Convert an image to a float32 grayscale array"""
+    return np.asarray(image.convert("L"), dtype=np.float32)
+
+def downsample(frame: np.ndarray, factor: int) -> np.ndarray:
+    """Box-filter a frame down by an integer factor"""
+    if factor == 1:
+        return frame
+    h, w = frame.shape[0] // factor, frame.shape[1] // factor
+    out = np.zeros((h, w), dtype=np.float32)
+    # Strided adds avoid the slow multi-axis reduction over a 4-D view
+    for i in range(factor):
+        for j in range(factor):
+            out += frame[i:h * factor:factor, j:w * factor:factor]
+    out *= 1.0 / (factor * factor)
+    return out
+
+def resize(array: np.ndarray, scale: float) -> np.ndarray:
+    """Resize a grayscale array by a scale factor"""
+    h, w = array.shape
+    size = (max(round(w * scale), 1), max(round(h * scale), 1))
+    if size == (w, h):
+        return array
+    image = Image.fromarray(array).resize(size, Image.Resampling.BILINEAR)
+    return np.asarray(image, dtype=np.float32)
+
+def integral_tables(frame: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Integral images of a frame and of its squares"""
+    table = np.zeros((frame.shape[0] + 1, frame.shape[1] + 1), dtype=np.float64)
+    squares = np.zeros_like(table)
+    np.cumsum(np.cumsum(frame, axis=0, dtype=np.float64), axis=1, out=table[1:, 1:])
+    np.cumsum(
+        np.cumsum(np.square(frame, dtype=np.float64), axis=0),
+        axis=1,
+        out=squares[1:, 1:],
+    )
+    return table, squares
+
+def window_sums(
+    tables: tuple[np.ndarray, np.ndarray],
+    h: int,
+    w: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Sum and sum of squares of every h x w window"""
+    def box(t: np.ndarray) -> np.ndarray:
+        return t[h:, w:] - t[:-h, w:] - t[h:, :-w] + t[:-h, :-w]
+
+    return box(tables[0]), box(tables[1])
+
+def template_spectrum(template: np.ndarray, shape: tuple[int, int]) -> tuple[np.ndarray, float]:
+    """Conjugate spectrum and norm of a zero-mean template padded to shape"""
+    centered = template - template.mean()
+    norm = float(np.sqrt(np.square(centered).sum()))
+    return np.conj(np.fft.rfft2(centered, s=shape)), norm
+
+def match_scores(
+    frame: np.ndarray,
+    frame_spectrum: np.ndarray,
+    tables: tuple[np.ndarray, np.ndarray],
+    template_shape: tuple[int, int],
+    spectrum: np.ndarray,
+    norm: float,
+) -> np.ndarray:
+    """Normalized cross-correlation of a template at every valid offset"""
+    h, w = template_shape
+    H, W = frame.shape
+    correlation = np.fft.irfft2(frame_spectrum * spectrum, s=frame.shape)
+    correlation = correlation[:H - h + 1, :W - w + 1]
+
+    sums, squares = window_sums(tables, h, w)
+    variance = np.maximum(squares - np.square(sums) / (h * w), 0.0)
+    denominator = np.sqrt(variance) * norm
+
+    scores = np.zeros_like(correlation)
+    np.divide(correlation, denominator, out=scores, where=denominator > 1e-6)
+    return scores
+
+class TemplateLocator:
+    """Find remembered screen targets again in new frames"""
+
+    def __init__(
+        self,
+        crop_size: int = 64,
+        scales: tuple[float, ...] = (0.8, 0.9, 1.0, 1.1, 1.25),
+        threshold: float = 0.8,
+        pyramid: int = 4,
+        cache_size: int = 32,
+    ):
+        self.crop_size = crop_size
+        self.scales = scales
+        self.threshold = threshold
+        self.pyramid = pyramid
+        self.cache_size = cache_size
+        self.templates: dict[str, np.ndarray] = {}
+        self._spectra: OrderedDict[tuple, tuple[np.ndarray, float]] = OrderedDict()
+
+    def remember(self, label: str, frame: np.ndarray, x: int, y: int):
+        """Store the crop around a point as a template"""
+        half = self.crop_size // 2
+        top, left = max(y - half, 0), max(x - half, 0)
+        crop = frame[top:y + half, left:x + half]
+        if crop.shape[0] < 8 or crop.shape[1] < 8 or crop.std() < 1.0:
+            # Too small or featureless to match reliably
+            return
+
+        self.templates[label] = crop.copy()
+        self._spectra = OrderedDict(
+            (key, value) for key, value in self._spectra.items() if key[0] != label
+        )
+
+    def find(
+        self,
+        label: str,
+        frame: np.ndarray,
+        region: Optional[tuple[int, int, int, int]] = None,
+    ) -> Optional[Match]:
+        """Locate a remembered template, optionally within (x, y, w, h)"""
+        template = self.templates.get(label)
+        if template is None:
+            return None
+
+        ox, oy = 0, 0
+        if region:
+            ox, oy, rw, rh = region
+            frame = frame[oy:oy + rh, ox:ox + rw]
+
+        match = self._coarse_search(label, template, frame)
+        if match is None:
+            return None
+
+        match = self._refine(template, frame, match)
+        if match is None or match.score < self.threshold:
+            return None
+        return Match(x=match.x + ox, y=match.y + oy, score=match.score, scale=match.scale)
+
+    def _coarse_search(
+        self,
+        label: str,
+        template: np.ndarray,
+        frame: np.ndarray,
+    ) -> Optional[Match]:
+        """Search every scale on a downsampled frame"""
+        small = downsample(frame, self.pyramid)
+        frame_spectrum = np.fft.rfft2(small)
+        tables = integral_tables(small)
+        best: Optional[Match] = None
+
+        for scale in self.scales:
+            scaled = resize(template, scale / self.pyramid)
+            h, w = scaled.shape
+            if h < 4 or w < 4 or h > small.shape[0] or w > small.shape[1]:
+                continue
+
+            spectrum, norm = self._spectrum(label, scale, scaled, small.shape)
+            if norm < 1e-6:
+                continue
+
+            scores = match_scores(small, frame_spectrum, tables, (h, w), spectrum, norm)
+            y, x = np.unravel_index(int(np.argmax(scores)), scores.shape)
+            score = float(scores[y, x])
+            if best is None or score > best.score:
+                best = Match(
+                    x=int(x) * self.pyramid,
+                    y=int(y) * self.pyramid,
+                    score=score,
+                    scale=scale,
+                )
+
+        return best
+
+    def _refine(
+        self,
+        template: np.ndarray,
+        frame: np.ndarray,
+        coarse: Match,
+    ) -> Optional[Match]:
+        """Refine a coarse hit at full resolution in a small window"""
+        scaled = resize(template, coarse.scale)
+        h, w = scaled.shape
+        margin = self.pyramid * 2
+
+        top, left = max(coarse.y - margin, 0), max(coarse.x - margin, 0)
+        window = frame[top:coarse.y + h + margin, left:coarse.x + w + margin]
+        if window.shape[0] < h or window.shape[1] < w:
+            return None
+
+        spectrum, norm = template_spectrum(scaled, window.shape)
+        if norm < 1e-6:
+            return None
+
+        scores = match_scores(
+            window,
+            np.fft.rfft2(window),
+            integral_tables(window),
+            (h, w),
+            spectrum,
+            norm,
+        )
+        y, x = np.unravel_index(int(np.argmax(scores)), scores.shape)
+        return Match(
+            x=left + int(x) + w // 2,
+            y=top + int(y) + h // 2,
+            score=float(scores[y, x]),
+            scale=coarse.scale,
+        )
+
+    def _spectrum(
+        self,
+        label: str,
+        scale: float,
+        template: np.ndarray,
+        shape: tuple[int, int],
+    ) -> tuple[np.ndarray, float]:
+        """Template spectrum from the LRU cache"""
+        key = (label, scale, shape)
+        if key in self._spectra:
+            self._spectra.move_to_end(key)
+            return self._spectra[key]
+
+        value = template_spectrum(template, shape)
+        self._spectra[key] = value
+        if len(self._spectra) > self.cache_size:
+            self._spectra.popitem(last=False)
+        return value
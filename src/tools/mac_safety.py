@@ -1,6 +1,5 @@
 """Safety checks for Mac automation"""
 
-import pyautogui
 from typing import Tuple
 
 class SafetyChecker:
@@ -14,6 +13,8 @@ class SafetyChecker:
     @staticmethod
     def is_safe_click(x: int, y: int) -> Tuple[bool, str]:
         """Check if clicking at coordinates is safe"""
+        import pyautogui  # Deferred so text checks work without a display
+
         # Check screen bounds
         screen_width, screen_height = pyautogui.size()
         if x < 0 or x > screen_width or y < 0 or y > screen_height:
@@ -1,27 +1,116 @@
 import asyncio
-import base64
 import os
+import subprocess
+import time
 from pathlib import Path
 from typing import Literal, cast
-from uuid import uuid4
 
+import numpy as np
 import pyautogui
 from anthropic.types.beta import BetaToolComputerUse20241022Param
+from PIL import Image
 
-from ..config import TEMP_DIR, MAX_SCALING_TARGETS
-from .base import BaseAnthropicTool, ToolError, ToolResult
+from ..config import CONFIG
+from ..utils.deadline import current_deadline
+from ..utils.imaging import ImagePayload
+from ..utils.resilience import RetryPolicy, after_input, get_breaker, retry_async
+from .base import BaseAnthropicTool, Preparation, ToolError, ToolResult
+from .capture import CaptureBackend, get_backend
+from .capture_policy import CaptureMode, CapturePolicy, clamp_region, thumbnail_note
+from .displays import DisplayMapping, DisplayTopology, get_topology
+from .frame_ring import BackgroundCapture, shared_capture
+from .frame_watch import FrameWatcher, WaitCondition
+from .locator import TemplateLocator, to_gray
 from .mac_safety import SafetyChecker
+from .queries import shared_cache
+from .text_entry import TextEntry
+
+def _foreground_app() -> str:
+    result = subprocess.run(
+        [
+            "osascript", "-e",
+            'tell application "System Events" to get name of first '
+            'application process whose frontmost is true',
+        ],
+        capture_output=True,
+        text=True,
+        timeout=5,
+    )
+    if result.returncode:
+        raise ToolError(result.stderr.strip() or "osascript failed")
+    return result.stdout.strip()
+
+def _window_list() -> list[dict]:
+    """On-screen application windows, front to back"""
+    import Quartz
+
+    windows = Quartz.CGWindowListCopyWindowInfo(
+        Quartz.kCGWindowListOptionOnScreenOnly | Quartz.kCGWindowListExcludeDesktopElements,
+        Quartz.kCGNullWindowID,
+    )
+    return [
+        {
+            "app": window.get("kCGWindowOwnerName", ""),
+            "title": window.get("kCGWindowName", ""),
+            "bounds": {key: int(value) for key, value in window["kCGWindowBounds"].items()},
+        }
+        for window in windows
+        if window.get("kCGWindowLayer", 0) == 0  # Skip menu bar and overlays
+    ]
 
 class MacTool(BaseAnthropicTool):
     """Tool for controlling macOS with safety checks"""
 
     name: Literal["mac"] = "mac"
     api_type: Literal["computer_20241022"] = "computer_20241022"
+    query_actions = frozenset({
+        "get_position",
+        "get_screen_size",
+        "get_foreground_app",
+        "list_windows",
+    })
 
-    def __init__(self):
+    def __init__(
+        self,
+        display_number: int = 0,
+        screen: CaptureBackend | None = None,
+        topology: DisplayTopology | None = None,
+    ):
         super().__init__()
         self.safety = SafetyChecker()
         pyautogui.FAILSAFE = True  # Enable failsafe
+        self.display_number = display_number
+        if display_number:
+            self.name = f"mac_{display_number}"
+        self.topology = topology or get_topology()
+        self._scaling_enabled = True
+        self._refresh_mapping()
+        self._screenshot_delay = 0.5
+        self.locator = TemplateLocator()
+        self.capture = CapturePolicy.from_config()
+        self.retry_policy = RetryPolicy()
+        self.breaker = get_breaker(self.name, probe=self._probe)
+        self._last_frame: Image.Image | None = None
+        self.screen = screen or get_backend()
+        self.text_entry = TextEntry(pyautogui)
+        # Every display is one machine, input on any of them changes the windows
+        self.query_cache = shared_cache("mac")
+        self.ring: BackgroundCapture | None = None
+
+    @classmethod
+    def instances(cls) -> list["MacTool"]:
+        """One tool per connected display, sharing the process capture backend"""
+        return [cls(display.number) for display in get_topology().displays]
+
+    def _refresh_mapping(self):
+        """Pick up display changes before an action"""
+        mapping = self.topology.mapping(self.display_number)
+        if mapping is None:
+            raise ToolError(f"Display {self.display_number} is not connected")
+        if not self._scaling_enabled and mapping.scaled:
+            mapping = DisplayMapping.for_display(mapping.display, scaling=False)
+        self.mapping = mapping
+        self.width, self.height = mapping.display.width, mapping.display.height
 
     async def __call__(
         self,
@@ -33,12 +122,27 @@ class MacTool(BaseAnthropicTool):
             "screenshot",
             "move",
             "get_position",
+            "get_screen_size",
+            "get_foreground_app",
+            "list_windows",
+            "find",
+            "click_template",
+            "wait",
+            "zoom",
         ],
         text: str | None = None,
         position: tuple[int, int] | None = None,
+        label: str | None = None,
+        quality: Literal["low", "high"] | None = None,
+        condition: str | None = None,
+        region: tuple[int, int, int, int] | None = None,
+        timeout: float = 10.0,
+        interval: float = 0.25,
         **kwargs
     ) -> ToolResult:
         try:
+            self._refresh_mapping()
+
             # Add position validation
             if position is not None:
                 is_safe, reason = self.safety.is_safe_click(*position)
@@ -51,95 +155,329 @@ class MacTool(BaseAnthropicTool):
                 if not is_safe:
                     return ToolResult(error=f"Unsafe text input: {reason}")
 
-            # Execute action with retries
-            max_retries = 3
-            for attempt in range(max_retries):
-                try:
-                    return await self._execute_action(action, text, position)
-                except Exception as e:
-                    if attempt == max_retries - 1:
-                        raise
-                    await asyncio.sleep(1)
+            if action in self.query_actions:
+                run = lambda: self._query(action)
+            elif action == "screenshot":
+                mode = self.capture.for_screenshot(quality)
+                run = lambda: self._take_screenshot(mode)
+            elif action == "zoom":
+                if region is None:
+                    raise ToolError("Region required for zoom")
+                self.capture.record(True)
+                run = lambda: self._zoom(region)
+            elif action == "wait":
+                self.capture.record(False)
+                run = lambda: self._wait(
+                    WaitCondition(condition or "change"),
+                    region,
+                    label,
+                    timeout,
+                    interval,
+                )
+            else:
+                self.capture.record(False)
+                run = lambda: self._execute_action(action, text, position, label)
+
+            # Transient failures back off and retry, a dead display fails fast
+            return await retry_async(run, self.retry_policy, self.breaker)
 
         except Exception as e:
             return ToolResult(error=f"Action failed: {str(e)}")
 
+    async def prepare(
+        self,
+        action: str | None = None,
+        position: tuple[int, int] | None = None,
+        **partial_input
+    ) -> Preparation | None:
+        """Validate, grab the before frame and pre-move the cursor"""
+        if not self.breaker.allow():
+            return None
+
+        if action not in ("click", "move") or position is None:
+            return None
+        try:
+            self._refresh_mapping()
+        except ToolError:
+            return None
+
+        # Unsafe targets are left for the real call to reject
+        preparation = Preparation({"action": action, "position": position})
+        is_safe, _ = self.safety.is_safe_click(*position)
+        if not is_safe:
+            return preparation
+
+        x, y = self._scale_coordinates(*position)
+        preparation.state["cursor"] = tuple(await asyncio.to_thread(pyautogui.position))
+        # The frame the model acted on, taken before hover effects kick in
+        preparation.state["before"] = await asyncio.to_thread(self._grab_image)
+        await asyncio.to_thread(pyautogui.moveTo, x, y)
+        return preparation
+
+    async def commit(self, preparation: Preparation, **tool_input) -> ToolResult:
+        if before := preparation.state.get("before"):
+            self._last_frame = before
+        return await self(**tool_input)
+
+    async def rollback(self, preparation: Preparation):
+        if cursor := preparation.state.get("cursor"):
+            await asyncio.to_thread(pyautogui.moveTo, *cursor)
+
     async def _execute_action(
         self,
         action: str,
         text: str | None,
-        position: tuple[int, int] | None
+        position: tuple[int, int] | None,
+        label: str | None = None
     ) -> ToolResult:
         """Execute the requested action"""
-        try:
-            if action == "screenshot":
-                return await self._take_screenshot()
+        # Input may change the foreground app and windows
+        self.query_cache.clear()
+        if self.ring:
+            self.ring.poke()
+
+        if action in ("click", "move"):
+            if not position:
+                raise ToolError("Position required for mouse actions")
+            x, y = self._scale_coordinates(*position)
             
-            if action in ("click", "move"):
-                if not position:
-                    raise ToolError("Position required for mouse actions")
-                x, y = self._scale_coordinates(*position)
+            if action == "click":
+                self._remember_target(x, y, label)
+                pyautogui.click(x, y)
+            else:
+                pyautogui.moveTo(x, y)
                 
-                if action == "click":
-                    pyautogui.click(x, y)
-                else:
-                    pyautogui.moveTo(x, y)
-                    
-                return await self._take_screenshot()
-
-            if action in ("type", "key"):
-                if not text:
-                    raise ToolError("Text required for keyboard actions")
-                    
-                if action == "type":
-                    pyautogui.write(text)
-                else:
-                    pyautogui.press(text)
-                    
-                return await self._take_screenshot()
-
-            raise ToolError(f"Unknown action: {action}")
+            return await after_input(self._take_screenshot(after=time.monotonic()))
 
-        except Exception as e:
-            return ToolResult(error=str(e))
+        if action in ("find", "click_template"):
+            label = label or "last_click"
+            x, y, score = self._find_template(label)
+
+            if action == "find":
+                mx, my = self._unscale_coordinates(x, y)
+                return ToolResult(
+                    output=f"Found {label} at ({mx}, {my}), score {score:.2f}"
+                )
+
+            pyautogui.click(x, y)
+            return await after_input(self._take_screenshot(after=time.monotonic()))
+
+        if action in ("type", "key"):
+            if not text:
+                raise ToolError("Text required for keyboard actions")
+                
+            # Long or non-ASCII text is pasted, keys accept "cmd+shift+t tab"
+            if action == "type":
+                await self.text_entry.type(text)
+            else:
+                await self.text_entry.press(text)
+                
+            return await after_input(self._take_screenshot(after=time.monotonic()))
+
+        raise ToolError(f"Unknown action: {action}")
+
+    async def _query(self, action: str) -> ToolResult:
+        """Answer a state query as text, without a screenshot"""
+        display = self.mapping.display
+
+        if action == "get_position":
+            x, y = await asyncio.to_thread(pyautogui.position)
+            if not (
+                display.x <= x < display.x + display.width
+                and display.y <= y < display.y + display.height
+            ):
+                return ToolResult(output=f"Cursor is not on display {display.number}")
+            mx, my = self._unscale_coordinates(x, y)
+            return ToolResult(output=f"Cursor at ({mx}, {my})")
+
+        if action == "get_screen_size":
+            width, height = self.mapping.target
+            return ToolResult(output=(
+                f"Screen {width}x{height} (display {display.number}, "
+                f"{display.width}x{display.height} points at {display.scale:g}x)"
+            ))
+
+        if action == "get_foreground_app":
+            app = await self.query_cache.get("foreground_app", 1.0, _foreground_app)
+            return ToolResult(output=f"Foreground app: {app}")
+
+        if action == "list_windows":
+            lines = []
+            for window in await self.query_cache.get("windows", 1.0, _window_list):
+                bounds = window["bounds"]
+                x, y = self._unscale_coordinates(bounds["X"], bounds["Y"])
+                w, h = self.mapping.from_screen.apply_size(bounds["Width"], bounds["Height"])
+                width, height = self.mapping.target
+                if x + w <= 0 or y + h <= 0 or x >= width or y >= height:
+                    continue  # On another display
+                title = f" - {window['title']}" if window["title"] else ""
+                lines.append(f"{window['app']}{title} at ({x}, {y}) size {w}x{h}")
+            return ToolResult(output="\n".join(lines) or "No windows on this display")
+
+        raise ToolError(f"Unknown query: {action}")
+
+    async def _probe(self) -> bool:
+        """Check the display still answers"""
+        await asyncio.to_thread(pyautogui.size)
+        return True
+
+    async def heartbeat(self) -> bool:
+        """Liveness check for the device heartbeat"""
+        return await self._probe()
 
     def to_params(self) -> BetaToolComputerUse20241022Param:
         return {
             "type": self.api_type,
             "name": self.name,
-            "display_width_px": self.width,
-            "display_height_px": self.height,
-            "display_number": None
+            "display_width_px": self.mapping.target[0],
+            "display_height_px": self.mapping.target[1],
+            "display_number": self.display_number,
         }
 
-    async def _take_screenshot(self) -> ToolResult:
-        """Take and save screenshot"""
-        path = TEMP_DIR / f"screenshot_{uuid4().hex}.png"
-        
-        try:
-            pyautogui.screenshot(str(path))
-            await asyncio.sleep(self._screenshot_delay)
-            
-            if self._scaling_enabled:
-                # Scale screenshot to target resolution
-                target = MAX_SCALING_TARGETS["WXGA"]
-                img = pyautogui.screenshot()
-                img = img.resize((target["width"], target["height"]))
-                img.save(path)
-
-            return ToolResult(
-                base64_image=base64.b64encode(path.read_bytes()).decode()
+    async def _take_screenshot(
+        self,
+        mode: CaptureMode | None = None,
+        after: float | None = None,
+    ) -> ToolResult:
+        """Take and save screenshot, settled after input made at a moment"""
+        mode = mode or self.capture.after_action()
+        if mode == CaptureMode.NONE:
+            self._last_frame = None
+            return ToolResult(output="Screenshot skipped by capture policy")
+
+        frame = None
+        if after is not None and (ring := self._frame_ring()):
+            timeout = current_deadline().timeout(cap=self._screenshot_delay * 4)
+            frame = await ring.frame_after(after, timeout)
+
+        if frame is not None:
+            img = Image.fromarray(frame)
+            self._last_frame = img
+        else:
+            img = self._grab_image()
+            self._last_frame = img
+            await asyncio.sleep(current_deadline().timeout(cap=self._screenshot_delay))
+
+        if img.size != self.mapping.target:
+            # Scale screenshot to the size the model works in
+            img = img.resize(self.mapping.target)
+
+        output = None
+        if mode == CaptureMode.THUMBNAIL:
+            width, height = img.size
+            img, scale = self.capture.thumbnail(img)
+            output = thumbnail_note(scale, f"{width}x{height} space")
+
+        return ToolResult(output=output, image=ImagePayload.from_image(img))
+
+    async def _zoom(self, region: tuple[int, int, int, int]) -> ToolResult:
+        """Return a full-detail crop of a screen region"""
+        img = self._grab_image()
+        ratio = img.width / self.width
+        x, y = self.mapping.to_local.apply(region[0], region[1])
+        w, h = self.mapping.to_local.apply_size(region[2], region[3])
+        box = clamp_region(
+            (round(x * ratio), round(y * ratio), round(w * ratio), round(h * ratio)),
+            img.width,
+            img.height,
+        )
+
+        crop = img.crop(box)
+        limit = self.mapping.target[0]
+        if crop.width > limit:
+            crop = crop.resize(
+                (limit, max(round(crop.height * limit / crop.width), 1)),
+                Image.Resampling.LANCZOS,
             )
-        except Exception as e:
-            return ToolResult(error=f"Screenshot failed: {e}")
+
+        return ToolResult(
+            output=f"Zoom of region {tuple(region)} at {crop.width / region[2]:.2f}x",
+            image=ImagePayload.from_image(crop),
+        )
 
     def _scale_coordinates(self, x: int, y: int) -> tuple[int, int]:
-        """Scale coordinates between actual and target resolution"""
-        if not self._scaling_enabled:
-            return x, y
+        """Map model coordinates to global screen points"""
+        return self.mapping.to_screen.apply(x, y)
+
+    async def _wait(
+        self,
+        condition: WaitCondition,
+        region: tuple[int, int, int, int] | None,
+        label: str | None,
+        timeout: float,
+        interval: float,
+    ) -> ToolResult:
+        """Watch the screen locally and return one screenshot when done"""
+        if region is not None:
+            _, ratio = self._grab_frame()
+            x, y = self.mapping.to_local.apply(region[0], region[1])
+            w, h = self.mapping.to_local.apply_size(region[2], region[3])
+            region = (
+                round(x * ratio), round(y * ratio),
+                round(w * ratio), round(h * ratio),
+            )
+
+        watcher = FrameWatcher(lambda: self._grab_frame()[0], self.locator)
+        outcome = await watcher.wait(condition, region, label, timeout, interval)
+
+        result = await self._take_screenshot()
+        output = outcome.describe(condition)
+        if result.output:
+            output = f"{output}\n{result.output}"
+        return result.replace(output=output)
+
+    def _unscale_coordinates(self, x: int, y: int) -> tuple[int, int]:
+        """Map global screen points back to model coordinates"""
+        return self.mapping.from_screen.apply(x, y)
+
+    def _grab_image(self) -> Image.Image:
+        """Screenshot of this tool's display"""
+        frame = self.screen.grab_display(self.mapping.display, self.topology.bounds)
+        return Image.fromarray(frame)
+
+    def _frame_ring(self) -> BackgroundCapture | None:
+        """Background capture of this display, shared across sessions and tools"""
+        if not CONFIG["frame_ring"]:
+            return None
+        screen, display, desktop = self.screen, self.mapping.display, self.topology.bounds
+        width, height = display.pixel_size
+        self.ring = shared_capture(
+            (screen, display.number),
+            (display, desktop),
+            lambda out: screen.grab_display_into(out, display, desktop),
+            (height, width, 3),
+            capacity=CONFIG["frame_ring_size"],
+        )
+        return self.ring
+
+    def _grab_frame(self, image: Image.Image | None = None) -> tuple[np.ndarray, float]:
+        """Grayscale frame and its pixel-per-point ratio"""
+        image = image or self._grab_image()
+        return to_gray(image), image.width / self.width
+
+    def _remember_target(self, x: int, y: int, label: str | None):
+        """Store the crop around a click target for later lookups"""
+        frame, ratio = self._grab_frame(self._last_frame)
+        display = self.mapping.display
+        px, py = round((x - display.x) * ratio), round((y - display.y) * ratio)
+
+        self.locator.remember("last_click", frame, px, py)
+        if label:
+            self.locator.remember(label, frame, px, py)
+
+    def _find_template(self, label: str) -> tuple[int, int, float]:
+        """Locate a remembered target on the current screen"""
+        if label not in self.locator.templates:
+            raise ToolError(f"No template stored for {label}")
 
-        target = MAX_SCALING_TARGETS["WXGA"]
-        scale_x = self.width / target["width"] 
-        scale_y = self.height / target["height"]
+        frame, ratio = self._grab_frame()
+        match = self.locator.find(label, frame)
+        if match is None:
+            raise ToolError(f"Template {label} not found on screen")
 
-        return round(x * scale_x), round(y * scale_y) 
\ No newline at end of file
+        display = self.mapping.display
+        return (
+            round(match.x / ratio) + display.x,
+            round(match.y / ratio) + display.y,
+            match.score,
+        )
@@ -0,0 +1,39 @@
+"""Cached device state queries answered as text"""
+
+import asyncio
+import time
+from typing import Any, Callable
+
+class QueryCache:
+    """Short-lived results of state queries, dropped after input changes the device"""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self.entries: dict[str, tuple[float, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str, ttl: float, load: Callable[[], Any]) -> Any:
+        """Cached value for a key, loading it in a thread when stale"""
+        entry = self.entries.get(key)
+        if entry and self.clock() < entry[0]:
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        value = await asyncio.to_thread(load)
+        if ttl > 0:
+            self.entries[key] = (self.clock() + ttl, value)
+        return value
+
+    def clear(self):
+        self.entries.clear()
+
+_caches: dict[str, QueryCache] = {}
+
+def shared_cache(device: str) -> QueryCache:
+    """Query cache shared by every tool driving a device, so input through any clears it"""
+    cache = _caches.get(device)
+    if cache is None:
+        cache = _caches[device] = QueryCache()
+    return cache
@@ -0,0 +1,299 @@
+"""Per-device action scheduling across sessions"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Optional
+
+from ..api.ratelimit import Priority
+from ..config import CONFIG
+from ..utils.logging import setup_logging
+
+logger = setup_logging()
+
+@dataclass
+class Turn:
+    """One action waiting for, or holding, a device"""
+    session_id: str
+    priority: Priority
+    enqueued: float
+    granted: float = 0.0
+    # Sessions run on their own loops, so grants are delivered to the waiter's loop
+    loop: asyncio.AbstractEventLoop = field(default=None, repr=False)
+    future: asyncio.Future = field(default=None, repr=False)
+
+    @property
+    def wait_time(self) -> float:
+        return self.granted - self.enqueued
+
+@dataclass
+class FocusLease:
+    """Session that owns a device between its actions"""
+    session_id: str
+    priority: Priority
+    expires: float = float("inf")  # Held while an action runs
+    streak: int = 1  # Actions granted in a row on this lease
+
+    def live(self, now: float) -> bool:
+        return now < self.expires
+
+def _wake(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+class ActionScheduler:
+    """Serialize device input, one action at a time, by priority and focus"""
+
+    def __init__(
+        self,
+        device: str,
+        lease_time: Optional[float] = None,
+        lease_actions: Optional[int] = None,
+        wait_window: int = 500,
+    ):
+        self.device = device
+        if lease_time is None:
+            lease_time = CONFIG["action_lease_time"]
+        self.lease_time = lease_time
+        if lease_actions is None:
+            lease_actions = CONFIG["action_lease_actions"]
+        self.lease_actions = max(lease_actions, 1)
+
+        # Per-priority round robin over per-session FIFO queues
+        self.queues: dict[Priority, dict[str, deque[Turn]]] = {
+            priority: {} for priority in Priority
+        }
+        self.active: Optional[Turn] = None
+        self.lease: Optional[FocusLease] = None
+        self.waits: deque[float] = deque(maxlen=wait_window)
+        self.granted = 0
+        self.preemptions = 0
+        # Sessions on different threads share a scheduler, so state is guarded by a lock
+        self._lock = threading.Lock()
+
+    @asynccontextmanager
+    async def turn(
+        self,
+        session_id: str,
+        priority: Priority = Priority.INTERACTIVE,
+    ) -> AsyncIterator[Turn]:
+        """Hold the device for one action"""
+        loop = asyncio.get_running_loop()
+        turn = Turn(
+            session_id=session_id,
+            priority=priority,
+            enqueued=time.monotonic(),
+            loop=loop,
+            future=loop.create_future(),
+        )
+        with self._lock:
+            self.queues[priority].setdefault(session_id, deque()).append(turn)
+            self._dispatch()
+
+        try:
+            while not turn.future.done():
+                # Nothing else wakes waiters when a lease runs out, so recheck then
+                await asyncio.wait([turn.future], timeout=self._lease_left())
+                with self._lock:
+                    self._dispatch()
+        except asyncio.CancelledError:
+            with self._lock:
+                if self.active is turn:
+                    self._release(turn)  # Granted just as the caller gave up
+                else:
+                    self._remove(turn)
+            raise
+
+        try:
+            yield turn
+        finally:
+            with self._lock:
+                self._release(turn)
+
+    @asynccontextmanager
+    async def try_turn(
+        self,
+        session_id: str,
+        priority: Priority = Priority.INTERACTIVE,
+    ) -> AsyncIterator[Optional[Turn]]:
+        """Hold the device only if that needs no waiting, otherwise yield None"""
+        with self._lock:
+            now = time.monotonic()
+            turn = None
+            if self._available(session_id, now):
+                turn = Turn(session_id, priority, enqueued=now, granted=now)
+                self.active = turn
+                if self.lease and self.lease.session_id == session_id:
+                    self.lease.expires = float("inf")
+                else:
+                    self.lease = FocusLease(session_id, priority)
+
+        if turn is None:
+            yield None
+            return
+        try:
+            yield turn
+        finally:
+            with self._lock:
+                self._release(turn)
+
+    def available_to(self, session_id: str) -> bool:
+        """Whether a session could act now without waiting"""
+        with self._lock:
+            return self._available(session_id, time.monotonic())
+
+    def _available(self, session_id: str, now: float) -> bool:
+        """Whether a session could act without waiting; the caller holds the lock"""
+        if self.active is not None or self.queue_depth:
+            return False
+        lease = self.lease
+        return lease is None or lease.session_id == session_id or not lease.live(now)
+
+    def release_focus(self, session_id: str):
+        """Give up the lease when a session has nothing more to do"""
+        with self._lock:
+            if self.lease and self.lease.session_id == session_id and self.active is None:
+                self.lease = None
+                self._dispatch()
+
+    def metrics(self) -> dict[str, float]:
+        """Queue depth, focus and wait-time statistics"""
+        with self._lock:
+            waits = sorted(self.waits)
+            focus = self.lease.session_id if self.lease else None
+            depth = self.queue_depth
+        return {
+            "queue_depth": depth,
+            "granted": self.granted,
+            "preemptions": self.preemptions,
+            "focus": focus,
+            "wait_p50": waits[len(waits) // 2] if waits else 0.0,
+            "wait_p95": waits[min(int(len(waits) * 0.95), len(waits) - 1)] if waits else 0.0,
+            "wait_max": waits[-1] if waits else 0.0,
+        }
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(
+            len(queue)
+            for sessions in self.queues.values()
+            for queue in sessions.values()
+        )
+
+    def _lease_left(self) -> Optional[float]:
+        """Seconds until the lease could let a waiter in, None if only a release can"""
+        with self._lock:
+            lease = self.lease
+            if lease is None:
+                return None
+            if lease.expires == float("inf"):
+                # Its action is still running; the lease ends at most lease_time after
+                return max(self.lease_time, 0.05)
+            return max(lease.expires - time.monotonic(), 0.001)
+
+    def _holds(self, lease: Optional[FocusLease], now: float) -> bool:
+        """Whether a lease still keeps other sessions of its priority out"""
+        return lease is not None and lease.live(now) and lease.streak < self.lease_actions
+
+    def _next_turn(self, now: float) -> Optional[Turn]:
+        """Best queued turn, or None while a lease holds others off"""
+        lease = self.lease
+        for priority in Priority:
+            sessions = self.queues[priority]
+            if not sessions:
+                continue
+            if self._holds(lease, now):
+                if lease.session_id in sessions:
+                    return sessions[lease.session_id][0]
+                if lease.priority <= priority:
+                    # The holder is between actions; others wait out the lease
+                    return None
+            # Higher priority work preempts the holder at this boundary, and a
+            # spent lease yields to the next session in round robin order
+            return next(iter(sessions.values()))[0]
+        return None
+
+    def _dispatch(self):
+        """Grant the device if it is free; the caller holds the lock"""
+        while self.active is None:
+            now = time.monotonic()
+            turn = self._next_turn(now)
+            if turn is None:
+                return
+
+            self._pop(turn)
+            lease = self.lease
+            if lease and lease.session_id == turn.session_id and lease.live(now):
+                # Only a run of actions that kept someone waiting counts toward the cap
+                lease.streak = lease.streak + 1 if self.queue_depth else 1
+                lease.expires = float("inf")
+            else:
+                if lease and lease.live(now) and lease.priority > turn.priority:
+                    self.preemptions += 1
+                    logger.info(
+                        f"{self.device}: {turn.session_id} preempted focus from "
+                        f"{lease.session_id}"
+                    )
+                self.lease = FocusLease(turn.session_id, turn.priority)
+
+            self.active = turn
+            turn.granted = now
+            self.waits.append(turn.wait_time)
+            self.granted += 1
+            try:
+                turn.loop.call_soon_threadsafe(_wake, turn.future)
+            except RuntimeError:
+                # The waiter's loop is gone, so nobody will release this turn
+                self.active = None
+
+    def _release(self, turn: Turn):
+        """Free the device after an action; the caller holds the lock"""
+        if self.active is turn:
+            self.active = None
+            if self.lease and self.lease.session_id == turn.session_id:
+                self.lease.expires = time.monotonic() + self.lease_time
+        self._dispatch()
+
+    def _pop(self, turn: Turn):
+        """Remove a granted turn and rotate its session to the back"""
+        sessions = self.queues[turn.priority]
+        queue = sessions.pop(turn.session_id)
+        queue.popleft()
+        if queue:
+            sessions[turn.session_id] = queue
+
+    def _remove(self, turn: Turn):
+        """Drop a cancelled turn from its queue; the caller holds the lock"""
+        sessions = self.queues[turn.priority]
+        queue = sessions.get(turn.session_id)
+        if queue and turn in queue:
+            queue.remove(turn)
+            if not queue:
+                del sessions[turn.session_id]
+        self._dispatch()
+
+_schedulers: dict[str, ActionScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+def get_scheduler(device: str) -> ActionScheduler:
+    """Scheduler shared by every session driving a device, on any thread"""
+    with _schedulers_lock:
+        scheduler = _schedulers.get(device)
+        if scheduler is None:
+            scheduler = _schedulers[device] = ActionScheduler(device)
+        return scheduler
+
+def release_focus(session_id: str):
+    """Drop a session's leases on every device"""
+    with _schedulers_lock:
+        schedulers = list(_schedulers.values())
+    for scheduler in schedulers:
+        scheduler.release_focus(session_id)
+
+def device_metrics() -> dict[str, dict[str, float]]:
+    with _schedulers_lock:
+        schedulers = dict(_schedulers)
+    return {device: scheduler.metrics() for device, scheduler in schedulers.items()}
@@ -0,0 +1,211 @@
+"""Text entry by keystrokes, clipboard paste or key chords"""
+
+import asyncio
+import shutil
+import subprocess
+import sys
+from typing import Any, Optional, Protocol
+
+from ..config import CONFIG
+from ..utils.logging import setup_logging
+from .base import ToolError
+from .mac_safety import SafetyChecker
+
+logger = setup_logging()
+
+KEY_ALIASES = {
+    "cmd": "command",
+    "opt": "option",
+    "control": "ctrl",
+    "return": "enter",
+    "esc": "escape",
+    "del": "delete",
+    "page_up": "pageup",
+    "page_down": "pagedown",
+}
+
+MODIFIERS = ("command", "ctrl", "option", "alt", "shift", "fn", "win")
+
+def parse_keys(spec: str) -> list[tuple[str, ...]]:
+    """Split "cmd+shift+t tab enter" into chords pressed one after another"""
+    chords = []
+    for step in spec.split():
+        if step.endswith("++") or step == "+":
+            head, keys = step[:-2] if len(step) > 1 else "", ["+"]
+        else:
+            head, keys = step, []
+
+        parts = head.split("+") if head else []
+        if not all(parts):
+            raise ToolError(f"Malformed key chord: {step}")
+
+        keys = [KEY_ALIASES.get(part.lower(), part.lower()) for part in parts] + keys
+        if len(keys) > 1 and keys[-1] in MODIFIERS:
+            raise ToolError(f"Key chord ends in a modifier: {step}")
+        chords.append(tuple(keys))
+
+    if not chords:
+        raise ToolError("No keys given")
+    return chords
+
+def check_safe(text: str):
+    is_safe, reason = SafetyChecker.is_safe_type(text)
+    if not is_safe:
+        raise ToolError(f"Unsafe text input: {reason}")
+
+class Keyboard(Protocol):
+    """The pyautogui keyboard calls the engine relies on"""
+
+    def write(self, message: str, interval: float = 0.0) -> None: ...
+    def press(self, keys: str) -> None: ...
+    def hotkey(self, *keys: str) -> None: ...
+
+class Clipboard:
+    """System clipboard through pbcopy/pbpaste, or xclip on Linux"""
+
+    def __init__(self):
+        if sys.platform == "darwin":
+            self.copy_cmd, self.paste_cmd = ["pbcopy"], ["pbpaste"]
+        else:
+            self.copy_cmd = ["xclip", "-selection", "clipboard"]
+            self.paste_cmd = ["xclip", "-selection", "clipboard", "-o"]
+
+    @property
+    def available(self) -> bool:
+        return shutil.which(self.copy_cmd[0]) is not None
+
+    def get(self) -> str:
+        result = subprocess.run(self.paste_cmd, capture_output=True, timeout=5)
+        return result.stdout.decode("utf-8", errors="replace")
+
+    def set(self, text: str):
+        subprocess.run(self.copy_cmd, input=text.encode("utf-8"), check=True, timeout=5)
+
+class TextEntry:
+    """Type text the fastest safe way and press key chords"""
+
+    def __init__(
+        self,
+        keyboard: Keyboard,
+        clipboard: Optional[Clipboard] = None,
+        paste_threshold: Optional[int] = None,
+        paste_modifier: Optional[str] = None,
+        paste_settle: float = 0.15,
+    ):
+        self.keyboard = keyboard
+        self.clipboard = clipboard or Clipboard()
+        if paste_threshold is None:
+            paste_threshold = CONFIG["type_paste_threshold"]
+        self.paste_threshold = paste_threshold
+        self.paste_modifier = paste_modifier or ("command" if sys.platform == "darwin" else "ctrl")
+        self.paste_settle = paste_settle
+
+    def should_paste(self, text: str) -> bool:
+        """Paste long text and anything keystrokes cannot spell"""
+        if not self.paste_threshold or not self.clipboard.available:
+            return False
+        # pyautogui only has keys for printable ASCII and whitespace
+        typeable = text.isascii() and all(char.isprintable() or char in "\n\t" for char in text)
+        return not typeable or len(text) >= self.paste_threshold
+
+    async def type(self, text: str) -> str:
+        """Enter text, returning how it was entered"""
+        check_safe(text)
+        if self.should_paste(text):
+            try:
+                previous = await self._stage(text)
+            except (OSError, subprocess.SubprocessError) as e:
+                # Nothing reached the app yet, so typing cannot enter it twice
+                logger.warning(f"Clipboard paste failed, typing instead: {str(e)}")
+            else:
+                await self._paste(previous)
+                return "pasted"
+
+        await asyncio.to_thread(self.keyboard.write, text)
+        return "typed"
+
+    async def _stage(self, text: str) -> str:
+        """Put text on the clipboard, returning what was there"""
+        previous = await asyncio.to_thread(self.clipboard.get)
+        await asyncio.to_thread(self.clipboard.set, text)
+        return previous
+
+    async def _paste(self, previous: str):
+        """Paste the staged text, then put back what was there"""
+        try:
+            await asyncio.to_thread(self.keyboard.hotkey, self.paste_modifier, "v")
+            # The target app reads the clipboard asynchronously
+            await asyncio.sleep(self.paste_settle)
+        finally:
+            try:
+                await asyncio.to_thread(self.clipboard.set, previous)
+            except (OSError, subprocess.SubprocessError) as e:
+                logger.warning(f"Could not restore the clipboard after pasting: {str(e)}")
+
+    async def press(self, spec: str) -> list[tuple[str, ...]]:
+        """Press each chord of a key spec in order"""
+        check_safe(spec)
+        chords = parse_keys(spec)
+        for chord in chords:
+            if len(chord) == 1:
+                await asyncio.to_thread(self.keyboard.press, chord[0])
+            else:
+                await asyncio.to_thread(self.keyboard.hotkey, *chord)
+        return chords
+
+# XCUITest key constants for mobile: keys
+IOS_KEYS = {
+    "enter": "\r",
+    "tab": "\t",
+    "backspace": "\b",
+    "delete": "\x7f",
+    "escape": "\x1b",
+    "space": " ",
+    "up": "\uF700",
+    "down": "\uF701",
+    "left": "\uF702",
+    "right": "\uF703",
+    "home": "\uF729",
+    "end": "\uF72B",
+    "pageup": "\uF72C",
+    "pagedown": "\uF72D",
+}
+
+IOS_MODIFIERS = {
+    "shift": 1 << 1,
+    "ctrl": 1 << 2,
+    "option": 1 << 3,
+    "alt": 1 << 3,
+    "command": 1 << 4,
+}
+
+class IOSTextEntry:
+    """Text and chords sent to an Appium session in one request each"""
+
+    def __init__(self, driver: Any):
+        self.driver = driver
+
+    async def type(self, text: str) -> str:
+        check_safe(text)
+        # One send_keys for the whole string instead of a request per character
+        element = await asyncio.to_thread(lambda: self.driver.switch_to.active_element)
+        await asyncio.to_thread(element.send_keys, text)
+        return "typed"
+
+    async def press(self, spec: str) -> list[tuple[str, ...]]:
+        check_safe(spec)
+        chords = parse_keys(spec)
+        keys = []
+        for chord in chords:
+            *modifiers, key = chord
+            flags = 0
+            for modifier in modifiers:
+                if modifier not in IOS_MODIFIERS:
+                    raise ToolError(f"Unsupported iOS modifier: {modifier}")
+                flags |= IOS_MODIFIERS[modifier]
+            if len(key) > 1 and key not in IOS_KEYS:
+                raise ToolError(f"Unsupported iOS key: {key}")
+            keys.append({"key": IOS_KEYS.get(key, key), "modifierFlags": flags})
+
+        await asyncio.to_thread(self.driver.execute_script, "mobile: keys", {"keys": keys})
+        return chords
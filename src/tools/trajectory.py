@@ -0,0 +1,269 @@
+"""Trajectory cache for replaying known action sequences"""
+
+import json
+import re
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Optional
+
+from ..utils.imaging import fingerprint_distance, screen_fingerprint
+from ..utils.logging import setup_logging
+from .base import ToolResult
+
+if TYPE_CHECKING:
+    from .collection import ToolCollection
+
+logger = setup_logging()
+
+@dataclass
+class TrajectoryStep:
+    """Single recorded tool call"""
+    tool: str
+    tool_input: dict[str, Any]
+    fingerprint: Optional[int] = None  # Screen after the step
+    cost: float = 0.0  # Wall time spent reaching this step, model included
+
+@dataclass
+class Trajectory:
+    """Successful action sequence for a task"""
+    task: str
+    tool: str
+    start_fingerprint: int
+    steps: list[TrajectoryStep] = field(default_factory=list)
+
+    @property
+    def duration(self) -> float:
+        return sum(step.cost for step in self.steps)
+
+@dataclass
+class ReplayResult:
+    """Outcome of replaying a cached trajectory"""
+    completed: bool
+    steps_replayed: int
+    results: list[ToolResult]
+    elapsed: float
+    time_saved: float
+    diverged_at: Optional[int] = None
+
+@dataclass
+class TaskStats:
+    """Cache statistics for a single task"""
+    lookups: int = 0
+    hits: int = 0
+    partial_hits: int = 0
+    time_saved: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.lookups if self.lookups else 0.0
+
+class TrajectoryRecorder:
+    """Collect tool calls made while a task runs"""
+
+    def __init__(self):
+        self.tool: Optional[str] = None
+        self.start_fingerprint: Optional[int] = None
+        self.steps: list[TrajectoryStep] = []
+        self.failures = 0
+        self._last_step = time.monotonic()
+
+    @property
+    def needs_start(self) -> bool:
+        return self.start_fingerprint is None
+
+    def set_start(self, tool: str, result: ToolResult):
+        """Record the screen before the first step"""
+        if result.image:
+            self.tool = tool
+            self.start_fingerprint = screen_fingerprint(result.image)
+
+    def record(self, tool: str, tool_input: dict[str, Any], result: ToolResult):
+        """Record a completed tool call"""
+        now = time.monotonic()
+        cost, self._last_step = now - self._last_step, now
+
+        # Failed steps are never worth replaying, nor is a task that had them
+        if result.error:
+            self.failures += 1
+            return
+
+        fingerprint = None
+        if result.image:
+            fingerprint = screen_fingerprint(result.image)
+
+        self.steps.append(TrajectoryStep(
+            tool=tool,
+            tool_input=dict(tool_input),
+            fingerprint=fingerprint,
+            cost=cost,
+        ))
+
+class TrajectoryCache:
+    """Cache of successful trajectories keyed by task and starting screen"""
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        max_distance: int = 12,
+        max_per_task: int = 4,
+    ):
+        self.path = path
+        self.max_distance = max_distance
+        self.max_per_task = max_per_task
+        self.entries: dict[str, list[Trajectory]] = {}
+        self.stats: dict[str, TaskStats] = {}
+
+        if path and path.exists():
+            self.load()
+
+    @staticmethod
+    def normalize_task(task: str) -> str:
+        """Normalize task text so trivial variations share a key"""
+        text = re.sub(r"[^\w\s]", " ", task.lower())
+        return " ".join(text.split())
+
+    def candidates(self, task: str) -> list[Trajectory]:
+        """Trajectories stored for a task"""
+        return self.entries.get(self.normalize_task(task), [])
+
+    def lookup(self, task: str, tool: str, fingerprint: int) -> Optional[Trajectory]:
+        """Find the trajectory whose starting screen best matches"""
+        best: Optional[Trajectory] = None
+        best_distance = self.max_distance + 1
+
+        for trajectory in self.candidates(task):
+            if trajectory.tool != tool:
+                continue
+            distance = fingerprint_distance(trajectory.start_fingerprint, fingerprint)
+            if distance < best_distance:
+                best, best_distance = trajectory, distance
+
+        return best
+
+    def store(self, task: str, recorder: TrajectoryRecorder):
+        """Store a successful recording"""
+        if recorder.tool is None or recorder.start_fingerprint is None:
+            return
+        if not recorder.steps or recorder.failures:
+            return
+
+        key = self.normalize_task(task)
+        trajectory = Trajectory(
+            task=key,
+            tool=recorder.tool,
+            start_fingerprint=recorder.start_fingerprint,
+            steps=recorder.steps,
+        )
+
+        # Replace any trajectory from the same starting screen
+        entries = [
+            existing for existing in self.entries.get(key, [])
+            if existing.tool != trajectory.tool
+            or fingerprint_distance(
+                existing.start_fingerprint, trajectory.start_fingerprint
+            ) > self.max_distance
+        ]
+        entries.append(trajectory)
+        self.entries[key] = entries[-self.max_per_task:]
+
+        if self.path:
+            self.save()
+
+    async def replay(
+        self,
+        trajectory: Trajectory,
+        tools: "ToolCollection",
+    ) -> ReplayResult:
+        """Replay a trajectory, stopping at the first divergence"""
+        start = time.monotonic()
+        results: list[ToolResult] = []
+        saved = 0.0
+        diverged_at: Optional[int] = None
+
+        for index, step in enumerate(trajectory.steps):
+            result = await tools.run(name=step.tool, tool_input=step.tool_input)
+            results.append(result)
+
+            if result.error or not self._matches(step, result):
+                diverged_at = index
+                break
+            saved += step.cost
+
+        elapsed = time.monotonic() - start
+        replayed = len(results) if diverged_at is None else diverged_at
+        return ReplayResult(
+            completed=diverged_at is None,
+            steps_replayed=replayed,
+            results=results,
+            elapsed=elapsed,
+            time_saved=max(saved - elapsed, 0.0),
+            diverged_at=diverged_at,
+        )
+
+    def _matches(self, step: TrajectoryStep, result: ToolResult) -> bool:
+        """Check the screen after a step against the recording"""
+        if step.fingerprint is None:
+            return True
+        if not result.image:
+            return False
+        distance = fingerprint_distance(
+            step.fingerprint, screen_fingerprint(result.image)
+        )
+        return distance <= self.max_distance
+
+    def record_lookup(self, task: str, replay: Optional[ReplayResult]):
+        """Update per-task statistics"""
+        stats = self.stats.setdefault(self.normalize_task(task), TaskStats())
+        stats.lookups += 1
+        if replay is None:
+            return
+        if replay.completed:
+            stats.hits += 1
+        elif replay.steps_replayed:
+            stats.partial_hits += 1
+        stats.time_saved += replay.time_saved
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = sum(stats.lookups for stats in self.stats.values())
+        hits = sum(stats.hits for stats in self.stats.values())
+        return hits / lookups if lookups else 0.0
+
+    def report(self) -> dict[str, Any]:
+        """Summarize hit rate and time saved per task"""
+        return {
+            "hit_rate": self.hit_rate,
+            "tasks": {
+                task: {**asdict(stats), "hit_rate": stats.hit_rate}
+                for task, stats in self.stats.items()
+            },
+        }
+
+    def load(self):
+        """Load trajectories from disk"""
+        try:
+            data = json.loads(self.path.read_text())
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable trajectory cache: {e}")
+            return
+
+        for key, items in data.items():
+            self.entries[key] = [
+                Trajectory(
+                    task=item["task"],
+                    tool=item["tool"],
+                    start_fingerprint=item["start_fingerprint"],
+                    steps=[TrajectoryStep(**step) for step in item["steps"]],
+                )
+                for item in items
+            ]
+
+    def save(self):
+        """Persist trajectories to disk"""
+        data = {
+            key: [asdict(trajectory) for trajectory in items]
+            for key, items in self.entries.items()
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps(data))
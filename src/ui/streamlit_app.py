@@ -1,15 +1,19 @@
 """Streamlit UI for device control"""
 
-import asyncio
-import base64
-from io import BytesIO
-from typing import Optional
+import time
+from typing import Callable
 
 import streamlit as st
-from PIL import Image
 
-from ..api import AnthropicClient
-from ..tools import ToolCollection, ToolResult
+from ..api.anthropic import AnthropicClient
+from ..config import TEMP_DIR
+from ..tools.base import ToolResult
+from ..tools.collection import ToolCollection
+from ..utils.profiler import get_profiler
+from .worker import AgentWorker, ThumbnailCache, UIEvent
+
+PAGE_SIZE = 20
+POLL_INTERVAL = 0.5
 
 # Page config
 st.set_page_config(
@@ -18,58 +22,142 @@ st.set_page_config(
     layout="wide",
 )
 
-# Session state
-if "client" not in st.session_state:
-    tools = ToolCollection()
-    st.session_state.client = AnthropicClient(
-        tools=tools,
-        on_content=lambda text: st.session_state.current_response.markdown(text),
-        on_tool_result=lambda result: display_tool_result(result),
+async def create_client(
+    on_content: Callable[[str], None],
+    on_tool_result: Callable[[ToolResult], None],
+) -> AnthropicClient:
+    return AnthropicClient(
+        tools=ToolCollection(),
+        on_content=on_content,
+        on_tool_result=on_tool_result,
     )
 
-def display_tool_result(result: ToolResult):
-    """Display tool execution result"""
-    container = st.session_state.current_response
-    
-    if result.error:
-        container.error(result.error)
-    
-    if result.output:
-        container.code(result.output)
-        
-    if result.base64_image:
-        image = Image.open(BytesIO(base64.b64decode(result.base64_image)))
-        container.image(image, use_column_width=True)
+def init_state():
+    """Per browser session worker, transcript and thumbnails"""
+    if "worker" not in st.session_state:
+        st.session_state.worker = AgentWorker(create_client)
+        st.session_state.transcript = []
+        st.session_state.thumbnails = ThumbnailCache()
+        st.session_state.page = 0
+        st.session_state.devices = {}
+
+def apply_event(event: UIEvent):
+    """Fold a worker event into the transcript"""
+    if event.kind == "device":
+        # Status changes go to the sidebar, not between streamed text
+        st.session_state.devices[event.text] = (event.output, event.error)
+        return
+
+    transcript = st.session_state.transcript
+    last = transcript[-1] if transcript else None
+
+    if event.kind == "content":
+        # Text arrives as the whole reply so far; a fresh reply starts a new entry
+        if last and last.get("streaming") and event.text.startswith(last["text"]):
+            last["text"] = event.text
+        else:
+            transcript.append({"role": "assistant", "text": event.text, "streaming": True})
+        return
+
+    if last:
+        last.pop("streaming", None)
+
+    if event.kind == "tool_result":
+        entry = {"role": "tool", "output": event.output, "error": event.error}
+        if event.image:
+            entry["image"] = event.image
+            entry["thumb"] = st.session_state.thumbnails.put(event.image)
+        transcript.append(entry)
+    elif event.kind == "error":
+        transcript.append({"role": "assistant", "error": event.error})
+
+def render_entry(entry: dict):
+    with st.chat_message(entry["role"] if entry["role"] != "tool" else "assistant"):
+        if entry.get("text"):
+            st.markdown(entry["text"])
+        if entry.get("error"):
+            st.error(entry["error"])
+        if entry.get("output"):
+            st.code(entry["output"])
+        if entry.get("thumb"):
+            thumbnails = st.session_state.thumbnails
+            data = thumbnails.get(entry["thumb"])
+            if data is None:
+                # Evicted from the cache, rebuild from the payload
+                data = thumbnails.get(thumbnails.put(entry["image"]))
+            st.image(data)
+
+def render_transcript():
+    """Render one page of history so reruns cost the same at any length"""
+    transcript = st.session_state.transcript
+    pages = max((len(transcript) - 1) // PAGE_SIZE + 1, 1)
+    page = min(st.session_state.page, pages - 1)
+
+    if pages > 1:
+        page = st.number_input(
+            f"Page (0 is latest, {pages} total)",
+            min_value=0,
+            max_value=pages - 1,
+            value=page,
+            step=1,
+        )
+        st.session_state.page = page
+
+    end = len(transcript) - page * PAGE_SIZE
+    for entry in transcript[max(end - PAGE_SIZE, 0):end]:
+        render_entry(entry)
+
+def render_devices():
+    """Sidebar status of each device, pushed by its heartbeat"""
+    for device, (status, error) in sorted(st.session_state.devices.items()):
+        line = f"**{device}**: {status}"
+        if error:
+            st.sidebar.error(f"{line} ({error})")
+        else:
+            st.sidebar.write(line)
+
+def render_profiler(session_id: str):
+    """Sidebar toggle that samples this session's stacks"""
+    profiler = get_profiler()
+    if st.sidebar.toggle("Profile this session", value=profiler.active_for(session_id)):
+        profiler.enable(session_id)
+    else:
+        profiler.disable(session_id)
+
+    path = TEMP_DIR / f"profile-{session_id}.collapsed"
+    if path.exists():
+        st.sidebar.download_button("Download profile", path.read_bytes(), file_name=path.name)
 
 def main():
     st.title("Mac & iOS Control")
-    
-    # Chat interface
-    chat_container = st.container()
-    
-    # Display message history
-    for msg in st.session_state.client.messages:
-        role = msg["role"]
-        with chat_container.chat_message(role):
-            if isinstance(msg["content"], str):
-                st.markdown(msg["content"])
-            elif isinstance(msg["content"], dict):
-                if msg["content"].get("error"):
-                    st.error(msg["content"]["error"])
-                if msg["content"].get("output"):
-                    st.code(msg["content"]["output"])
-                if msg["content"].get("image"):
-                    image = Image.open(BytesIO(base64.b64decode(msg["content"]["image"])))
-                    st.image(image)
+    init_state()
+    worker = st.session_state.worker
+    session_id = worker.client.session_id
+
+    for event in worker.drain():
+        apply_event(event)
+        if event.kind == "done":
+            get_profiler().export(TEMP_DIR / f"profile-{session_id}.collapsed", session_id)
+
+    render_devices()
+    render_profiler(session_id)
+
+    render_transcript()
 
     # Input for new message
-    if prompt := st.chat_input("Type your instructions..."):
-        with chat_container.chat_message("user"):
-            st.markdown(prompt)
-            
-        with chat_container.chat_message("assistant"):
-            st.session_state.current_response = st
-            asyncio.run(st.session_state.client.send_message(prompt))
+    if prompt := st.chat_input(
+        "Type your instructions...",
+        disabled=worker.busy,
+    ):
+        st.session_state.transcript.append({"role": "user", "text": prompt})
+        st.session_state.page = 0
+        worker.submit(prompt)
+        st.rerun()
+
+    if worker.busy or not worker.events.empty():
+        # Poll the worker while it runs; the page stays responsive
+        time.sleep(POLL_INTERVAL)
+        st.rerun()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,173 @@
+"""Background event loop that runs the agent for the UI"""
+
+import asyncio
+import hashlib
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Any, Awaitable, Callable, Optional
+
+from PIL import Image
+
+from ..tools.base import ToolResult
+from ..tools.device_manager import DeviceManager
+from ..utils.imaging import ImagePayload
+from ..utils.logging import setup_logging
+from ..utils.state import StateSubscription
+
+logger = setup_logging()
+
+@dataclass
+class UIEvent:
+    """Something for the page to render, produced on the worker thread"""
+    kind: str  # content, tool_result, device, done or error
+    text: Optional[str] = None
+    output: Optional[str] = None
+    error: Optional[str] = None
+    image: Optional[ImagePayload] = None
+
+ClientFactory = Callable[
+    [Callable[[str], None], Callable[[ToolResult], None]],
+    Awaitable[Any],
+]
+
+class AgentWorker:
+    """Own an event loop thread and the client that lives on it"""
+
+    def __init__(self, factory: ClientFactory, heartbeat_interval: float = 5.0):
+        self.events: queue.Queue[UIEvent] = queue.Queue()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.current: Optional[Future] = None
+        self.devices = DeviceManager()
+        self._watcher: Optional[asyncio.Task] = None
+
+        # Build the client on its loop so its async state binds there
+        self.client = asyncio.run_coroutine_threadsafe(
+            factory(self._on_content, self._on_tool_result),
+            self.loop,
+        ).result()
+        asyncio.run_coroutine_threadsafe(
+            self._watch_devices(heartbeat_interval),
+            self.loop,
+        ).result()
+
+    async def _watch_devices(self, interval: float):
+        """Heartbeat the client's devices and report their transitions"""
+        tools = getattr(self.client, "tools", None)
+        if tools is None:
+            return
+        subscription = self.devices.state.subscribe()
+        self.devices.watch_tools(tools.tools, interval=interval)
+        self.devices.start_heartbeats()
+        self._watcher = asyncio.create_task(self._forward(subscription))
+
+    async def _forward(self, subscription: StateSubscription):
+        try:
+            async for state in subscription:
+                self.events.put(UIEvent(
+                    "device",
+                    text=state.device,
+                    output=state.status.value,
+                    error=state.error,
+                ))
+        finally:
+            subscription.close()
+
+    def _on_content(self, text: str):
+        self.events.put(UIEvent("content", text=text))
+
+    def _on_tool_result(self, result: ToolResult):
+        self.events.put(UIEvent(
+            "tool_result",
+            output=result.output,
+            error=result.error,
+            image=result.image,
+        ))
+
+    @property
+    def busy(self) -> bool:
+        return self.current is not None and not self.current.done()
+
+    def submit(self, prompt: str) -> Future:
+        """Start a task without blocking the page"""
+        if self.busy:
+            raise RuntimeError("A task is already running")
+        self.current = asyncio.run_coroutine_threadsafe(self._run(prompt), self.loop)
+        return self.current
+
+    async def _run(self, prompt: str):
+        try:
+            await self.client.send_message(prompt)
+        except Exception as e:
+            logger.error(f"Task failed: {str(e)}")
+            self.events.put(UIEvent("error", error=str(e)))
+        finally:
+            self.events.put(UIEvent("done"))
+
+    def drain(self, limit: int = 1000) -> list[UIEvent]:
+        """Events produced since the last call"""
+        drained = []
+        while len(drained) < limit:
+            try:
+                drained.append(self.events.get_nowait())
+            except queue.Empty:
+                break
+        return drained
+
+    async def _unwatch_devices(self):
+        tasks = [heartbeat.task for heartbeat in self.devices.heartbeats.values() if heartbeat.task]
+        self.devices.stop_heartbeats()
+        if self._watcher:
+            self._watcher.cancel()
+            tasks.append(self._watcher)
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stop(self):
+        self.client.close()
+        asyncio.run_coroutine_threadsafe(self._unwatch_devices(), self.loop).result(timeout=5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5)
+
+class ThumbnailCache:
+    """Downscaled screenshots keyed by content hash"""
+
+    def __init__(self, width: int = 480, max_entries: int = 128):
+        self.width = width
+        self.max_entries = max_entries
+        self.entries: OrderedDict[str, bytes] = OrderedDict()
+
+    @staticmethod
+    def key(image: ImagePayload) -> str:
+        return hashlib.blake2b(image.view(), digest_size=16).hexdigest()
+
+    def put(self, image: ImagePayload) -> str:
+        """Store a thumbnail once and return its key"""
+        key = self.key(image)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return key
+
+        decoded = image.open()
+        if decoded.width > self.width:
+            decoded = decoded.resize(
+                (self.width, max(round(decoded.height * self.width / decoded.width), 1)),
+                Image.Resampling.BILINEAR,
+            )
+            buffer = BytesIO()
+            decoded.save(buffer, format="PNG")
+            data = buffer.getvalue()
+        else:
+            data = image.data
+
+        self.entries[key] = data
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return key
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.entries.get(key)
@@ -1,12 +1,12 @@
 """Cleanup utilities"""
 
-import os
 import shutil
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Optional
 
 from ..config import TEMP_DIR
+from ..tools.appium_pool import shutdown_supervisor
 
 class CleanupManager:
     """Manage temporary files and resources"""
@@ -43,14 +43,5 @@ class CleanupManager:
         self._cleanup_processes()
         
     def _cleanup_processes(self):
-        """Kill related processes"""
-        processes = [
-            "appium",
-            "WebDriverAgent",
-        ]
-        
-        for proc in processes:
-            try:
-                os.system(f"pkill -f {proc}")
-            except:
-                pass 
\ No newline at end of file
+        """Stop Appium servers this process started, and the drivers under them"""
+        shutdown_supervisor()
@@ -1,59 +1,55 @@
 """Context managers for device operations"""
 
-import asyncio
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator, Optional
 
 from ..tools.device_manager import DeviceManager
 from ..utils.state import DeviceStatus
+from .deadline import DeadlineExceeded, current_deadline, use_deadline
 from .logging import setup_logging
 
 logger = setup_logging()
 
+def _mark_error(device_manager: DeviceManager, device_type: str, error: str):
+    if device_type == "mac":
+        device_manager.state.update_mac_state(DeviceStatus.ERROR, error)
+    else:
+        device_manager.state.update_ios_state(DeviceStatus.ERROR, error)
+
 @asynccontextmanager
 async def device_operation(
     device_manager: DeviceManager,
     device_type: str,
     timeout: Optional[float] = None
 ) -> AsyncGenerator[bool, None]:
-    """Context manager for safe device operations"""
+    """Context manager for safe device operations within the task deadline"""
+    # Never outlive the enclosing task, even with a longer timeout
+    deadline = current_deadline().child(timeout)
     try:
-        # Ensure device is ready
-        if not await device_manager.ensure_device_ready(device_type):
+        with use_deadline(deadline):
+            async with deadline.scope():
+                ready = await device_manager.ensure_device_ready(device_type)
+        if not ready:
             logger.error(f"Failed to prepare {device_type} device")
-            yield False
-            return
-            
-        # Set timeout if specified
-        if timeout:
-            try:
-                async with asyncio.timeout(timeout):
-                    yield True
-            except asyncio.TimeoutError:
-                logger.error(f"Operation timed out after {timeout}s")
-                if device_type == "mac":
-                    device_manager.state.update_mac_state(
-                        DeviceStatus.ERROR,
-                        "Operation timed out"
-                    )
-                else:
-                    device_manager.state.update_ios_state(
-                        DeviceStatus.ERROR,
-                        "Operation timed out"
-                    )
-                yield False
-        else:
-            yield True
-            
+    except Exception as e:
+        logger.error(f"Failed to prepare {device_type} device: {str(e)}")
+        _mark_error(device_manager, device_type, str(e))
+        ready = False
+
+    try:
+        # Yield exactly once, errors from the body propagate to the caller
+        with use_deadline(deadline):
+            async with deadline.scope():
+                yield ready
+    except DeadlineExceeded:
+        logger.error(f"{device_type} operation exceeded its deadline")
+        _mark_error(device_manager, device_type, "Operation timed out")
+        raise
     except Exception as e:
         logger.error(f"Device operation failed: {str(e)}")
-        if device_type == "mac":
-            device_manager.state.update_mac_state(DeviceStatus.ERROR, str(e))
-        else:
-            device_manager.state.update_ios_state(DeviceStatus.ERROR, str(e))
-        yield False
-        
+        _mark_error(device_manager, device_type, str(e))
+        raise
     finally:
         # Cleanup if needed
         if device_type == "ios":
-            device_manager.cleanup() 
\ No newline at end of file
+            device_manager.cleanup()
@@ -0,0 +1,81 @@
+"""Deadlines propagated from a task down to API calls and device actions"""
+
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import AsyncIterator, Iterator, Optional
+
+class DeadlineExceeded(TimeoutError):
+    """Task ran out of its time budget"""
+    pass
+
+@dataclass(frozen=True)
+class Deadline:
+    """Point in monotonic time by which work must finish"""
+    expires_at: float = math.inf
+
+    @classmethod
+    def after(cls, seconds: Optional[float]) -> "Deadline":
+        """Deadline a number of seconds from now, or none if not set"""
+        if not seconds:
+            return cls()
+        return cls(time.monotonic() + seconds)
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def check(self):
+        """Raise if the deadline has passed"""
+        if self.expired:
+            raise DeadlineExceeded("Deadline exceeded")
+
+    def timeout(self, cap: Optional[float] = None, reserve: float = 0.0) -> float:
+        """Timeout for one step: the remaining budget, less a reserve, capped"""
+        self.check()
+        remaining = max(self.remaining() - reserve, 0.0)
+        return remaining if cap is None else min(cap, remaining)
+
+    def child(self, seconds: Optional[float]) -> "Deadline":
+        """Tighter deadline for a sub-step, never beyond this one"""
+        if not seconds:
+            return self
+        return Deadline(min(self.expires_at, time.monotonic() + seconds))
+
+    @asynccontextmanager
+    async def scope(self) -> AsyncIterator["Deadline"]:
+        """Cancel the enclosed work when the deadline passes"""
+        self.check()
+        if math.isinf(self.expires_at):
+            yield self
+            return
+
+        loop = asyncio.get_running_loop()
+        try:
+            async with asyncio.timeout_at(loop.time() + self.remaining()):
+                yield self
+        except TimeoutError as e:
+            if not self.expired or isinstance(e, DeadlineExceeded):
+                raise
+            raise DeadlineExceeded("Deadline exceeded") from e
+
+_current: ContextVar[Deadline] = ContextVar("deadline", default=Deadline())
+
+def current_deadline() -> Deadline:
+    """Deadline of the task running in this context"""
+    return _current.get()
+
+@contextmanager
+def use_deadline(deadline: Deadline) -> Iterator[Deadline]:
+    """Make a deadline current for code called within the block"""
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
@@ -5,6 +5,7 @@ import functools
 from typing import Any, Callable, Optional, Type, TypeVar
 
 from .logging import setup_logging
+from .resilience import RetryPolicy, retry_async
 
 logger = setup_logging()
 
@@ -14,28 +15,30 @@ def with_retries(
     retries: int = 3,
     delay: float = 1.0,
     exceptions: tuple[Type[Exception], ...] = (Exception,),
-    logger = None
+    logger = None,
+    max_delay: float = 10.0,
+    deadline: Optional[float] = None,
 ):
-    """Retry decorator for async functions"""
+    """Retry decorator for async functions with jittered exponential backoff
+
+    Any of the listed exceptions is retried, whatever classify() makes of it.
+    """
+    policy = RetryPolicy(
+        attempts=retries,
+        base_delay=delay,
+        max_delay=max_delay,
+        deadline=deadline,
+    )
+
     def decorator(func: Callable[..., T]) -> Callable[..., T]:
         @functools.wraps(func)
         async def wrapper(*args: Any, **kwargs: Any) -> T:
-            last_error: Optional[Exception] = None
-            
-            for attempt in range(retries):
-                try:
-                    return await func(*args, **kwargs)
-                except exceptions as e:
-                    last_error = e
-                    if logger:
-                        logger.warning(
-                            f"Attempt {attempt + 1}/{retries} failed: {str(e)}"
-                        )
-                    if attempt < retries - 1:
-                        await asyncio.sleep(delay)
-                        
-            if last_error:
-                raise last_error
+            return await retry_async(
+                lambda: func(*args, **kwargs),
+                policy=policy,
+                retry_on=lambda e: isinstance(e, exceptions),
+                logger=logger,
+            )
                 
         return wrapper
     return decorator
@@ -0,0 +1,93 @@
+"""Image helpers for screen comparison"""
+
+import base64
+from io import BytesIO
+from pathlib import Path
+from typing import Optional, Union
+
+from PIL import Image
+
+# Difference-hash grid; 16x16 gives a 256-bit fingerprint
+HASH_SIZE = 16
+
+class ImagePayload:
+    """Encoded image bytes held once, base64 produced only when serialized"""
+
+    __slots__ = ("data", "media_type", "_base64")
+
+    def __init__(self, data: Union[bytes, bytearray, memoryview], media_type: str = "image/png"):
+        # bytes are kept as is, other buffers are copied once
+        self.data = data if isinstance(data, bytes) else bytes(data)
+        self.media_type = media_type
+        self._base64: Optional[str] = None
+
+    @classmethod
+    def from_image(cls, image: Image.Image, format: str = "PNG") -> "ImagePayload":
+        """Encode an image in memory"""
+        buffer = BytesIO()
+        image.save(buffer, format=format)
+        return cls(buffer.getvalue(), f"image/{format.lower()}")
+
+    @classmethod
+    def from_file(cls, path: Path) -> "ImagePayload":
+        return cls(Path(path).read_bytes())
+
+    @classmethod
+    def from_base64(cls, value: str) -> "ImagePayload":
+        payload = cls(base64.b64decode(value))
+        payload._base64 = value
+        return payload
+
+    @property
+    def base64(self) -> str:
+        """Base64 text for the API, encoded on first use"""
+        if self._base64 is None:
+            self._base64 = base64.b64encode(self.data).decode("ascii")
+        return self._base64
+
+    def view(self) -> memoryview:
+        """Zero-copy view of the encoded bytes"""
+        return memoryview(self.data)
+
+    def open(self) -> Image.Image:
+        """Decode the image, lazily so size reads only parse the header"""
+        return Image.open(BytesIO(self.data))
+
+    @property
+    def footprint(self) -> int:
+        """Bytes held, including the cached base64 text"""
+        return len(self.data) + (len(self._base64) if self._base64 else 0)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, ImagePayload) and self.data == other.data
+
+    def __hash__(self) -> int:
+        return hash(self.data)
+
+    def __repr__(self) -> str:
+        return f"ImagePayload({self.media_type}, {len(self.data)} bytes)"
+
+def screen_fingerprint(image: ImagePayload) -> int:
+    """Compute a perceptual difference hash of a screenshot"""
+    return image_fingerprint(image.open())
+
+def image_fingerprint(image: Image.Image) -> int:
+    """Compute a perceptual difference hash of an image"""
+    small = image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE))
+    pixels = list(small.getdata())
+
+    value = 0
+    for row in range(HASH_SIZE):
+        offset = row * (HASH_SIZE + 1)
+        for col in range(HASH_SIZE):
+            value <<= 1
+            if pixels[offset + col] > pixels[offset + col + 1]:
+                value |= 1
+    return value
+
+def fingerprint_distance(a: int, b: int) -> int:
+    """Number of differing bits between two fingerprints"""
+    return (a ^ b).bit_count()
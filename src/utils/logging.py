@@ -1,32 +1,168 @@
 """Logging configuration"""
 
+import atexit
+import json
 import logging
+import queue
 import sys
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional
+
+from ..config import CONFIG
+
+LOGGER_NAME = "mac-ios-control"
+
+# Identifiers attached to every record logged within a task
+session_id: ContextVar[Optional[str]] = ContextVar("session_id", default=None)
+device_id: ContextVar[Optional[str]] = ContextVar("device_id", default=None)
+step_id: ContextVar[Optional[int]] = ContextVar("step_id", default=None)
+
+_CONTEXT = {"session": session_id, "device": device_id, "step": step_id}
+
+@contextmanager
+def log_context(**ids) -> Iterator[None]:
+    """Tag records logged within the block with session, device or step IDs"""
+    tokens = [(_CONTEXT[name], _CONTEXT[name].set(value)) for name, value in ids.items()]
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+class ContextFilter(logging.Filter):
+    """Copy context IDs onto records in the thread that logged them"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for name, var in _CONTEXT.items():
+            setattr(record, name, var.get())
+        return True
+
+class SamplingFilter(logging.Filter):
+    """Keep one in every N debug records from each call site"""
+
+    def __init__(self, every: int = 1):
+        super().__init__()
+        self.every = max(every, 1)
+        self.counts: dict[tuple[str, int], int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.every == 1:
+            return True
+        key = (record.pathname, record.lineno)
+        count = self.counts.get(key, 0)
+        self.counts[key] = count + 1
+        return count % self.every == 0
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for name in _CONTEXT:
+            if (value := getattr(record, name, None)) is not None:
+                entry[name] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+_traceback_formatter = logging.Formatter()
+
+class DroppingQueueHandler(QueueHandler):
+    """Queue handler that drops records instead of blocking when full"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve arguments now, they may change before the writer gets to them
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _traceback_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+_listener: Optional[QueueListener] = None
+_handler: Optional[DroppingQueueHandler] = None
+_files: set[Path] = set()
+
+def _formatter(json_format: bool) -> logging.Formatter:
+    if json_format:
+        return JsonFormatter()
+    return logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
 def setup_logging(
     log_file: Optional[Path] = None,
-    level: int = logging.INFO
+    level: Optional[int] = None
 ) -> logging.Logger:
-    """Configure logging"""
-    
-    logger = logging.getLogger("mac-ios-control")
-    logger.setLevel(level)
-    
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    """Configure logging once and return the shared logger"""
+    global _listener, _handler
+
+    logger = logging.getLogger(LOGGER_NAME)
+    if level is not None:
+        logger.setLevel(level)
+
+    if _listener is None:
+        logger.setLevel(level or logging.getLevelName(CONFIG["log_level"].upper()))
+        formatter = _formatter(CONFIG["log_format"] == "json")
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setFormatter(formatter)
+
+        # Writes happen on the listener thread, never on the event loop
+        _handler = DroppingQueueHandler(queue.Queue(CONFIG["log_queue_size"]))
+        _handler.addFilter(SamplingFilter(CONFIG["log_debug_sample"]))
+        _handler.addFilter(ContextFilter())
+        logger.addHandler(_handler)
+
+        _listener = QueueListener(_handler.queue, console_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+    if log_file and Path(log_file) not in _files:
+        _add_file_handler(Path(log_file))
+
+    return logger
+
+def _add_file_handler(log_file: Path):
+    """Add a file to the listener, restarting it to pick up the handler"""
+    global _listener
+
+    file_handler = logging.FileHandler(log_file)
+    file_handler.setFormatter(_formatter(CONFIG["log_format"] == "json"))
+    _files.add(log_file)
+
+    _listener.stop()
+    _listener = QueueListener(
+        _handler.queue,
+        *_listener.handlers,
+        file_handler,
+        respect_handler_level=True
     )
-    
-    # Console handler
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-    
-    # File handler if specified
-    if log_file:
-        file_handler = logging.FileHandler(log_file)
-        file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
-    
-    return logger 
\ No newline at end of file
+    _listener.start()
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+        _files.clear()
+        logging.getLogger(LOGGER_NAME).removeHandler(_handler)
@@ -0,0 +1,169 @@
+"""Sampling profiler attributing stacks to sessions and steps"""
+
+import asyncio.events
+import concurrent.futures.thread
+import contextvars
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from types import CodeType, FrameType
+from typing import Optional
+
+from ..config import CONFIG
+from .logging import session_id, setup_logging, step_id
+
+logger = setup_logging()
+
+# Frames that run code in a copied context: loop callbacks and to_thread work
+_HANDLE_RUN = asyncio.events.Handle._run.__code__
+_WORK_ITEM_RUN = concurrent.futures.thread._WorkItem.run.__code__
+
+# Samples are keyed by session, step, thread name and stack, root first
+Sample = tuple[Optional[str], Optional[int], str, tuple[str, ...]]
+
+def _frame_context(frame: FrameType) -> Optional[contextvars.Context]:
+    """Context a callback or worker item runs in, read from its frame"""
+    owner = frame.f_locals.get("self")
+    if frame.f_code is _HANDLE_RUN:
+        return getattr(owner, "_context", None)
+    # asyncio.to_thread submits functools.partial(context.run, func)
+    run = getattr(getattr(owner, "fn", None), "func", None)
+    context = getattr(run, "__self__", None)
+    return context if isinstance(context, contextvars.Context) else None
+
+class SamplingProfiler:
+    """Periodic wall-clock samples of every thread, for chosen sessions or all"""
+
+    def __init__(self, interval: Optional[float] = None):
+        self.interval = interval or CONFIG["profile_interval"]
+        self.everything = False
+        self.sessions: set[str] = set()
+        self.counts: Counter[Sample] = Counter()
+        self.samples = 0
+        self.busy = 0.0  # Seconds spent taking samples
+        self.started = 0.0
+        self._labels: dict[CodeType, str] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def enable(self, session: Optional[str] = None):
+        """Profile one session, or every thread when no session is given"""
+        if session is None:
+            self.everything = True
+        else:
+            self.sessions.add(session)
+        if self._thread is None:
+            self._stop.clear()
+            self.started = time.monotonic()
+            self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+            self._thread.start()
+
+    def disable(self, session: Optional[str] = None):
+        if session is None:
+            self.everything = False
+            self.sessions.clear()
+        else:
+            self.sessions.discard(session)
+        if not self.everything and not self.sessions and self._thread:
+            self._stop.set()
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def active_for(self, session: str) -> bool:
+        return self.everything or session in self.sessions
+
+    @property
+    def overhead(self) -> float:
+        """Share of one core spent sampling since the profiler started"""
+        elapsed = time.monotonic() - self.started
+        return self.busy / elapsed if self._thread and elapsed > 0 else 0.0
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            start = time.perf_counter()
+            self.sample()
+            self.busy += time.perf_counter() - start
+
+    def _label(self, code: CodeType) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = (
+                f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+            )
+        return label
+
+    def sample(self):
+        """Record the current stack of every other thread"""
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        own = threading.get_ident()
+        samples = []
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack, context = [], None
+            while frame is not None:
+                code = frame.f_code
+                if context is None and (code is _HANDLE_RUN or code is _WORK_ITEM_RUN):
+                    context = _frame_context(frame)
+                stack.append(self._label(code))
+                frame = frame.f_back
+
+            session = context.get(session_id) if context else None
+            if not self.everything and session not in self.sessions:
+                continue
+            step = context.get(step_id) if context else None
+            stack.reverse()
+            samples.append((session, step, names.get(ident, str(ident)), tuple(stack)))
+
+        with self._lock:
+            self.counts.update(samples)
+            self.samples += 1
+
+    def take(self, session: Optional[str] = None) -> Counter[Sample]:
+        """Remove and return the samples of one session, or all of them"""
+        with self._lock:
+            if session is None:
+                taken, self.counts = self.counts, Counter()
+            else:
+                taken = Counter({
+                    key: count for key, count in self.counts.items() if key[0] == session
+                })
+                for key in taken:
+                    del self.counts[key]
+        return taken
+
+    @staticmethod
+    def collapsed(counts: Counter[Sample], with_session: bool = False) -> list[str]:
+        """Lines in Brendan Gregg's collapsed format, for flamegraph.pl or speedscope"""
+        lines = []
+        for (session, step, thread, stack), count in sorted(counts.items(), key=str):
+            roots = [f"session {session or '-'}"] if with_session else []
+            roots.append(f"step {step}" if step is not None else "no step")
+            frames = ";".join(frame.replace(";", ":") for frame in (*roots, thread, *stack))
+            lines.append(f"{frames} {count}")
+        return lines
+
+    def export(self, path: Path, session: Optional[str] = None) -> Optional[Path]:
+        """Append a session's samples to a collapsed-stack file, None if there were none"""
+        counts = self.take(session)
+        if not counts:
+            return None
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("a") as f:
+            f.writelines(line + "\n" for line in self.collapsed(counts, session is None))
+        logger.info(f"Wrote {sum(counts.values())} profile samples to {path}")
+        return path
+
+_profiler: Optional[SamplingProfiler] = None
+
+def get_profiler() -> SamplingProfiler:
+    """Process-wide profiler, sampling everything from the start with PROFILE=true"""
+    global _profiler
+    if _profiler is None:
+        _profiler = SamplingProfiler()
+        if CONFIG["profile"]:
+            _profiler.enable()
+    return _profiler
@@ -0,0 +1,235 @@
+"""Error classification, retry backoff and circuit breaking for device actions"""
+
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+from .deadline import DeadlineExceeded, current_deadline
+from .logging import setup_logging
+
+logger = setup_logging()
+
+T = TypeVar('T')
+
+class ErrorClass(Enum):
+    TRANSIENT = "transient"
+    PERMANENT = "permanent"
+    DEVICE_LOST = "device_lost"
+
+class DeviceLostError(Exception):
+    """Device or its automation session is gone"""
+    pass
+
+class CircuitOpenError(Exception):
+    """Device circuit is open, failing fast"""
+    pass
+
+class InputDeliveredError(Exception):
+    """A step after input reached the device failed; retrying would repeat the input"""
+    pass
+
+# Matched by name so WebDriver and HTTP client packages stay optional here
+DEVICE_LOST_NAMES = {
+    "InvalidSessionIdException",
+    "NoSuchDriverException",
+    "MaxRetryError",
+    "NewConnectionError",
+    "RemoteDisconnected",
+}
+TRANSIENT_NAMES = {
+    "StaleElementReferenceException",
+    "TimeoutException",
+    "WebDriverException",
+    "APIConnectionError",
+    "APITimeoutError",
+    "RateLimitError",
+    "InternalServerError",
+}
+
+def classify(error: BaseException) -> ErrorClass:
+    """Decide whether an error is worth retrying"""
+    if isinstance(error, InputDeliveredError) and error.__cause__ is not None:
+        return classify(error.__cause__)
+    names = {cls.__name__ for cls in type(error).__mro__}
+    if isinstance(error, DeadlineExceeded):
+        # Retrying cannot help once the task budget is spent
+        return ErrorClass.PERMANENT
+    if isinstance(error, DeviceLostError) or names & DEVICE_LOST_NAMES:
+        return ErrorClass.DEVICE_LOST
+    if isinstance(error, (ConnectionRefusedError, BrokenPipeError)):
+        return ErrorClass.DEVICE_LOST
+    if names & TRANSIENT_NAMES:
+        return ErrorClass.TRANSIENT
+    if isinstance(error, (FileNotFoundError, PermissionError)):
+        # Missing tools and denied permissions stay that way on retry
+        return ErrorClass.PERMANENT
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError, ConnectionError, OSError)):
+        return ErrorClass.TRANSIENT
+    return ErrorClass.PERMANENT
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Exponential backoff with full jitter under an overall deadline"""
+    attempts: int = 3
+    base_delay: float = 0.2
+    max_delay: float = 5.0
+    multiplier: float = 2.0
+    deadline: Optional[float] = 15.0  # Seconds for all attempts together
+
+    def delay(self, attempt: int) -> float:
+        ceiling = min(self.max_delay, self.base_delay * self.multiplier ** attempt)
+        return random.uniform(0, ceiling)
+
+class CircuitState(Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+class CircuitBreaker:
+    """Fail fast while a device is down and probe it in the background"""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 3,
+        reset_timeout: float = 10.0,
+        probe: Optional[Callable[[], Awaitable[bool]]] = None,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.probe = probe
+        self.state = CircuitState.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_task: Optional[asyncio.Task] = None
+
+    def allow(self) -> bool:
+        """Check whether a call may go through"""
+        if self.state == CircuitState.OPEN and self.probe is None:
+            # Without a probe the next call after the timeout is the trial
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = CircuitState.HALF_OPEN
+        return self.state != CircuitState.OPEN
+
+    def record_success(self):
+        if self.state != CircuitState.CLOSED:
+            logger.info(f"Circuit for {self.name} closed")
+        self.state = CircuitState.CLOSED
+        self.failures = 0
+
+    def record_failure(self, error_class: ErrorClass):
+        # Caller mistakes say nothing about device health
+        if error_class == ErrorClass.PERMANENT:
+            return
+
+        self.failures += 1
+        if (
+            error_class == ErrorClass.DEVICE_LOST
+            or self.state == CircuitState.HALF_OPEN
+            or self.failures >= self.failure_threshold
+        ):
+            self._open()
+
+    def _open(self):
+        if self.state != CircuitState.OPEN:
+            logger.warning(f"Circuit for {self.name} opened")
+        self.state = CircuitState.OPEN
+        self.opened_at = time.monotonic()
+
+        if self.probe and (self._probe_task is None or self._probe_task.done()):
+            try:
+                self._probe_task = asyncio.get_running_loop().create_task(self._probe_loop())
+            except RuntimeError:
+                self.probe = None  # No loop to probe from, fall back to timed trials
+
+    async def _probe_loop(self):
+        """Probe the device until it answers, then close the circuit"""
+        while self.state == CircuitState.OPEN:
+            await asyncio.sleep(self.reset_timeout)
+            self.state = CircuitState.HALF_OPEN
+            try:
+                healthy = await self.probe()
+            except Exception:
+                healthy = False
+
+            if healthy:
+                self.record_success()
+            else:
+                self.state = CircuitState.OPEN
+                self.opened_at = time.monotonic()
+
+_breakers: dict[str, CircuitBreaker] = {}
+
+def get_breaker(
+    name: str,
+    probe: Optional[Callable[[], Awaitable[bool]]] = None,
+) -> CircuitBreaker:
+    """Circuit breaker shared by everything that drives a device"""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        breaker = _breakers[name] = CircuitBreaker(name, probe=probe)
+    elif probe and breaker.probe is None:
+        breaker.probe = probe
+    return breaker
+
+async def retry_async(
+    func: Callable[[], Awaitable[T]],
+    policy: RetryPolicy = RetryPolicy(),
+    breaker: Optional[CircuitBreaker] = None,
+    retry_on: Optional[Callable[[BaseException], bool]] = None,
+    logger: Any = None,
+) -> T:
+    """Call func, retrying transient errors, or those retry_on accepts, with backoff"""
+    start = time.monotonic()
+    deadline = current_deadline()
+
+    for attempt in range(policy.attempts):
+        if breaker and not breaker.allow():
+            raise CircuitOpenError(f"{breaker.name} is unavailable, failing fast")
+
+        try:
+            result = await func()
+        except Exception as e:
+            error_class = classify(e)
+            if breaker:
+                breaker.record_failure(error_class)
+
+            delay = policy.delay(attempt)
+            out_of_time = delay >= deadline.remaining() or (
+                policy.deadline is not None
+                and time.monotonic() - start + delay > policy.deadline
+            )
+            retryable = retry_on(e) if retry_on else error_class == ErrorClass.TRANSIENT
+            if (
+                not retryable
+                or isinstance(e, InputDeliveredError)
+                or attempt == policy.attempts - 1
+                or out_of_time
+            ):
+                raise
+
+            if logger:
+                logger.warning(
+                    f"Attempt {attempt + 1}/{policy.attempts} failed: {str(e)}"
+                )
+            await asyncio.sleep(delay)
+            continue
+
+        if breaker:
+            breaker.record_success()
+        return result
+
+    raise RuntimeError("Retry policy allows no attempts")
+
+async def after_input(step: Awaitable[T], what: str = "screenshot") -> T:
+    """Run a step that follows delivered input, so its failure is not retried as a whole"""
+    try:
+        return await step
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        raise InputDeliveredError(f"Input was sent, but the {what} after it failed: {e}") from e
@@ -1,9 +1,11 @@
 """State management for tools and connections"""
 
+import asyncio
+from collections import deque
 from dataclasses import dataclass
 from datetime import datetime
 from enum import Enum
-from typing import Optional
+from typing import AsyncIterator, Iterable, Optional
 
 class DeviceStatus(Enum):
     DISCONNECTED = "disconnected"
@@ -11,43 +13,136 @@ class DeviceStatus(Enum):
     CONNECTED = "connected"
     ERROR = "error"
 
-@dataclass
+@dataclass(slots=True)
 class DeviceState:
     """Track device connection state"""
+    device: str
     status: DeviceStatus
     last_action: datetime
     error: Optional[str] = None
-    
+    previous: Optional[DeviceStatus] = None
+
     @property
     def is_active(self) -> bool:
         """Check if device is actively connected"""
         return self.status == DeviceStatus.CONNECTED
 
+class StateSubscription:
+    """Queue of transitions pushed to one subscriber"""
+
+    def __init__(self, bus: "StateManager", devices: Optional[set[str]], maxsize: int):
+        self.bus = bus
+        self.devices = devices
+        self.queue: asyncio.Queue[DeviceState] = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+    def push(self, state: DeviceState):
+        if self.devices is not None and state.device not in self.devices:
+            return
+        if self.queue.full():
+            # Slow subscribers lose the oldest transitions, never block updates
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(state)
+
+    async def get(self) -> DeviceState:
+        return await self.queue.get()
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+    def __aiter__(self) -> AsyncIterator[DeviceState]:
+        return self
+
+    async def __anext__(self) -> DeviceState:
+        return await self.queue.get()
+
 class StateManager:
-    """Manage global application state"""
-    
-    def __init__(self):
-        self.mac_state = DeviceState(
-            status=DeviceStatus.DISCONNECTED,
-            last_action=datetime.now()
-        )
-        self.ios_state = DeviceState(
-            status=DeviceStatus.DISCONNECTED,
-            last_action=datetime.now()
-        )
-        
-    def update_mac_state(self, status: DeviceStatus, error: Optional[str] = None):
-        """Update Mac device state"""
-        self.mac_state = DeviceState(
+    """Publish device state transitions to subscribers"""
+
+    def __init__(self, devices: Iterable[str] = ("mac", "ios"), history_size: int = 256):
+        self.states: dict[str, DeviceState] = {
+            device: DeviceState(device, DeviceStatus.DISCONNECTED, datetime.now())
+            for device in devices
+        }
+        self.history: deque[DeviceState] = deque(maxlen=history_size)
+        self._subscribers: list[StateSubscription] = []
+
+    @property
+    def mac_state(self) -> DeviceState:
+        return self.states["mac"]
+
+    @property
+    def ios_state(self) -> DeviceState:
+        return self.states["ios"]
+
+    def get(self, device: str) -> DeviceState:
+        return self.states[device]
+
+    def update(self, device: str, status: DeviceStatus, error: Optional[str] = None):
+        """Record a device state and push it to subscribers if it changed"""
+        current = self.states.get(device)
+        if current and current.status == status and current.error == error:
+            current.last_action = datetime.now()
+            return
+
+        state = DeviceState(
+            device=device,
             status=status,
             last_action=datetime.now(),
-            error=error
+            error=error,
+            previous=current.status if current else None
         )
-        
+        self.states[device] = state
+        self.history.append(state)
+        for subscriber in self._subscribers:
+            subscriber.push(state)
+
+    def update_mac_state(self, status: DeviceStatus, error: Optional[str] = None):
+        """Update Mac device state"""
+        self.update("mac", status, error)
+
     def update_ios_state(self, status: DeviceStatus, error: Optional[str] = None):
         """Update iOS device state"""
-        self.ios_state = DeviceState(
-            status=status,
-            last_action=datetime.now(),
-            error=error
-        ) 
\ No newline at end of file
+        self.update("ios", status, error)
+
+    def subscribe(
+        self,
+        devices: Optional[Iterable[str]] = None,
+        maxsize: int = 64,
+    ) -> StateSubscription:
+        """Receive transitions for some or all devices"""
+        subscription = StateSubscription(
+            self,
+            set(devices) if devices is not None else None,
+            maxsize
+        )
+        self._subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: StateSubscription):
+        if subscription in self._subscribers:
+            self._subscribers.remove(subscription)
+
+    async def wait_for(
+        self,
+        device: str,
+        status: DeviceStatus,
+        timeout: Optional[float] = None,
+    ) -> DeviceState:
+        """Wait until a device reaches a status"""
+        if self.states[device].status == status:
+            return self.states[device]
+
+        subscription = self.subscribe([device])
+        try:
+            async with asyncio.timeout(timeout):
+                async for state in subscription:
+                    if state.status == status:
+                        return state
+        finally:
+            subscription.close()
+
+    def transitions(self, device: Optional[str] = None) -> list[DeviceState]:
+        """Recorded transitions, oldest first"""
+        return [s for s in self.history if device is None or s.device == device]
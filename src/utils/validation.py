@@ -19,6 +19,10 @@ def validate_config() -> Optional[List[str]]:
         
     if CONFIG["api_provider"] not in [e.value for e in APIProvider]:
         errors.append(f"Invalid API_PROVIDER: {CONFIG['api_provider']}")
+
+    for provider in CONFIG["api_providers"]:
+        if provider not in [e.value for e in APIProvider]:
+            errors.append(f"Invalid provider in API_PROVIDERS: {provider}")
         
     # Check screen dimensions
     try:
@@ -0,0 +1,201 @@
+"""Appium supervisor tests against a stub server executable"""
+
+import asyncio
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from src.tools.appium_pool import AppiumError, AppiumSupervisor
+from src.utils.resilience import RetryPolicy
+
+pytestmark = pytest.mark.skipif(sys.platform != "linux", reason="stub server needs Linux")
+
+# Accepts Appium's flags, listens on --port and optionally crashes or spawns a driver
+STUB = '''#!{python}
+import argparse, os, socket, subprocess, sys, time
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--address")
+parser.add_argument("--port", type=int)
+parser.add_argument("--base-path")
+args = parser.parse_args()
+
+marker = os.environ.get("STUB_CRASH_ONCE")
+if marker and not os.path.exists(marker):
+    open(marker, "w").close()
+    print("stub crashing on purpose", flush=True)
+    sys.exit(3)
+
+if pidfile := os.environ.get("STUB_CHILD_PIDFILE"):
+    child = subprocess.Popen(["sleep", "60"])
+    with open(pidfile, "w") as f:
+        f.write(str(child.pid))
+
+# Accepts connections at once but only reports ready after STUB_WARMUP seconds
+ready_at = time.monotonic() + float(os.environ.get("STUB_WARMUP", "0"))
+server = socket.socket()
+server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+server.bind((args.address, args.port))
+server.listen()
+print(f"stub listening on {{args.port}}", flush=True)
+while True:
+    conn, _ = server.accept()
+    request = conn.recv(4096).decode()
+    if request.startswith(f"GET {{args.base_path}}/status "):
+        ready = "true" if time.monotonic() >= ready_at else "false"
+        body = f'{{{{"value": {{{{"ready": {{ready}}}}}}}}}}'
+        conn.sendall(f"HTTP/1.0 200 OK\\r\\nContent-Type: application/json\\r\\n\\r\\n{{body}}".encode())
+    else:
+        conn.sendall(b"HTTP/1.0 404 Not Found\\r\\n\\r\\n")
+    conn.close()
+'''
+
+@pytest.fixture
+def stub(tmp_path: Path) -> Path:
+    path = tmp_path / "appium"
+    path.write_text(STUB.format(python=sys.executable))
+    path.chmod(0o755)
+    return path
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _alive(pid: int) -> bool:
+    try:
+        state = Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()[0]
+    except FileNotFoundError:
+        return False
+    return state != "Z"
+
+def _supervisor(stub: Path, **kwargs) -> AppiumSupervisor:
+    kwargs.setdefault("backoff", RetryPolicy(base_delay=0.01, max_delay=0.05))
+    return AppiumSupervisor([str(stub)], base_port=_free_port(), startup_timeout=10, **kwargs)
+
+@pytest.mark.asyncio
+async def test_devices_spread_across_servers_by_load(stub):
+    """Test each device goes to the least loaded server on its own port"""
+    supervisor = _supervisor(stub, size=2)
+    # A port in use by someone else is skipped
+    blocker = socket.socket()
+    blocker.bind(("127.0.0.1", supervisor.base_port))
+    blocker.listen()
+    try:
+        first = await supervisor.acquire("iphone-a")
+        second = await supervisor.acquire("iphone-b")
+        third = await supervisor.acquire("iphone-c")
+
+        assert first != second
+        assert third == first
+        assert await supervisor.acquire("iphone-a") == first
+        assert f":{supervisor.base_port}/" not in first + second
+        assert first.endswith("/wd/hub")
+
+        supervisor.release("iphone-a")
+        supervisor.release("iphone-c")
+        assert await supervisor.acquire("iphone-d") == first
+        assert sorted(len(s["devices"]) for s in supervisor.metrics()) == [1, 1]
+    finally:
+        await supervisor.stop()
+        blocker.close()
+
+    assert not any(server["running"] for server in supervisor.metrics())
+
+@pytest.mark.asyncio
+async def test_crashed_server_restarts_with_its_log(stub, tmp_path, monkeypatch):
+    """Test a server that dies is started again on the same port"""
+    monkeypatch.setenv("STUB_CRASH_ONCE", str(tmp_path / "crashed"))
+    supervisor = _supervisor(stub)
+    try:
+        url = await supervisor.acquire("iphone")
+        server = supervisor.servers[0]
+        assert server.restarts == 1
+        assert server.failures == 1
+        assert "stub crashing on purpose" in server.log
+        assert f":{server.port}/" in url
+
+        # Crashing again after startup brings it back once more
+        server.process.kill()
+        for _ in range(100):
+            if server.restarts == 2 and server.ready.is_set():
+                break
+            await asyncio.sleep(0.05)
+        assert server.restarts == 2
+        assert await supervisor.acquire("iphone") == url
+    finally:
+        await supervisor.stop()
+
+@pytest.mark.asyncio
+async def test_stop_kills_only_its_own_process_tree(stub, tmp_path, monkeypatch):
+    """Test drivers spawned by a server die with it and unrelated processes do not"""
+    pidfile = tmp_path / "child.pid"
+    monkeypatch.setenv("STUB_CHILD_PIDFILE", str(pidfile))
+    outsider = subprocess.Popen(["sleep", "60"])
+    supervisor = _supervisor(stub)
+    try:
+        await supervisor.acquire("iphone")
+        child = int(pidfile.read_text())
+        assert _alive(child)
+
+        await supervisor.stop()
+        for _ in range(50):
+            if not _alive(child):
+                break
+            await asyncio.sleep(0.05)
+        assert not _alive(child)
+        assert outsider.poll() is None
+    finally:
+        outsider.kill()
+        outsider.wait()
+
+@pytest.mark.asyncio
+async def test_ready_waits_for_status_endpoint(stub, monkeypatch):
+    """Test a server listening but not yet ready is not handed out"""
+    monkeypatch.setenv("STUB_WARMUP", "0.5")
+    supervisor = _supervisor(stub)
+    try:
+        start = time.monotonic()
+        url = await supervisor.acquire("iphone")
+        assert time.monotonic() - start >= 0.5
+        assert await supervisor._submit(supervisor._status_ready(supervisor.servers[0].port))
+        assert url.endswith("/wd/hub")
+    finally:
+        await supervisor.stop()
+
+def test_shared_across_threads_and_loops(stub):
+    """Test tools on separate threads and event loops share one supervisor"""
+    supervisor = _supervisor(stub)
+    urls, errors = [], []
+
+    def tool(device: str):
+        try:
+            urls.append(asyncio.run(supervisor.acquire(device)))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=tool, args=(f"iphone-{n}",)) for n in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    try:
+        assert not errors
+        assert len(set(urls)) == 1
+        assert supervisor.metrics()[0]["devices"] == ["iphone-0", "iphone-1", "iphone-2"]
+        assert supervisor.metrics()[0]["restarts"] == 0
+    finally:
+        asyncio.run(supervisor.stop())
+    assert not supervisor.metrics()[0]["running"]
+
+@pytest.mark.asyncio
+async def test_missing_executable_raises(tmp_path):
+    supervisor = AppiumSupervisor([str(tmp_path / "missing")], base_port=_free_port())
+    with pytest.raises(AppiumError):
+        await supervisor.acquire("iphone")
+    await supervisor.stop()
@@ -0,0 +1,108 @@
+"""Batch runner tests with a fake agent"""
+
+import json
+
+import pytest
+from PIL import Image
+
+from src.batch.runner import BatchRunner, load_checkpoint, load_tasks
+from src.utils.imaging import ImagePayload
+from src.utils.resilience import RetryPolicy
+
+NO_WAIT = RetryPolicy(base_delay=0.0, max_delay=0.0, deadline=None)
+
+class FakeAgent:
+    """Completes tasks, failing the ones named in flaky a number of times"""
+
+    def __init__(self, device: str, flaky: dict[str, int], runs: list):
+        self.device = device
+        self.flaky = flaky
+        self.runs = runs
+
+    async def __call__(self, task, trace, deadline):
+        self.runs.append((self.device, task.id))
+        trace.write("tool_result", output=f"did {task.task}")
+        trace.screenshot = ImagePayload.from_image(Image.new("RGB", (8, 8)))
+        if self.flaky.get(task.id, 0) > 0:
+            self.flaky[task.id] -= 1
+            raise ConnectionError("device went away")
+
+def write_tasks(path, count: int):
+    lines = [json.dumps({"id": f"t{n}", "task": f"task {n}"}) for n in range(count)]
+    lines.append(json.dumps({"task": "ios only", "device": "ios", "id": "pinned"}))
+    path.write_text("\n".join(lines) + "\n")
+
+def runner(
+    tmp_path,
+    flaky: dict[str, int],
+    runs: list,
+    retries: int = 2,
+    devices: tuple[str, ...] = ("mac", "ios"),
+) -> BatchRunner:
+    async def factory(device):
+        return FakeAgent(device, flaky, runs)
+
+    return BatchRunner(
+        load_tasks(tmp_path / "tasks.jsonl"),
+        tmp_path / "out",
+        list(devices),
+        factory,
+        retries=retries,
+        backoff=NO_WAIT,
+    )
+
+@pytest.mark.asyncio
+async def test_tasks_spread_over_devices_with_retries(tmp_path):
+    """Test workers share tasks, pinned tasks stay put and failures retry"""
+    write_tasks(tmp_path / "tasks.jsonl", 6)
+    runs = []
+    progress = await runner(tmp_path, {"t1": 1}, runs).run()
+
+    assert (progress.completed, progress.failed) == (7, 0)
+    assert {device for device, _ in runs} == {"mac", "ios"}
+    assert ("ios", "pinned") in runs
+
+    results = [json.loads(line) for line in (tmp_path / "out/results.jsonl").read_text().splitlines()]
+    retried = next(r for r in results if r["id"] == "t1")
+    assert retried["attempts"] == 2 and retried["status"] == "completed"
+    assert (tmp_path / "out" / retried["screenshot"]).exists()
+    trace = (tmp_path / "out" / retried["trace"]).read_text().splitlines()
+    assert [json.loads(line)["kind"] for line in trace].count("attempt") == 2
+
+@pytest.mark.asyncio
+async def test_resume_skips_completed_tasks(tmp_path):
+    """Test a rerun only picks up tasks that did not complete"""
+    write_tasks(tmp_path / "tasks.jsonl", 4)
+    first = await runner(tmp_path, {"t2": 5}, [], retries=1).run()
+    assert (first.completed, first.failed) == (4, 1)
+
+    # Simulate a crash mid-write of the checkpoint
+    with (tmp_path / "out/results.jsonl").open("a") as f:
+        f.write('{"id": "t3", "sta')
+
+    runs = []
+    second = await runner(tmp_path, {}, runs).run()
+    assert runs == [("mac", "t2")]
+    assert (second.skipped, second.completed) == (4, 1)
+    assert "t2" in load_checkpoint(tmp_path / "out/results.jsonl")
+
+@pytest.mark.asyncio
+async def test_tasks_pinned_to_missing_devices_fail(tmp_path):
+    """Test a task for a device this run lacks is recorded, counted and retried later"""
+    write_tasks(tmp_path / "tasks.jsonl", 2)
+    seen = []
+    batch = runner(tmp_path, {}, [], devices=("mac",))
+    batch.on_progress = lambda result, progress: seen.append(result.id)
+    progress = await batch.run()
+
+    assert (progress.completed, progress.failed) == (2, 1)
+    assert "pinned" in seen
+    assert progress.describe().startswith("[3/3]")
+    results = [json.loads(line) for line in (tmp_path / "out/results.jsonl").read_text().splitlines()]
+    pinned = next(r for r in results if r["id"] == "pinned")
+    assert pinned["status"] == "failed" and pinned["attempts"] == 0
+    assert pinned["error"] == "Device ios is not available"
+
+    runs = []
+    await runner(tmp_path, {}, runs).run()
+    assert runs == [("ios", "pinned")]
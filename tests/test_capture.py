@@ -0,0 +1,76 @@
+"""Capture backend tests"""
+
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.tools import capture
+from src.tools.capture import CaptureError, FakeBackend, X11ShmBackend, create_backend
+from src.tools.displays import Display
+
+def test_fake_backend_cycles_frames():
+    """Test fake frames come back in order as independent copies"""
+    red = Image.new("RGB", (4, 2), "red")
+    blue = np.zeros((2, 4, 3), dtype=np.uint8)
+    backend = FakeBackend([red, blue])
+
+    first = backend.grab()
+    assert first.shape == (2, 4, 3)
+    assert tuple(first[0, 0]) == (255, 0, 0)
+    first[:] = 0
+    assert backend.grab().sum() == 0
+    assert tuple(backend.grab()[0, 0]) == (255, 0, 0)
+    assert backend.image().size == (4, 2)
+    assert backend.grabs == 4
+
+def _two_displays() -> tuple[FakeBackend, list[Display], tuple[int, int, int, int]]:
+    """Desktop of a 1440x900 main display and a 1920x1080 one to its right"""
+    desktop = np.zeros((1080, 3360, 3), dtype=np.uint8)
+    desktop[:900, :1440] = (255, 0, 0)
+    desktop[:, 1440:] = (0, 0, 255)
+    displays = [Display(0, 0, 0, 1440, 900), Display(1, 1440, 0, 1920, 1080, scale=2.0)]
+    return FakeBackend([desktop]), displays, (0, 0, 3360, 1080)
+
+def test_grab_display_cuts_each_display_from_the_desktop():
+    """Test a secondary display is captured from its own bounds, not the main one"""
+    backend, (main, side), desktop = _two_displays()
+
+    frame = backend.grab_display(main, desktop)
+    assert frame.shape == (900, 1440, 3)
+    assert (frame == (255, 0, 0)).all()
+
+    frame = backend.grab_display(side, desktop)
+    assert frame.shape == (1080, 1920, 3)
+    assert (frame == (0, 0, 255)).all()
+
+    # Buffers are sized in backing pixels, so a 2x display is scaled up to fit
+    width, height = side.pixel_size
+    out = np.empty((height, width, 3), dtype=np.uint8)
+    backend.grab_display_into(out, side, desktop)
+    assert (out == (0, 0, 255)).all()
+
+def test_config_names_the_backend(monkeypatch):
+    """Test an explicit backend name overrides automatic selection"""
+    monkeypatch.setitem(capture.CONFIG, "capture_backend", "fake")
+    assert isinstance(create_backend(), FakeBackend)
+
+    with pytest.raises(CaptureError):
+        create_backend("bogus")
+
+def test_x11_needs_a_display(monkeypatch):
+    monkeypatch.delenv("DISPLAY", raising=False)
+    with pytest.raises(CaptureError):
+        X11ShmBackend()
+
+@pytest.mark.skipif(not os.environ.get("DISPLAY"), reason="needs an X display")
+def test_x11_grabs_the_root_window():
+    """Test shared-memory frames match the display size"""
+    backend = X11ShmBackend()
+    try:
+        frame = backend.grab()
+        assert frame.shape == (backend.height, backend.width, 3)
+        assert frame.dtype == np.uint8
+    finally:
+        backend.close()
@@ -0,0 +1,65 @@
+"""Capture policy tests"""
+
+import pytest
+from PIL import Image
+
+from src.tools.capture_policy import CaptureMode, CapturePolicy, clamp_region, thumbnail_note
+
+def test_detail_requests_escalate_and_reset():
+    """Test repeated requests for detail switch to full frames until they age out"""
+    policy = CapturePolicy(window=3, escalate_after=2)
+    assert policy.after_action() == CaptureMode.THUMBNAIL
+
+    policy.record(True)
+    assert policy.after_action() == CaptureMode.THUMBNAIL
+    policy.record(True)
+    assert policy.after_action() == CaptureMode.FULL
+
+    policy.record(False)
+    assert policy.after_action() == CaptureMode.FULL
+    policy.record(False)
+    assert policy.after_action() == CaptureMode.THUMBNAIL
+
+    fixed = CapturePolicy(adaptive=False, window=3, escalate_after=1)
+    fixed.record(True)
+    assert fixed.after_action() == CaptureMode.THUMBNAIL
+
+def test_screenshot_quality():
+    """Test explicit quality wins, counts as a detail request and is validated"""
+    policy = CapturePolicy(mode=CaptureMode.NONE, escalate_after=2)
+    assert policy.for_screenshot(None) == CaptureMode.THUMBNAIL
+    assert policy.for_screenshot("low") == CaptureMode.THUMBNAIL
+    assert policy.for_screenshot("high") == CaptureMode.FULL
+    assert policy.after_action() == CaptureMode.NONE
+    assert policy.for_screenshot("high") == CaptureMode.FULL
+    assert policy.after_action() == CaptureMode.FULL
+    assert policy.for_screenshot(None) == CaptureMode.FULL
+
+    with pytest.raises(ValueError, match="medium"):
+        policy.for_screenshot("medium")
+
+def test_clamp_region():
+    """Test regions are cut to the image and rejected when nothing is left"""
+    assert clamp_region((10, 20, 30, 40), 100, 100) == (10, 20, 40, 60)
+    assert clamp_region((-10, -5, 30, 40), 100, 100) == (0, 0, 20, 35)
+    assert clamp_region((90, 80, 30, 40), 100, 100) == (90, 80, 100, 100)
+
+    for region in [(100, 0, 10, 10), (0, 100, 10, 10), (-20, 0, 10, 10), (10, 10, 0, 5)]:
+        with pytest.raises(ValueError, match="outside the screen"):
+            clamp_region(region, 100, 100)
+
+def test_thumbnail_and_note():
+    """Test only downscaled images get a note naming the full coordinate space"""
+    policy = CapturePolicy(thumbnail_width=640)
+    image, scale = policy.thumbnail(Image.new("RGB", (1280, 801)))
+    assert image.size == (640, 400)
+    assert scale == 0.5
+    note = thumbnail_note(scale, "1280x801 space")
+    assert note.startswith("Thumbnail at 0.50x; coordinates stay in 1280x801 space.")
+    assert "zoom" in note
+
+    small = Image.new("RGB", (320, 200))
+    image, scale = policy.thumbnail(small)
+    assert image is small
+    assert scale == 1.0
+    assert thumbnail_note(scale, "320x200 space") is None
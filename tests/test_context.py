@@ -0,0 +1,63 @@
+"""Context manager tests"""
+
+import base64
+from io import BytesIO
+
+from PIL import Image
+
+from src.api.context import SUMMARY_PREFIX, ContextManager
+
+def screenshot() -> str:
+    buffer = BytesIO()
+    Image.new("RGB", (1280, 800)).save(buffer, format="PNG")
+    return base64.b64encode(buffer.getvalue()).decode()
+
+def history(turns: int) -> list[dict]:
+    messages = []
+    for turn in range(turns):
+        messages.append({"role": "user", "content": f"step {turn}"})
+        messages.append({
+            "role": "tool",
+            "content": {"output": f"done {turn}", "error": None, "image": screenshot()},
+        })
+    return messages
+
+def test_compaction_at_watermark():
+    """Test long histories are summarized with only the latest image kept"""
+    context = ContextManager(context_window=20_000, watermark=0.5, max_output_tokens=1000)
+    messages = history(10)
+    assert context.needs_compaction(messages)
+
+    compacted = context.compact(messages)
+
+    assert compacted[0]["content"].startswith(SUMMARY_PREFIX)
+    assert "done 0" in compacted[0]["content"]
+    images = [m for m in compacted if isinstance(m["content"], dict) and m["content"]["image"]]
+    assert images == [compacted[-1]]
+    assert not context.needs_compaction(compacted)
+
+def test_usage_calibrates_estimates():
+    """Test reported usage is attributed to messages and corrects estimates"""
+    context = ContextManager(context_window=200_000)
+    messages = [{"role": "user", "content": "x" * 400}]
+    before = context.estimate(messages)
+
+    context.record_usage(messages, input_tokens=before * 2, output_tokens=50)
+
+    assert context.records[0].actual == before * 2
+    assert context.estimate(messages) > before
+
+def test_usage_ignores_messages_added_after_the_request():
+    """Test tool results appended while streaming are left for the next request"""
+    context = ContextManager(context_window=200_000)
+    messages = [{"role": "user", "content": "x" * 400}]
+    before = context.estimate(messages)
+    sent = len(messages)
+    messages.append({"role": "user", "content": "y" * 4000})
+    context.sync(messages)  # Seen before usage arrives
+
+    context.record_usage(messages[:sent], input_tokens=before * 2)
+
+    assert context.records[0].actual == before * 2
+    assert context.records[1].actual is None
+    assert context.calibration > 1.0
@@ -0,0 +1,68 @@
+"""Deadline propagation tests"""
+
+import asyncio
+import time
+
+import pytest
+
+from src.utils.contexts import device_operation
+from src.utils.deadline import Deadline, DeadlineExceeded, current_deadline, use_deadline
+from src.utils.resilience import RetryPolicy, retry_async
+from src.utils.state import DeviceStatus, StateManager
+
+class SlowDevices:
+    """Device manager stand-in that is always ready"""
+
+    def __init__(self):
+        self.state = StateManager()
+
+    async def ensure_device_ready(self, device_type: str) -> bool:
+        return True
+
+    def cleanup(self):
+        pass
+
+@pytest.mark.asyncio
+async def test_scope_cancels_work_past_deadline():
+    """Test work is cancelled when the task budget runs out"""
+    deadline = Deadline.after(0.05)
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        async with deadline.scope():
+            await asyncio.sleep(5)
+    assert time.monotonic() - start < 1
+
+    # Nested layers never get more than their parent has left
+    with use_deadline(deadline):
+        assert current_deadline().child(60).expires_at == deadline.expires_at
+        with pytest.raises(DeadlineExceeded):
+            current_deadline().timeout(cap=5)
+
+@pytest.mark.asyncio
+async def test_retries_stop_at_deadline():
+    """Test retry backoff does not sleep past the task deadline"""
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        raise TimeoutError()
+
+    policy = RetryPolicy(attempts=10, base_delay=0.2, max_delay=0.2, deadline=None)
+    with use_deadline(Deadline.after(0.1)):
+        with pytest.raises(TimeoutError):
+            await retry_async(failing, policy)
+    assert len(calls) < 10
+
+@pytest.mark.asyncio
+async def test_device_operation_times_out_once():
+    """Test a timed out operation yields once and marks the device"""
+    devices = SlowDevices()
+    entered = 0
+    with pytest.raises(DeadlineExceeded):
+        async with device_operation(devices, "mac", timeout=0.05) as ready:
+            entered += 1
+            assert ready
+            await asyncio.sleep(5)
+
+    assert entered == 1
+    assert devices.state.mac_state.status == DeviceStatus.ERROR
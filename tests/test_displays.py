@@ -0,0 +1,112 @@
+"""Display topology and coordinate mapping tests"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+from src.tools.capture import FakeBackend
+from src.tools.displays import (
+    Display,
+    DisplayMapping,
+    DisplayTopology,
+    Transform,
+    display_box,
+    scaling_target,
+)
+
+def test_scaling_target_matches_aspect_ratio():
+    """Test each display gets the largest target of its own shape"""
+    assert scaling_target(1440, 900) == (1280, 800)  # 16:10
+    assert scaling_target(1920, 1080) == (1366, 768)  # 16:9
+    assert scaling_target(2048, 1536) == (1024, 768)  # 4:3
+    assert scaling_target(1512, 982) == (1512, 982)  # No match, no distortion
+    assert scaling_target(800, 500) == (800, 500)  # Never upscale
+
+def test_transform_inverse_round_trips():
+    transform = Transform(1.5, 1.35, 1920, -200)
+    inverse = transform.inverse()
+    for point in ((0, 0), (640, 400), (1279, 799)):
+        assert inverse.apply(*transform.apply(*point)) == point
+
+def test_mapping_places_second_display():
+    """Test model coordinates land on the right display in global points"""
+    display = Display(1, 1440, -180, 1920, 1080, scale=2.0)
+    mapping = DisplayMapping.for_display(display)
+    assert mapping.target == (1366, 768)
+    assert mapping.to_screen.apply(0, 0) == (1440, -180)
+    assert mapping.to_screen.apply(1366, 768) == (3360, 900)
+    assert mapping.to_local.apply(1366, 768) == (1920, 1080)
+    assert mapping.from_screen.apply(3360, 900) == (1366, 768)
+
+    native = DisplayMapping.for_display(display, scaling=False)
+    assert not native.scaled
+    assert native.to_screen.apply(10, 10) == (1450, -170)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_topology_caches_and_detects_changes():
+    """Test displays are enumerated once per TTL and changes rebuild mappings"""
+    layouts = [[Display(0, 0, 0, 1440, 900)]]
+    calls = []
+
+    def enumerate():
+        calls.append(1)
+        return layouts[-1]
+
+    clock = FakeClock()
+    topology = DisplayTopology(enumerate, ttl=2.0, clock=clock)
+    assert topology.mapping(0).target == (1280, 800)
+    assert topology.mapping(0) is topology.mapping(0)
+    assert len(calls) == 1
+
+    layouts.append([Display(0, 0, 0, 1440, 900), Display(1, 1440, 0, 1920, 1080)])
+    assert topology.mapping(1) is None  # Still cached
+    clock.now = 2.0
+    assert topology.mapping(1).target == (1366, 768)
+    assert topology.generation == 2
+    assert topology.bounds == (0, 0, 3360, 1080)
+
+    # A desktop frame at 2x pixels crops to the second display
+    assert topology.frame_box(1, 6720) == (2880, 0, 6720, 2160)
+
+def test_topology_needs_a_display():
+    with pytest.raises(RuntimeError):
+        DisplayTopology(lambda: [])
+
+def test_display_box_and_pixel_size():
+    display = Display(1, 1440, 0, 1920, 1080, scale=2.0)
+    assert display.bounds == (1440, 0, 3360, 1080)
+    assert display.pixel_size == (3840, 2160)
+    assert display_box(display, (0, 0, 3360, 1080), 3360) == (1440, 0, 3360, 1080)
+
+@pytest.mark.skipif(
+    sys.platform != "darwin" and not os.environ.get("DISPLAY"),
+    reason="pyautogui needs a display",
+)
+@pytest.mark.asyncio
+async def test_mac_tool_screenshots_its_own_display():
+    """Test a tool for the second display sees that display, scaled to its target"""
+    from src.tools.mac_tool import MacTool
+
+    desktop = np.zeros((1080, 3360, 3), dtype=np.uint8)
+    desktop[:, 1440:] = (0, 0, 255)
+    topology = DisplayTopology(
+        lambda: [Display(0, 0, 0, 1440, 900), Display(1, 1440, 0, 1920, 1080)]
+    )
+    tool = MacTool(1, FakeBackend([desktop]), topology)
+    assert tool.name == "mac_1"
+
+    image = tool._grab_image()
+    assert image.size == (1920, 1080)
+    assert image.getpixel((0, 0)) == (0, 0, 255)
+
+    result = await tool(action="screenshot", quality="high")
+    assert result.error is None
+    assert tool._last_frame.getpixel((960, 540)) == (0, 0, 255)
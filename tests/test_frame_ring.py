@@ -0,0 +1,142 @@
+"""Background frame ring tests"""
+
+import time
+
+import numpy as np
+import pytest
+
+from src.tools.capture import FakeBackend
+from src.tools.frame_ring import BackgroundCapture, FrameRing, shared_capture, stop_captures
+
+SHAPE = (32, 48, 3)
+
+def _frame(value: int) -> np.ndarray:
+    return np.full(SHAPE, value, dtype=np.uint8)
+
+def _write(ring: FrameRing, value: int, timestamp: float) -> bool:
+    ring.writable()[:] = value
+    return ring.commit(timestamp)
+
+def test_ring_reuses_buffers_and_keeps_latest():
+    """Test frames cycle through preallocated buffers, oldest evicted first"""
+    ring = FrameRing(3, SHAPE)
+    buffers = ring.buffers
+
+    assert _write(ring, 10, 1.0)
+    assert not _write(ring, 10, 2.0)
+    for value, timestamp in ((20, 3.0), (30, 4.0), (40, 5.0)):
+        assert _write(ring, value, timestamp)
+
+    assert ring.buffers is buffers
+    assert sorted(ring.times) == [3.0, 4.0, 5.0]
+    assert ring.latest_after(0.0)[0, 0, 0] == 40
+    assert ring.latest_after(5.0) is None
+
+    # Readers get copies, so the writer may reuse the buffer
+    latest = ring.latest_after(4.5)
+    _write(ring, 50, 6.0)
+    _write(ring, 60, 7.0)
+    assert latest[0, 0, 0] == 40
+
+def test_stable_after_skips_frames_before_the_action():
+    """Test the first frame newer than the action that the next frame repeats"""
+    ring = FrameRing(8, SHAPE)
+    _write(ring, 0, 1.0)
+    _write(ring, 0, 2.0)  # Stable, but from before the action
+    _write(ring, 90, 3.0)  # Still animating
+    assert ring.stable_after(2.5) is None
+
+    _write(ring, 120, 4.0)
+    _write(ring, 120, 5.0)
+    assert ring.stable_after(2.5)[0, 0, 0] == 120
+    assert ring.stable_after(0.0)[0, 0, 0] == 0
+
+@pytest.mark.asyncio
+async def test_frame_after_waits_for_a_settled_frame():
+    """Test the capture thread feeds frames until the screen settles"""
+    frames = [_frame(value) for value in (0, 60, 120)] + [_frame(200)] * 50
+    backend = FakeBackend(frames)
+    capture = BackgroundCapture(backend.grab_into, SHAPE, min_interval=0.005, max_duty=1.0)
+
+    since = time.monotonic()
+    capture.start()
+    try:
+        frame = await capture.frame_after(since, timeout=2.0)
+    finally:
+        capture.stop()
+
+    assert frame[0, 0, 0] == 200
+    assert not capture.running
+
+@pytest.mark.asyncio
+async def test_frame_after_falls_back_to_latest_frame():
+    """Test a screen that never settles still yields the newest frame"""
+    backend = FakeBackend([_frame(value) for value in range(0, 250, 10)])
+    capture = BackgroundCapture(backend.grab_into, SHAPE, min_interval=0.005, max_duty=1.0)
+
+    capture.start()
+    try:
+        frame = await capture.frame_after(time.monotonic(), timeout=0.05)
+    finally:
+        capture.stop()
+
+    assert frame is not None
+
+def test_idle_capture_slows_down_and_input_speeds_it_up():
+    """Test the interval backs off on a static screen and resets on input"""
+    backend = FakeBackend([_frame(0)])
+    capture = BackgroundCapture(
+        backend.grab_into,
+        SHAPE,
+        min_interval=0.001,
+        max_interval=0.016,
+        active_period=0.0,
+        max_duty=1.0,
+    )
+
+    capture.start()
+    try:
+        deadline = time.monotonic() + 2.0
+        while capture.interval < 0.016 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert capture.interval == 0.016
+
+        capture.active_period = 10.0
+        capture.poke()
+        time.sleep(0.05)
+        assert capture.interval == 0.001
+    finally:
+        capture.stop()
+
+def test_failing_capture_backs_off_during_input():
+    """Test errors keep the slow interval even while input is recent"""
+    grabs = []
+
+    def broken(out):
+        grabs.append(1)
+        raise OSError("screen gone")
+
+    capture = BackgroundCapture(broken, SHAPE, min_interval=0.001, max_interval=0.5, max_duty=1.0)
+    capture.start()
+    try:
+        capture.poke()
+        time.sleep(0.1)
+        assert capture.interval == 0.5
+        assert len(grabs) <= 3
+    finally:
+        capture.stop()
+
+def test_shared_capture_is_reused_until_the_layout_changes():
+    """Test tools watching one display share a capture thread"""
+    backend = FakeBackend([_frame(0)])
+    try:
+        first = shared_capture((backend, 0), "layout", backend.grab_into, SHAPE)
+        assert shared_capture((backend, 0), "layout", backend.grab_into, SHAPE) is first
+        assert first.running
+
+        moved = shared_capture((backend, 0), "moved", backend.grab_into, SHAPE)
+        assert moved is not first
+        assert not first.running
+    finally:
+        stop_captures()
+    assert not moved.running
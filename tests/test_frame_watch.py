@@ -0,0 +1,85 @@
+"""Frame watcher tests"""
+
+from io import BytesIO
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.tools.base import ToolResult
+from src.tools.frame_watch import FrameWatcher, WaitCondition
+from src.tools.ios_tool import IOSTool
+
+def scripted(frames: list[np.ndarray]):
+    """Grab function replaying frames, repeating the last one"""
+    calls = iter(range(10_000))
+
+    def grab() -> np.ndarray:
+        return frames[min(next(calls), len(frames) - 1)]
+
+    return grab
+
+@pytest.mark.asyncio
+async def test_wait_for_region_change():
+    """Test a change inside the watched region ends the wait"""
+    blank = np.zeros((200, 200), dtype=np.float32)
+    outside = blank.copy()
+    outside[0:40, 0:40] = 255
+    inside = outside.copy()
+    inside[120:160, 120:160] = 255
+
+    watcher = FrameWatcher(scripted([blank, outside, inside]))
+    outcome = await watcher.wait(
+        WaitCondition.REGION_CHANGE,
+        region=(100, 100, 100, 100),
+        interval=0,
+    )
+
+    assert outcome.met and outcome.frames == 3
+
+@pytest.mark.asyncio
+async def test_wait_times_out_without_stability():
+    """Test a constantly changing screen never counts as stable"""
+    rng = np.random.default_rng(0)
+    frames = [(rng.random((64, 64)) * 255).astype(np.float32) for _ in range(1000)]
+
+    watcher = FrameWatcher(scripted(frames))
+    outcome = await watcher.wait(WaitCondition.STABLE, timeout=0.2, interval=0.01)
+
+    assert not outcome.met
+
+class FrameDriver:
+    """Appium driver stand-in serving screenshots that change after a few polls"""
+
+    def __init__(self, change_after: int):
+        self.change_after = change_after
+        self.screenshots = 0
+        self.size_requests = 0
+
+    def get_screenshot_as_png(self) -> bytes:
+        self.screenshots += 1
+        color = "white" if self.screenshots > self.change_after else "black"
+        buffer = BytesIO()
+        Image.new("RGB", (780, 1688), color).save(buffer, format="PNG")
+        return buffer.getvalue()
+
+    def get_window_size(self):
+        self.size_requests += 1
+        return {"width": 390, "height": 844}
+
+@pytest.mark.asyncio
+async def test_ios_wait_fetches_only_screenshots_per_poll():
+    """Test polling a device asks for its window size once per wait, not per frame"""
+    tool = IOSTool()
+    tool.driver = FrameDriver(change_after=4)
+
+    async def no_screenshot(mode=None):
+        return ToolResult(output="screenshot")
+
+    tool._take_screenshot = no_screenshot
+    result = await tool._wait(WaitCondition.REGION_CHANGE, (0, 0, 195, 422), None, 5.0, 0)
+
+    assert result.output.endswith("\nscreenshot")
+    # One to scale the region, then polls until the fifth screenshot changes
+    assert tool.driver.screenshots == 5
+    assert tool.driver.size_requests == 1
@@ -0,0 +1,23 @@
+"""Image payload tests"""
+
+import base64
+
+from PIL import Image
+
+from src.api.context import image_tokens
+from src.tools.base import ToolResult
+from src.utils.imaging import ImagePayload
+
+def test_payload_encodes_base64_once():
+    """Test base64 is produced lazily, cached and counted in the footprint"""
+    payload = ImagePayload.from_image(Image.new("RGB", (1280, 800), "white"))
+    assert payload.footprint == len(payload.data)
+
+    result = ToolResult(image=payload)
+    encoded = result.base64_image
+    assert base64.b64decode(encoded) == payload.data
+    assert payload.base64 is encoded
+    assert payload.footprint == len(payload.data) + len(encoded)
+
+    assert payload.view().obj is payload.data
+    assert image_tokens(payload) == image_tokens(encoded) == 1280 * 800 // 750
@@ -0,0 +1,132 @@
+"""Session journal persistence and crash recovery tests"""
+
+import os
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from src.api.journal import SessionJournal
+from src.utils.imaging import ImagePayload
+
+def screenshot(color: str = "navy") -> ImagePayload:
+    return ImagePayload.from_image(Image.new("RGB", (64, 40), color))
+
+def tool_message(image: ImagePayload) -> dict:
+    return {"role": "tool", "content": {"output": "ok", "error": None, "image": image}}
+
+def open_journal(root: Path, **kwargs) -> SessionJournal:
+    return SessionJournal.open(root, "session-1", fsync=False, **kwargs)
+
+def test_messages_and_images_round_trip(tmp_path):
+    """Test images go to the blob store once and come back as payloads"""
+    journal = open_journal(tmp_path)
+    image = screenshot()
+    journal.append({"role": "user", "content": "open notes"})
+    journal.append(tool_message(image))
+    journal.append(tool_message(screenshot()))  # Same pixels, same blob
+    journal.close()
+
+    assert len(list((tmp_path / "blobs").rglob("*.png"))) == 1
+
+    resumed = open_journal(tmp_path)
+    messages = resumed.load()
+    assert messages[0] == {"role": "user", "content": "open notes"}
+    assert messages[1]["content"]["image"] == image
+    assert len(resumed) == 3
+
+def test_resume_loads_checkpoint_and_window(tmp_path):
+    """Test resume starts at the last checkpoint and caps the window"""
+    journal = open_journal(tmp_path)
+    for index in range(10):
+        journal.append({"role": "user", "content": f"old {index}"})
+    journal.write_checkpoint([{"role": "user", "content": "summary"}])
+    for index in range(5):
+        journal.append({"role": "user", "content": f"new {index}"})
+    journal.close()
+
+    resumed = open_journal(tmp_path)
+    assert [m["content"] for m in resumed.load()] == ["summary"] + [f"new {i}" for i in range(5)]
+    assert [m["content"] for m in resumed.load(window=2)] == ["new 3", "new 4"]
+    # Cold history is still there, paged in on demand
+    assert [m["content"] for m in resumed.history(0, 2)] == ["old 0", "old 1"]
+
+def test_torn_tail_is_truncated(tmp_path):
+    """Test a half-written final record is dropped and appends continue"""
+    journal = open_journal(tmp_path)
+    journal.append({"role": "user", "content": "kept"})
+    journal.append({"role": "assistant", "content": "torn"})
+    journal.close()
+
+    path = journal.path
+    size = path.stat().st_size
+    with open(path, "r+b") as f:
+        f.truncate(size - 3)
+
+    resumed = open_journal(tmp_path)
+    assert [m["content"] for m in resumed.load()] == ["kept"]
+    resumed.append({"role": "assistant", "content": "after"})
+    resumed.close()
+    assert [m["content"] for m in open_journal(tmp_path).load()] == ["kept", "after"]
+
+def test_corrupt_final_record_is_dropped(tmp_path):
+    journal = open_journal(tmp_path)
+    journal.append({"role": "user", "content": "kept"})
+    journal.append({"role": "user", "content": "flipped"})
+    journal.close()
+
+    with open(journal.path, "r+b") as f:
+        f.seek(-1, os.SEEK_END)
+        last = f.read(1)
+        f.seek(-1, os.SEEK_END)
+        f.write(bytes([last[0] ^ 0xFF]))
+
+    assert [m["content"] for m in open_journal(tmp_path).load()] == ["kept"]
+
+def test_invalid_session_id(tmp_path):
+    with pytest.raises(ValueError):
+        SessionJournal.open(tmp_path, "../escape")
+
+WRITER = """
+import sys
+from PIL import Image
+from src.api.journal import SessionJournal
+from src.utils.imaging import ImagePayload
+
+journal = SessionJournal.open(__import__("pathlib").Path(sys.argv[1]), "session-1")
+for index in range(100000):
+    image = ImagePayload.from_image(Image.new("RGB", (32, 32), (index % 256, 0, 0)))
+    journal.append({"role": "tool", "content": {"output": str(index), "error": None, "image": image}})
+    if index == 20:
+        print("ready", flush=True)
+"""
+
+def test_recovers_after_kill(tmp_path):
+    """Test a process killed mid-write leaves a readable prefix"""
+    writer = subprocess.Popen(
+        [sys.executable, "-c", WRITER, str(tmp_path)],
+        cwd=Path(__file__).parent.parent,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        assert writer.stdout.readline().strip() == "ready"
+        time.sleep(0.05)
+    finally:
+        writer.send_signal(signal.SIGKILL)
+        writer.wait()
+
+    journal = open_journal(tmp_path)
+    messages = journal.load(window=100000)
+    assert len(messages) > 20
+    assert [m["content"]["output"] for m in messages] == [str(i) for i in range(len(messages))]
+    # Every image the surviving records point at was fully written
+    assert all(m["content"]["image"].open().size == (32, 32) for m in messages)
+
+    journal.append({"role": "user", "content": "resumed"})
+    journal.close()
+    assert len(open_journal(tmp_path)) == len(messages) + 1
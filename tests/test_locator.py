@@ -0,0 +1,58 @@
+"""Template locator tests"""
+
+import numpy as np
+from PIL import Image
+
+from src.tools.locator import TemplateLocator
+
+def make_frame() -> np.ndarray:
+    """Noisy full-HD frame with a distinctive button"""
+    rng = np.random.default_rng(0)
+    frame = (rng.random((1080, 1920)) * 50).astype(np.float32)
+    frame[500:540, 900:1000] = 200
+    frame[510:530, 920:980] = 30
+    return frame
+
+def test_find_moved_target():
+    """Test a remembered target is found after it moves"""
+    frame = make_frame()
+    locator = TemplateLocator()
+    locator.remember("button", frame, 950, 520)
+
+    moved = np.roll(frame, (37, -120), axis=(0, 1))
+    match = locator.find("button", moved)
+
+    assert match is not None
+    assert abs(match.x - 830) <= 2 and abs(match.y - 557) <= 2
+
+def test_find_scaled_target():
+    """Test a target is found when the screen is rendered larger"""
+    frame = make_frame()
+    locator = TemplateLocator()
+    locator.remember("button", frame, 950, 520)
+
+    image = Image.fromarray(frame).resize((2112, 1188))
+    scaled = np.asarray(image, dtype=np.float32)[:1080, :1920]
+    match = locator.find("button", scaled)
+
+    assert match is not None and match.scale == 1.1
+    assert abs(match.x - 1045) <= 3 and abs(match.y - 572) <= 3
+
+def test_missing_target():
+    """Test a target absent from the frame is not reported"""
+    locator = TemplateLocator()
+    locator.remember("button", make_frame(), 950, 520)
+
+    rng = np.random.default_rng(1)
+    noise = (rng.random((1080, 1920)) * 50).astype(np.float32)
+    assert locator.find("button", noise) is None
+
+def test_spectrum_cache_evicts_oldest():
+    """Test template spectra are evicted least recently used first"""
+    frame = make_frame()
+    locator = TemplateLocator(scales=(1.0,), cache_size=2)
+    for label in ("a", "b", "c"):
+        locator.remember(label, frame, 950, 520)
+        locator.find(label, frame)
+
+    assert [key[0] for key in locator._spectra] == ["b", "c"]
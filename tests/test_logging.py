@@ -0,0 +1,37 @@
+"""Logging subsystem tests"""
+
+import json
+import logging
+
+from src.utils.logging import (
+    ContextFilter,
+    JsonFormatter,
+    SamplingFilter,
+    log_context,
+    setup_logging,
+)
+
+def test_setup_is_idempotent():
+    """Test repeated setup does not add handlers"""
+    logger = setup_logging()
+    handlers = list(logger.handlers)
+    assert setup_logging() is logger
+    assert logger.handlers == handlers
+
+def test_records_carry_context_as_json():
+    """Test records are tagged with IDs and debug noise is sampled"""
+    context, sampling, formatter = ContextFilter(), SamplingFilter(every=4), JsonFormatter()
+
+    def record(level: int) -> logging.LogRecord:
+        return logging.LogRecord("test", level, "app.py", 7, "tapped %s", ("ok",), None)
+
+    with log_context(session="s1", device="ios", step=3):
+        tagged = record(logging.INFO)
+        context.filter(tagged)
+    entry = json.loads(formatter.format(tagged))
+    assert entry["msg"] == "tapped ok"
+    assert (entry["session"], entry["device"], entry["step"]) == ("s1", "ios", 3)
+
+    kept = sum(sampling.filter(record(logging.DEBUG)) for _ in range(100))
+    assert kept == 25
+    assert sampling.filter(record(logging.WARNING))
@@ -0,0 +1,100 @@
+"""Sampling profiler tests"""
+
+import asyncio
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+from src.utils.logging import log_context
+from src.utils.profiler import SamplingProfiler
+
+def spin_in_thread(seconds: float):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+async def spin_on_loop(seconds: float):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+async def device_step(session: str, step: int):
+    with log_context(session=session, step=step):
+        await asyncio.to_thread(spin_in_thread, 0.2)
+
+async def model_turn(session: str):
+    with log_context(session=session):
+        await spin_on_loop(0.2)
+
+def _stacks(counts: Counter, session: str) -> dict[tuple, int]:
+    return {key: count for key, count in counts.items() if key[0] == session}
+
+@pytest.mark.asyncio
+async def test_samples_are_attributed_to_session_and_step():
+    """Test worker thread and event loop samples carry their task's IDs"""
+    profiler = SamplingProfiler(interval=0.002)
+    profiler.enable("traced")
+    try:
+        await device_step("traced", 3)
+        await model_turn("traced")
+        await device_step("other", 1)
+    finally:
+        profiler.disable()
+
+    counts = profiler.take()
+    assert counts
+    assert {key[0] for key in counts} == {"traced"}
+
+    threaded = [key for key in counts if any("spin_in_thread" in frame for frame in key[3])]
+    on_loop = [key for key in counts if any("spin_on_loop" in frame for frame in key[3])]
+    assert threaded and on_loop
+    assert {key[1] for key in threaded} == {3}
+    assert {key[1] for key in on_loop} == {None}
+    # Stacks are root first
+    assert all(key[3][-1].startswith("spin_in_thread") for key in threaded)
+
+@pytest.mark.asyncio
+async def test_global_profiling_keeps_unattributed_threads():
+    """Test profiling everything also samples threads outside any session"""
+    stop = threading.Event()
+    idle = threading.Thread(target=stop.wait, name="bystander")
+    idle.start()
+    profiler = SamplingProfiler(interval=0.002)
+    profiler.enable()
+    try:
+        await model_turn("any")
+    finally:
+        profiler.disable()
+        stop.set()
+        idle.join()
+
+    counts = profiler.take()
+    assert _stacks(counts, "any")
+    assert any(key[0] is None and key[2] == "bystander" for key in counts)
+    assert profiler.samples > 10
+    assert profiler._thread is None
+
+def test_take_and_export_collapsed(tmp_path):
+    """Test exported lines are collapsed stacks with a step root, appended per task"""
+    profiler = SamplingProfiler(interval=1.0)
+    profiler.counts.update({
+        ("a", 2, "MainThread", ("main (app.py:1)", "click (mac_tool.py:9)")): 5,
+        ("a", None, "MainThread", ("main (app.py:1)", "parse; json (x.py:4)")): 2,
+        ("b", None, "worker", ("run (w.py:1)",)): 7,
+    })
+
+    path = tmp_path / "task.collapsed"
+    assert profiler.export(path, "a") == path
+    assert sorted(path.read_text().splitlines()) == [
+        "no step;MainThread;main (app.py:1);parse: json (x.py:4) 2",
+        "step 2;MainThread;main (app.py:1);click (mac_tool.py:9) 5",
+    ]
+    assert profiler.export(path, "a") is None
+    assert set(key[0] for key in profiler.counts) == {"b"}
+
+    everything = tmp_path / "all.collapsed"
+    profiler.export(everything)
+    assert everything.read_text() == "session b;no step;worker;run (w.py:1) 7\n"
+    assert not profiler.counts
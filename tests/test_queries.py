@@ -0,0 +1,191 @@
+"""State query tests with a fake clock and a fake Appium driver"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+from src.tools.base import ToolResult
+from src.tools.capture import FakeBackend
+from src.tools.displays import Display, DisplayTopology
+from src.tools.ios_tool import IOSTool
+from src.tools.queries import QueryCache
+
+needs_display = pytest.mark.skipif(
+    sys.platform != "darwin" and not os.environ.get("DISPLAY"),
+    reason="pyautogui needs a display",
+)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.mark.asyncio
+async def test_cache_serves_until_ttl():
+    """Test values are reused within their TTL and reloaded after"""
+    clock = FakeClock()
+    cache = QueryCache(clock)
+    loads = []
+
+    def load():
+        loads.append(clock.now)
+        return len(loads)
+
+    assert await cache.get("app", 1.0, load) == 1
+    assert await cache.get("app", 1.0, load) == 1
+    clock.now = 1.0
+    assert await cache.get("app", 1.0, load) == 2
+    cache.clear()
+    assert await cache.get("app", 1.0, load) == 3
+    assert (cache.hits, cache.misses) == (1, 3)
+
+class FakeDriver:
+    orientation = "LANDSCAPE"
+
+    def __init__(self):
+        self.scripts = []
+
+    def execute_script(self, script, args=None):
+        self.scripts.append(script)
+        if script == "mobile: activeAppInfo":
+            return {"bundleId": "com.apple.mobilenotes", "name": "Notes"}
+        if script == "mobile: batteryInfo":
+            return {"level": 0.82, "state": 2}
+        return {}
+
+    def is_locked(self):
+        return False
+
+    def get_window_size(self):
+        return {"width": 390, "height": 844}
+
+    def tap(self, positions):
+        pass
+
+async def no_screenshot(mode=None):
+    return ToolResult(output="screenshot")
+
+@pytest.fixture
+def ios():
+    tool = IOSTool()
+    tool.driver = FakeDriver()
+    tool._take_screenshot = no_screenshot
+    tool.query_cache.clear()
+    return tool
+
+@pytest.mark.asyncio
+async def test_ios_queries_answer_in_text(ios):
+    """Test iOS state comes back as short text with no screenshot"""
+    results = {
+        action: await ios(action=action)
+        for action in sorted(IOSTool.query_actions)
+    }
+    assert results["get_current_app"].output == "Current app: Notes (com.apple.mobilenotes)"
+    assert results["get_orientation"].output == "Orientation: landscape"
+    assert results["get_device_state"].output == "Battery 82%, charging; screen unlocked"
+    assert results["get_screen_size"].output == "Screen 390x844 points"
+    assert all(result.image is None for result in results.values())
+
+@pytest.mark.asyncio
+async def test_ios_input_invalidates_cached_state(ios):
+    await ios(action="get_current_app")
+    await ios(action="get_current_app")
+    assert ios.driver.scripts.count("mobile: activeAppInfo") == 1
+
+    await ios(action="tap", position=(10, 10))
+    await ios(action="get_current_app")
+    assert ios.driver.scripts.count("mobile: activeAppInfo") == 2
+
+@pytest.mark.asyncio
+async def test_ios_tools_share_a_device_cache(ios):
+    """Test input through another tool on the same phone drops cached state"""
+    other = IOSTool()
+    other.driver = ios.driver
+    other._take_screenshot = no_screenshot
+    assert other.query_cache is ios.query_cache
+
+    await ios(action="get_current_app")
+    await other(action="tap", position=(10, 10))
+    await ios(action="get_current_app")
+    assert ios.driver.scripts.count("mobile: activeAppInfo") == 2
+
+@pytest.fixture
+def macs(monkeypatch):
+    """Tools for a 1440x900 main display and a 1920x1080 one to its right"""
+    from src.tools import mac_tool
+
+    windows = [
+        {"app": "Finder", "title": "Docs", "bounds": {"X": 180, "Y": 90, "Width": 360, "Height": 270}},
+        {"app": "Safari", "title": "", "bounds": {"X": 2400, "Y": 540, "Width": 960, "Height": 540}},
+    ]
+    listed = []
+
+    def window_list():
+        listed.append(1)
+        return windows
+
+    monkeypatch.setattr(mac_tool, "_window_list", window_list)
+    monkeypatch.setattr(mac_tool.pyautogui, "position", lambda: (2400, 540))
+    monkeypatch.setattr(mac_tool.pyautogui, "moveTo", lambda x, y: None)
+    topology = DisplayTopology(
+        lambda: [Display(0, 0, 0, 1440, 900), Display(1, 1440, 0, 1920, 1080)]
+    )
+    screen = FakeBackend([np.zeros((1080, 3360, 3), dtype=np.uint8)])
+    tools = [mac_tool.MacTool(number, screen, topology) for number in (0, 1)]
+    for tool in tools:
+        tool._screenshot_delay = 0
+    tools[0].query_cache.clear()
+    return tools, listed
+
+@needs_display
+@pytest.mark.asyncio
+async def test_mac_position_is_per_display(macs):
+    """Test the cursor is reported in the model coordinates of its own display"""
+    (main, side), _ = macs
+    assert (await main(action="get_position")).output == "Cursor is not on display 0"
+    assert (await side(action="get_position")).output == "Cursor at (683, 384)"
+
+@needs_display
+@pytest.mark.asyncio
+async def test_mac_windows_are_mapped_and_filtered(macs):
+    """Test each display lists only its windows, in its model coordinates"""
+    (main, side), _ = macs
+    assert (await main(action="list_windows")).output == "Finder - Docs at (160, 80) size 320x240"
+    assert (await side(action="list_windows")).output == "Safari at (683, 384) size 683x384"
+
+@needs_display
+@pytest.mark.asyncio
+async def test_mac_input_on_any_display_invalidates(macs):
+    """Test input through one display's tool drops the windows cached by another"""
+    (main, side), listed = macs
+    assert main.query_cache is side.query_cache
+
+    await main(action="list_windows")
+    await side(action="list_windows")
+    assert len(listed) == 1
+
+    result = await side(action="move", position=(10, 10))
+    assert not result.error
+    await main(action="list_windows")
+    assert len(listed) == 2
+
+@pytest.mark.asyncio
+async def test_rejected_zoom_is_not_a_detail_request(ios):
+    """Test a zoom without a region does not push captures toward full frames"""
+    ios.capture.escalate_after = 1
+    result = await ios(action="zoom")
+    assert result.error == "Region required for zoom"
+    assert ios.capture.after_action() == ios.capture.mode
+
+@needs_display
+@pytest.mark.asyncio
+async def test_mac_rejected_zoom_is_not_a_detail_request(macs):
+    (main, _), _ = macs
+    main.capture.escalate_after = 1
+    result = await main(action="zoom")
+    assert result.error == "Action failed: Region required for zoom"
+    assert main.capture.after_action() == main.capture.mode
@@ -0,0 +1,93 @@
+"""Admission controller tests"""
+
+import asyncio
+import threading
+
+import pytest
+
+from src.api.ratelimit import AdmissionController, Priority, RequestCost
+
+COST = RequestCost(input_tokens=100, output_tokens=100)
+
+async def admit_all(controller, requests):
+    """Queue requests at once and return the order they were admitted"""
+    order = []
+
+    async def request(session, priority, name):
+        await controller.acquire(session, COST, priority)
+        order.append(name)
+
+    await asyncio.gather(*(request(*args) for args in requests))
+    return order
+
+@pytest.mark.asyncio
+async def test_round_robin_across_sessions():
+    """Test a busy session cannot starve another"""
+    controller = AdmissionController(requests_per_minute=1200)
+    controller.buckets["requests"].tokens = 0
+
+    order = await admit_all(controller, [
+        ("a", Priority.INTERACTIVE, "a1"),
+        ("a", Priority.INTERACTIVE, "a2"),
+        ("a", Priority.INTERACTIVE, "a3"),
+        ("b", Priority.INTERACTIVE, "b1"),
+    ])
+
+    assert order == ["a1", "b1", "a2", "a3"]
+    assert controller.metrics()["queue_depth"] == 0
+    assert controller.metrics()["wait_max"] > 0
+
+@pytest.mark.asyncio
+async def test_interactive_before_batch():
+    """Test interactive requests overtake queued batch requests"""
+    controller = AdmissionController(requests_per_minute=1200)
+    controller.buckets["requests"].tokens = 0
+
+    order = await admit_all(controller, [
+        ("batch", Priority.BATCH, "batch"),
+        ("user", Priority.INTERACTIVE, "user"),
+    ])
+
+    assert order == ["user", "batch"]
+
+@pytest.mark.asyncio
+async def test_retry_after_pauses_admission():
+    """Test a retry-after header holds back new requests"""
+    controller = AdmissionController(input_tokens_per_minute=100_000)
+    controller.update_from_headers({"retry-after": "0.2"})
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    await controller.acquire("a", COST)
+
+    assert loop.time() - start >= 0.15
+
+def test_sessions_on_separate_loops_share_limits():
+    """Test sessions on their own loop threads are each admitted within one limit"""
+    controller = AdmissionController(requests_per_minute=1200)
+    controller.buckets["requests"].tokens = 0
+    admitted = []
+    errors = []
+
+    def session(name: str):
+        async def requests():
+            for _ in range(3):
+                ticket = await controller.acquire(name, COST)
+                admitted.append((name, ticket.admitted))
+        try:
+            asyncio.run(asyncio.wait_for(requests(), timeout=10))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=session, args=(f"s{i}",)) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert sorted(name for name, _ in admitted) == ["s0"] * 3 + ["s1"] * 3 + ["s2"] * 3
+    # Nine requests at 20 per second, starting from an empty bucket
+    times = sorted(at for _, at in admitted)
+    assert times[-1] - times[0] >= 0.3
+    assert controller.metrics()["queue_depth"] == 0
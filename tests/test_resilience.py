@@ -0,0 +1,106 @@
+"""Resilience layer tests"""
+
+import asyncio
+
+import pytest
+
+from src.utils.decorators import with_retries
+from src.utils.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    CircuitState,
+    DeviceLostError,
+    ErrorClass,
+    InputDeliveredError,
+    RetryPolicy,
+    after_input,
+    classify,
+    retry_async,
+)
+
+FAST = RetryPolicy(attempts=4, base_delay=0.01, max_delay=0.02)
+
+def flaky(errors: list[Exception]):
+    """Coroutine factory raising the given errors, then succeeding"""
+    calls = []
+
+    async def call():
+        calls.append(1)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return "ok"
+
+    return call, calls
+
+@pytest.mark.asyncio
+async def test_transient_errors_are_retried():
+    """Test timeouts back off and retry until success"""
+    call, calls = flaky([TimeoutError(), TimeoutError()])
+    assert await retry_async(call, FAST) == "ok"
+    assert len(calls) == 3
+
+@pytest.mark.asyncio
+async def test_permanent_errors_fail_immediately():
+    """Test caller errors are not retried"""
+    call, calls = flaky([ValueError("bad input")])
+    with pytest.raises(ValueError):
+        await retry_async(call, FAST)
+    assert len(calls) == 1
+
+@pytest.mark.asyncio
+async def test_breaker_fails_fast_and_probes():
+    """Test a lost device opens the circuit until a probe succeeds"""
+    healthy = asyncio.Event()
+
+    async def probe():
+        return healthy.is_set()
+
+    breaker = CircuitBreaker("device", reset_timeout=0.05, probe=probe)
+    call, calls = flaky([DeviceLostError("gone")])
+
+    with pytest.raises(DeviceLostError):
+        await retry_async(call, FAST, breaker)
+    assert breaker.state == CircuitState.OPEN
+
+    with pytest.raises(CircuitOpenError):
+        await retry_async(call, FAST, breaker)
+    assert len(calls) == 1
+
+    healthy.set()
+    await asyncio.sleep(0.15)
+    assert breaker.state == CircuitState.CLOSED
+    assert await retry_async(call, FAST, breaker) == "ok"
+
+def test_missing_files_and_permissions_are_permanent():
+    """Test OSErrors a retry cannot fix are not treated as transient"""
+    assert classify(FileNotFoundError("screenshot.png")) == ErrorClass.PERMANENT
+    assert classify(PermissionError("screen recording denied")) == ErrorClass.PERMANENT
+    assert classify(ConnectionResetError()) == ErrorClass.TRANSIENT
+
+@pytest.mark.asyncio
+async def test_failure_after_input_is_not_retried():
+    """Test a screenshot failing after a click does not repeat the click"""
+    clicks = []
+    screenshot, _ = flaky([TimeoutError("capture")])
+
+    async def click():
+        clicks.append(1)
+        return await after_input(screenshot())
+
+    with pytest.raises(InputDeliveredError) as info:
+        await retry_async(click, FAST)
+    assert len(clicks) == 1
+    assert classify(info.value) == ErrorClass.TRANSIENT
+
+@pytest.mark.asyncio
+async def test_decorator_retries_the_exceptions_it_lists():
+    """Test with_retries keeps its contract for errors classify() calls permanent"""
+    call, calls = flaky([ValueError("bad frame"), ValueError("bad frame")])
+    retried = with_retries(retries=3, delay=0.01, exceptions=(ValueError,))(call)
+    assert await retried() == "ok"
+    assert len(calls) == 3
+
+    call, calls = flaky([TimeoutError()])
+    with pytest.raises(TimeoutError):
+        await with_retries(retries=3, delay=0.01, exceptions=(ValueError,))(call)()
+    assert len(calls) == 1
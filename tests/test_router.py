@@ -0,0 +1,205 @@
+"""Provider router tests against local stand-in endpoints"""
+
+import asyncio
+import json
+
+import pytest
+from anthropic import AsyncAnthropic
+
+from src.api.router import ProviderRouter
+from src.config import APIProvider
+
+def sse(event: str, data: dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+
+def message_events(text: str) -> list[bytes]:
+    """Minimal Messages API stream for a text reply"""
+    return [
+        sse("message_start", {"type": "message_start", "message": {
+            "id": "msg_1", "type": "message", "role": "assistant", "model": "m",
+            "content": [], "stop_reason": None, "stop_sequence": None,
+            "usage": {"input_tokens": 10, "output_tokens": 0},
+        }}),
+        sse("content_block_start", {"type": "content_block_start", "index": 0,
+            "content_block": {"type": "text", "text": ""}}),
+        sse("content_block_delta", {"type": "content_block_delta", "index": 0,
+            "delta": {"type": "text_delta", "text": text}}),
+        sse("content_block_stop", {"type": "content_block_stop", "index": 0}),
+        sse("message_delta", {"type": "message_delta",
+            "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+            "usage": {"output_tokens": 1}}),
+        sse("message_stop", {"type": "message_stop"}),
+    ]
+
+class StandInEndpoint:
+    """Local Messages API endpoint with injected latency or failures"""
+
+    def __init__(
+        self,
+        name: str,
+        latency: float = 0.0,
+        status: int = 200,
+        token_latency: float = 0.0,
+    ):
+        self.name = name
+        self.latency = latency
+        self.status = status
+        self.token_latency = token_latency  # Between message_start and the text
+        self.requests = 0
+        self.server = None
+
+    async def start(self) -> str:
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        port = self.server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}"
+
+    async def stop(self):
+        self.server.close()
+
+    async def _handle(self, reader, writer):
+        headers = (await reader.readuntil(b"\r\n\r\n")).decode().lower()
+        length = int(headers.split("content-length:")[1].split("\r\n")[0])
+        await reader.readexactly(length)
+        self.requests += 1
+
+        try:
+            await asyncio.sleep(self.latency)
+            if self.status != 200:
+                body = json.dumps({"type": "error", "error": {
+                    "type": "overloaded_error", "message": "overloaded"}}).encode()
+                writer.write(
+                    f"HTTP/1.1 {self.status} Error\r\ncontent-type: application/json\r\n"
+                    f"content-length: {len(body)}\r\nconnection: close\r\n\r\n".encode()
+                    + body
+                )
+            else:
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\ncontent-type: text/event-stream\r\n"
+                    b"connection: close\r\n\r\n"
+                )
+                start, *rest = message_events(self.name)
+                writer.write(start)
+                await writer.drain()
+                await asyncio.sleep(self.token_latency)
+                for chunk in rest:
+                    writer.write(chunk)
+            await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+async def make_router(endpoints: dict[APIProvider, StandInEndpoint], **kwargs):
+    clients = {}
+    for provider, endpoint in endpoints.items():
+        clients[provider] = AsyncAnthropic(
+            api_key="test",
+            base_url=await endpoint.start(),
+            max_retries=0,
+        )
+    return ProviderRouter(clients, models={p: "test-model" for p in clients}, **kwargs)
+
+async def reply(router: ProviderRouter) -> str:
+    text = ""
+    messages = [{"role": "user", "content": "hi"}]
+    async for event in router.stream(max_tokens=10, messages=messages):
+        if event.type == "content_block_delta":
+            text += event.delta.text
+    return text
+
+@pytest.mark.asyncio
+async def test_routes_to_fastest_provider():
+    """Test requests settle on the provider with the lowest latency"""
+    endpoints = {
+        APIProvider.ANTHROPIC: StandInEndpoint("slow", latency=0.3),
+        APIProvider.BEDROCK: StandInEndpoint("fast", latency=0.01),
+    }
+    router = await make_router(endpoints)
+
+    replies = [await reply(router) for _ in range(4)]
+
+    assert replies[-2:] == ["fast", "fast"]
+    assert router.ranked()[0] == APIProvider.BEDROCK
+    for endpoint in endpoints.values():
+        await endpoint.stop()
+
+@pytest.mark.asyncio
+async def test_hedges_slow_primary():
+    """Test a hedge request wins when the primary stalls past its deadline"""
+    endpoints = {
+        APIProvider.ANTHROPIC: StandInEndpoint("stalled", latency=2.0),
+        APIProvider.BEDROCK: StandInEndpoint("hedge", latency=0.01),
+    }
+    router = await make_router(endpoints, hedge=True, default_deadline=0.1)
+    router.stats[APIProvider.BEDROCK].record_success(0.5)  # Rank it second
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    assert await reply(router) == "hedge"
+    assert loop.time() - start < 1.0
+    assert endpoints[APIProvider.BEDROCK].requests == 1
+    for endpoint in endpoints.values():
+        await endpoint.stop()
+
+@pytest.mark.asyncio
+async def test_hedges_on_first_token_not_message_start():
+    """Test a primary that starts the message but stalls before output is hedged"""
+    endpoints = {
+        APIProvider.ANTHROPIC: StandInEndpoint("stalled", token_latency=2.0),
+        APIProvider.BEDROCK: StandInEndpoint("hedge", latency=0.01),
+    }
+    router = await make_router(endpoints, hedge=True, default_deadline=0.1)
+    router.stats[APIProvider.BEDROCK].record_success(0.5)
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    assert await reply(router) == "hedge"
+    assert loop.time() - start < 1.0
+    assert endpoints[APIProvider.BEDROCK].requests == 1
+    for endpoint in endpoints.values():
+        await endpoint.stop()
+
+@pytest.mark.asyncio
+async def test_fails_over_on_error():
+    """Test an erroring provider is skipped and put in cooldown"""
+    endpoints = {
+        APIProvider.ANTHROPIC: StandInEndpoint("down", status=529),
+        APIProvider.BEDROCK: StandInEndpoint("up"),
+    }
+    router = await make_router(endpoints)
+
+    assert await reply(router) == "up"
+    assert await reply(router) == "up"
+    assert not router.stats[APIProvider.ANTHROPIC].healthy
+    for endpoint in endpoints.values():
+        await endpoint.stop()
+
+@pytest.mark.asyncio
+async def test_clients_are_built_per_loop():
+    """Test sessions on their own loops get their own clients and share statistics"""
+    endpoint = StandInEndpoint("only", latency=0.01)
+    url = await endpoint.start()
+    built = []
+
+    def create(provider):
+        client = AsyncAnthropic(api_key="test", base_url=url, max_retries=0)
+        built.append(client)
+        return client
+
+    router = ProviderRouter(
+        create,
+        models={APIProvider.ANTHROPIC: "test-model"},
+        providers=[APIProvider.ANTHROPIC],
+    )
+
+    async def two_replies():
+        return [await reply(router), await reply(router)]
+
+    sessions = await asyncio.gather(*(
+        asyncio.to_thread(asyncio.run, two_replies()) for _ in range(2)
+    ))
+
+    assert sessions == [["only", "only"], ["only", "only"]]
+    assert len(built) == 2
+    assert len(router.stats[APIProvider.ANTHROPIC].ttft) == 4
+    await endpoint.stop()
@@ -0,0 +1,154 @@
+"""Per-device action scheduler tests"""
+
+import asyncio
+import threading
+
+import pytest
+
+from src.api.ratelimit import Priority
+from src.tools.scheduler import ActionScheduler
+
+async def act(scheduler, log, session, priority=Priority.INTERACTIVE, hold=0.01):
+    async with scheduler.turn(session, priority):
+        log.append(f"{session} start")
+        await asyncio.sleep(hold)
+        log.append(f"{session} end")
+
+@pytest.mark.asyncio
+async def test_actions_never_interleave():
+    """Test concurrent sessions run one action at a time"""
+    scheduler = ActionScheduler("mac", lease_time=0)
+    log = []
+    await asyncio.gather(*(act(scheduler, log, f"s{i}") for i in range(4)))
+
+    assert len(log) == 8
+    for start, end in zip(log[::2], log[1::2]):
+        assert start.split()[0] == end.split()[0]
+    assert scheduler.metrics()["granted"] == 4
+    assert scheduler.metrics()["wait_max"] > 0
+
+@pytest.mark.asyncio
+async def test_focus_lease_keeps_a_session_sequence_together():
+    """Test the holder's next action goes before an equal-priority session"""
+    scheduler = ActionScheduler("mac", lease_time=0.2)
+    log = []
+    await act(scheduler, log, "a")
+
+    other = asyncio.create_task(act(scheduler, log, "b"))
+    await asyncio.sleep(0.02)
+    assert log == ["a start", "a end"]  # b waits out a's lease
+    await act(scheduler, log, "a")
+    await other
+    assert log[2:] == ["a start", "a end", "b start", "b end"]
+    assert scheduler.lease.session_id == "b"
+
+@pytest.mark.asyncio
+async def test_interactive_preempts_batch_at_action_boundary():
+    """Test higher priority takes the device once the running action ends"""
+    scheduler = ActionScheduler("mac", lease_time=10)
+    log = []
+    batch = asyncio.create_task(act(scheduler, log, "batch", Priority.BATCH, hold=0.05))
+    await asyncio.sleep(0.01)
+    queued = asyncio.create_task(act(scheduler, log, "batch", Priority.BATCH))
+    interactive = asyncio.create_task(act(scheduler, log, "user"))
+    await asyncio.gather(batch, interactive)
+    scheduler.release_focus("user")  # As the client does when its task ends
+    await queued
+
+    assert log == [
+        "batch start", "batch end",
+        "user start", "user end",
+        "batch start", "batch end",
+    ]
+    assert scheduler.preemptions == 1
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_leaves_the_queue():
+    scheduler = ActionScheduler("mac", lease_time=0)
+    log = []
+    holder = asyncio.create_task(act(scheduler, log, "a", hold=0.05))
+    await asyncio.sleep(0.01)
+    waiter = asyncio.create_task(act(scheduler, log, "b"))
+    await asyncio.sleep(0.01)
+    waiter.cancel()
+    await holder
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert scheduler.queue_depth == 0
+    assert scheduler.active is None
+
+@pytest.mark.asyncio
+async def test_release_focus_lets_others_in_immediately():
+    scheduler = ActionScheduler("mac", lease_time=10)
+    log = []
+    await act(scheduler, log, "a")
+    assert not scheduler.available_to("b")
+    scheduler.release_focus("a")
+    assert scheduler.available_to("b")
+    await asyncio.wait_for(act(scheduler, log, "b"), timeout=1)
+
+@pytest.mark.asyncio
+async def test_try_turn_holds_the_device_or_backs_off():
+    """Test a turn taken without waiting keeps others out and keeps the lease"""
+    scheduler = ActionScheduler("mac", lease_time=10)
+    log = []
+    async with scheduler.try_turn("a") as turn:
+        assert turn is not None
+        other = asyncio.create_task(act(scheduler, log, "b"))
+        await asyncio.sleep(0.01)
+        assert log == []  # b waits while a prepares
+        async with scheduler.try_turn("c") as busy:
+            assert busy is None
+
+    await asyncio.sleep(0.01)
+    assert log == []  # a keeps focus for the action it prepared
+    await act(scheduler, log, "a")
+    scheduler.release_focus("a")
+    await asyncio.wait_for(other, timeout=1)
+    assert log == ["a start", "a end", "b start", "b end"]
+
+    async with scheduler.try_turn("a") as turn:
+        assert turn is None  # b holds the lease now
+
+@pytest.mark.asyncio
+async def test_lease_yields_after_its_action_cap():
+    """Test a busy holder cannot starve a waiting session of the same priority"""
+    scheduler = ActionScheduler("mac", lease_time=0.2, lease_actions=3)
+    log = []
+    await act(scheduler, log, "a")
+    other = asyncio.create_task(act(scheduler, log, "b"))
+    await asyncio.sleep(0.01)
+    for _ in range(4):
+        await act(scheduler, log, "a")
+    await other
+
+    starts = [entry.split()[0] for entry in log if entry.endswith("start")]
+    # b then keeps its own lease, so a resumes once it runs out
+    assert starts == ["a", "a", "a", "b", "a", "a"]
+
+def test_sessions_on_separate_loops_share_a_device():
+    """Test sessions running on their own loop threads are woken and never overlap"""
+    scheduler = ActionScheduler("mac", lease_time=0.05)
+    log = []
+    errors = []
+
+    def session(name: str):
+        async def steps():
+            for _ in range(5):
+                await act(scheduler, log, name, hold=0.005)
+        try:
+            asyncio.run(asyncio.wait_for(steps(), timeout=10))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=session, args=(f"s{i}",)) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert len(log) == 30
+    for start, end in zip(log[::2], log[1::2]):
+        assert start.split()[0] == end.split()[0]
+    assert scheduler.active is None
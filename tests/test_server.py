@@ -0,0 +1,161 @@
+"""Session server tests with a fake agent backend"""
+
+import asyncio
+import json
+
+import pytest
+
+from src.server.http import AgentServer
+from src.server.sessions import EventChannel, SessionManager
+
+class FakeAgent:
+    """Agent that echoes the task as streamed text"""
+
+    def __init__(self, session):
+        self.channel = session.channel
+        self.closed = False
+
+    async def send_message(self, message: str):
+        for end in range(1, len(message) + 1):
+            self.channel.publish("content", {"text": message[:end]})
+            await asyncio.sleep(0)
+
+    def close(self):
+        self.closed = True
+
+async def fake_factory(session) -> FakeAgent:
+    return FakeAgent(session)
+
+async def request(port: int, method: str, path: str, body: dict = None) -> tuple[int, dict]:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    payload = json.dumps(body).encode() if body is not None else b""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nhost: test\r\ncontent-length: {len(payload)}\r\n\r\n".encode()
+        + payload
+    )
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, data = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(data) if data else {}
+
+async def read_events(reader: asyncio.StreamReader, until: str) -> list[tuple[str, dict]]:
+    """Read SSE frames until an event of the given type"""
+    await reader.readuntil(b"\r\n\r\n")
+    events = []
+    while True:
+        frame = (await reader.readuntil(b"\n\n")).decode()
+        fields = dict(line.split(": ", 1) for line in frame.strip().split("\n"))
+        events.append((fields["event"], json.loads(fields["data"])))
+        if fields["event"] == until:
+            return events
+
+@pytest.mark.asyncio
+async def test_sessions_stream_task_events():
+    """Test a session runs tasks and streams their events, within limits"""
+    server = AgentServer(SessionManager(fake_factory, max_sessions=2), port=0)
+    port = await server.start()
+    try:
+        status, body = await request(port, "POST", "/sessions")
+        assert status == 201
+        session_id = body["session_id"]
+        assert (await request(port, "POST", "/sessions"))[0] == 201
+        assert (await request(port, "POST", "/sessions"))[0] == 429
+
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(f"GET /sessions/{session_id}/events HTTP/1.1\r\n\r\n".encode())
+        status, body = await request(port, "POST", f"/sessions/{session_id}/tasks", {"task": "hello"})
+        assert status == 202
+
+        events = await read_events(reader, "task_finished")
+        writer.close()
+        assert events[-1][1] == {"task_id": body["task_id"], "status": "completed", "error": None}
+        assert ("content", {"text": "hello"}) in events
+
+        status, _ = await request(port, "POST", f"/sessions/{session_id}/tasks", {})
+        assert status == 400
+        assert (await request(port, "DELETE", f"/sessions/{session_id}"))[0] == 204
+        assert (await request(port, "GET", "/health"))[1]["sessions"] == 1
+    finally:
+        await server.stop()
+
+@pytest.mark.asyncio
+async def test_idle_sessions_are_evicted():
+    """Test sessions without work are closed after the idle timeout"""
+    sessions = SessionManager(fake_factory, idle_timeout=0.05)
+    session = await sessions.create()
+    await asyncio.sleep(0.2)
+    assert session.id not in sessions.sessions
+    assert sessions.evicted == 1
+    assert session.agent.closed
+    await sessions.close_all()
+
+@pytest.mark.asyncio
+async def test_channel_holds_producer_until_subscriber_catches_up():
+    """Test backpressure pauses producers and text updates are coalesced"""
+    channel = EventChannel(maxsize=8, high_water=0.5)
+    channel.attach()
+    for step in range(4):
+        channel.publish("tool_result", {"step": step})
+        channel.publish("content", {"text": "a" * step})
+        channel.publish("content", {"text": "b" * step})
+
+    waiter = asyncio.create_task(channel.writable())
+    await asyncio.sleep(0.01)
+    assert not waiter.done()
+
+    received = [await channel.get() for _ in range(5)]
+    await asyncio.wait_for(waiter, 1)
+    assert [event.type for event in received[:2]] == ["tool_result", "content"]
+    assert received[1].data == {"text": ""}
+    assert received[3].data == {"text": "b"}
+
+@pytest.mark.asyncio
+async def test_channel_without_subscriber_never_blocks_and_keeps_outcomes():
+    """Test producers run on while nobody reads, and task outcomes survive overflow"""
+    channel = EventChannel(maxsize=4, high_water=0.5)
+    channel.publish("task_finished", {"task_id": "a", "status": "completed"})
+    for step in range(10):
+        channel.publish("tool_result", {"step": step})
+        await asyncio.wait_for(channel.writable(), 0.1)
+
+    assert len(channel.events) == 4
+    assert channel.events[0].type == "task_finished"
+    assert channel.dropped == 7
+
+    channel.attach()
+    waiter = asyncio.create_task(channel.writable())
+    await asyncio.sleep(0.01)
+    assert not waiter.done()
+    channel.detach()
+    await asyncio.wait_for(waiter, 1)
+
+@pytest.mark.asyncio
+async def test_slow_request_times_out():
+    """Test a client that never finishes its request is answered and dropped"""
+    server = AgentServer(SessionManager(fake_factory), port=0, read_timeout=0.05)
+    port = await server.start()
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"GET /health HTTP/1.1\r\n")
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), 1)
+        assert response.startswith(b"HTTP/1.1 408")
+        writer.close()
+    finally:
+        await server.stop()
+
+@pytest.mark.asyncio
+async def test_bad_content_length_is_a_client_error():
+    server = AgentServer(SessionManager(fake_factory), port=0)
+    port = await server.start()
+    try:
+        for length in (b"abc", b"-5", b""):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"POST /sessions HTTP/1.1\r\ncontent-length: " + length + b"\r\n\r\n")
+            await writer.drain()
+            response = await asyncio.wait_for(reader.read(), 1)
+            assert response.startswith(b"HTTP/1.1 400"), length
+            writer.close()
+    finally:
+        await server.stop()
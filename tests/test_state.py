@@ -0,0 +1,82 @@
+"""Device state bus tests"""
+
+import asyncio
+
+import pytest
+
+from src.tools.device_manager import DeviceManager
+from src.utils.state import DeviceStatus, StateManager
+
+@pytest.mark.asyncio
+async def test_transitions_are_pushed_and_recorded():
+    """Test subscribers get transitions and history stays bounded"""
+    state = StateManager(history_size=3)
+    subscription = state.subscribe(["ios"])
+
+    state.update_mac_state(DeviceStatus.CONNECTED)
+    state.update_ios_state(DeviceStatus.CONNECTING)
+    state.update_ios_state(DeviceStatus.CONNECTED)
+    state.update_ios_state(DeviceStatus.CONNECTED)  # No change, no transition
+
+    first = await subscription.get()
+    second = await subscription.get()
+    assert (first.status, second.status) == (DeviceStatus.CONNECTING, DeviceStatus.CONNECTED)
+    assert second.previous == DeviceStatus.CONNECTING
+    assert subscription.queue.empty()
+
+    state.update_ios_state(DeviceStatus.ERROR, "gone")
+    assert len(state.history) == 3
+    assert [s.status for s in state.transitions("ios")][-1] == DeviceStatus.ERROR
+
+@pytest.mark.asyncio
+async def test_heartbeat_detects_dead_device():
+    """Test missed heartbeats mark a connected device as failed"""
+    manager = DeviceManager()
+    alive = True
+
+    async def probe() -> bool:
+        return alive
+
+    manager.register_probe("mac", probe, interval=0.01)
+    manager.state.update_mac_state(DeviceStatus.CONNECTED)
+    manager.start_heartbeats()
+    try:
+        await asyncio.sleep(0.05)
+        assert manager.state.mac_state.is_active
+
+        alive = False
+        failed = await manager.state.wait_for("mac", DeviceStatus.ERROR, timeout=1)
+        assert failed.error == "Heartbeat lost"
+    finally:
+        manager.stop_heartbeats()
+
+@pytest.mark.asyncio
+async def test_heartbeat_survives_failed_reconnects(monkeypatch):
+    """Test a reconnect that raises keeps probing and the device recovers"""
+    manager = DeviceManager()
+    monkeypatch.setattr(type(manager.ios_connection), "is_configured", property(lambda self: True))
+    reconnects = []
+
+    async def reconnect(device_type: str) -> bool:
+        reconnects.append(device_type)
+        raise RuntimeError("appium down")
+
+    manager.ensure_device_ready = reconnect
+    alive = False
+
+    async def probe() -> bool:
+        return alive
+
+    manager.register_probe("ios", probe, interval=0.01)
+    manager.state.update_ios_state(DeviceStatus.CONNECTED)
+    manager.start_heartbeats()
+    try:
+        await manager.state.wait_for("ios", DeviceStatus.ERROR, timeout=1)
+        await asyncio.sleep(0.05)
+        assert len(reconnects) > 1
+        assert not manager.heartbeats["ios"].task.done()
+
+        alive = True
+        await manager.state.wait_for("ios", DeviceStatus.CONNECTED, timeout=1)
+    finally:
+        manager.stop_heartbeats()
@@ -0,0 +1,136 @@
+"""Text entry engine tests with a fake keyboard and clipboard"""
+
+import pytest
+
+from src.tools.base import ToolError
+from src.tools.text_entry import Clipboard, IOSTextEntry, TextEntry, parse_keys
+
+class FakeKeyboard:
+    def __init__(self):
+        self.events = []
+
+    def write(self, message, interval=0.0):
+        self.events.append(("write", message))
+
+    def press(self, keys):
+        self.events.append(("press", keys))
+
+    def hotkey(self, *keys):
+        self.events.append(("hotkey", keys))
+
+class FakeClipboard(Clipboard):
+    def __init__(self, contents="saved"):
+        self.contents = contents
+        self.history = []
+
+    @property
+    def available(self):
+        return True
+
+    def get(self):
+        return self.contents
+
+    def set(self, text):
+        self.history.append(text)
+        self.contents = text
+
+def engine(threshold=10):
+    return TextEntry(
+        FakeKeyboard(),
+        FakeClipboard(),
+        paste_threshold=threshold,
+        paste_modifier="command",
+        paste_settle=0,
+    )
+
+def test_parse_chords_and_sequences():
+    """Test chords, aliases and sequences in one spec"""
+    assert parse_keys("cmd+shift+t tab Return") == [
+        ("command", "shift", "t"), ("tab",), ("enter",)
+    ]
+    assert parse_keys("cmd++") == [("command", "+")]
+    with pytest.raises(ToolError):
+        parse_keys("cmd+")
+    with pytest.raises(ToolError):
+        parse_keys("ctrl+shift")
+    with pytest.raises(ToolError):
+        parse_keys("   ")
+
+@pytest.mark.asyncio
+async def test_short_text_is_typed():
+    entry = engine()
+    assert await entry.type("hello") == "typed"
+    assert entry.keyboard.events == [("write", "hello")]
+    assert entry.clipboard.history == []
+
+@pytest.mark.asyncio
+async def test_long_and_unicode_text_is_pasted_and_clipboard_restored():
+    """Test the paste path leaves the user's clipboard as it found it"""
+    entry = engine()
+    assert await entry.type("a much longer sentence") == "pasted"
+    assert await entry.type("café") == "pasted"
+    assert entry.keyboard.events == [("hotkey", ("command", "v"))] * 2
+    assert entry.clipboard.history == ["a much longer sentence", "saved", "café", "saved"]
+
+class BrokenClipboard(FakeClipboard):
+    """Clipboard whose writes fail from a given write on"""
+
+    def __init__(self, fail_from: int):
+        super().__init__()
+        self.fail_from = fail_from
+
+    def set(self, text):
+        if len(self.history) + 1 >= self.fail_from:
+            raise OSError("xclip died")
+        super().set(text)
+
+@pytest.mark.asyncio
+async def test_clipboard_failures_never_enter_text_twice():
+    """Test only a failure before the paste falls back to typing"""
+    entry = engine()
+    entry.clipboard = BrokenClipboard(fail_from=1)
+    assert await entry.type("a much longer sentence") == "typed"
+    assert entry.keyboard.events == [("write", "a much longer sentence")]
+
+    entry = engine()
+    entry.clipboard = BrokenClipboard(fail_from=2)  # Only the restore fails
+    assert await entry.type("a much longer sentence") == "pasted"
+    assert entry.keyboard.events == [("hotkey", ("command", "v"))]
+
+@pytest.mark.asyncio
+async def test_every_path_is_safety_checked():
+    """Test unsafe text is refused before any key or clipboard event"""
+    entry = engine()
+    for call in (entry.type("sudo reboot"), entry.type("x" * 20 + " | sh"), entry.press("|")):
+        with pytest.raises(ToolError):
+            await call
+    assert entry.keyboard.events == []
+    assert entry.clipboard.history == []
+
+@pytest.mark.asyncio
+async def test_press_sends_chords_in_order():
+    entry = engine()
+    await entry.press("cmd+shift+t tab enter")
+    assert entry.keyboard.events == [
+        ("hotkey", ("command", "shift", "t")),
+        ("press", "tab"),
+        ("press", "enter"),
+    ]
+
+class FakeDriver:
+    def __init__(self):
+        self.scripts = []
+
+    def execute_script(self, script, args):
+        self.scripts.append((script, args))
+
+@pytest.mark.asyncio
+async def test_ios_sends_a_key_sequence_in_one_request():
+    """Test iOS chords map to XCUITest keys and modifier flags"""
+    driver = FakeDriver()
+    await IOSTextEntry(driver).press("cmd+a delete enter")
+    assert driver.scripts == [("mobile: keys", {"keys": [
+        {"key": "a", "modifierFlags": 1 << 4},
+        {"key": "\x7f", "modifierFlags": 0},
+        {"key": "\r", "modifierFlags": 0},
+    ]})]
@@ -0,0 +1,70 @@
+"""Streamed tool input and speculative preparation tests"""
+
+import json
+
+import pytest
+
+from src.api.tool_stream import PartialObject
+from src.tools.base import BaseAnthropicTool, Preparation, ToolResult
+
+def chunks(value: dict, size: int = 3) -> list[str]:
+    text = json.dumps(value)
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+def test_members_appear_as_they_complete():
+    """Test each member is exposed once its value has fully arrived"""
+    partial = PartialObject()
+    seen = []
+    for chunk in chunks({"action": "click", "position": [10, 20], "text": "a, {b}"}):
+        partial.feed(chunk)
+        members = partial.members()
+        if members and (not seen or members != seen[-1]):
+            seen.append(dict(members))
+
+    assert seen == [
+        {"action": "click"},
+        {"action": "click", "position": [10, 20]},
+        {"action": "click", "position": [10, 20], "text": "a, {b}"},
+    ]
+    assert partial.complete
+    assert partial.result()["text"] == "a, {b}"
+
+def test_escaped_quotes_do_not_end_strings():
+    """Test commas inside escaped strings are not member boundaries"""
+    partial = PartialObject()
+    partial.feed('{"text": "say \\"hi, there\\"",')
+    assert partial.members() == {"text": 'say "hi, there"'}
+
+def test_empty_input_is_an_empty_object():
+    assert PartialObject().result() == {}
+
+def test_preparation_matches_only_prepared_keys():
+    """Test differing unprepared keys still commit, differing prepared keys do not"""
+    preparation = Preparation({"action": "click", "position": [10, 20]})
+    assert preparation.matches({"action": "click", "position": [10, 20], "label": "OK"})
+    assert not preparation.matches({"action": "click", "position": [11, 20]})
+
+class FakeTool(BaseAnthropicTool):
+    """Tool that records calls"""
+    name = "fake"
+
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, **kwargs) -> ToolResult:
+        self.calls.append(kwargs)
+        return ToolResult(output="done")
+
+    def to_params(self):
+        return {"name": self.name}
+
+@pytest.mark.asyncio
+async def test_default_commit_runs_the_tool():
+    """Test tools without preparation steps behave as plain calls"""
+    tool = FakeTool()
+    assert await tool.prepare(action="click") is None
+
+    result = await tool.commit(Preparation({"action": "click"}), action="click")
+    assert result.output == "done"
+    assert tool.calls == [{"action": "click"}]
+    await tool.rollback(Preparation({"action": "click"}))
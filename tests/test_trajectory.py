@@ -0,0 +1,82 @@
+"""Trajectory cache tests"""
+
+import pytest
+from PIL import Image, ImageDraw
+
+from src.tools.base import ToolResult
+from src.tools.trajectory import TrajectoryCache, TrajectoryRecorder
+from src.utils.imaging import ImagePayload
+
+def make_screen(label: int) -> ImagePayload:
+    """Render a distinguishable fake screen"""
+    image = Image.new("RGB", (320, 200), "white")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((label * 40, 20, label * 40 + 60, 180), fill="black")
+    return ImagePayload.from_image(image)
+
+class FakeTools:
+    """Tool collection returning scripted screens"""
+
+    def __init__(self, screens: list[ImagePayload]):
+        self.screens = screens
+        self.calls = []
+
+    async def run(self, *, name, tool_input):
+        self.calls.append((name, tool_input))
+        return ToolResult(image=self.screens[len(self.calls) - 1])
+
+def record(cache: TrajectoryCache, task: str):
+    recorder = TrajectoryRecorder()
+    recorder.set_start("mac", ToolResult(image=make_screen(0)))
+    for label in (1, 2, 3):
+        recorder.record(
+            "mac",
+            {"action": "click", "position": (label, label)},
+            ToolResult(image=make_screen(label)),
+        )
+    cache.store(task, recorder)
+
+@pytest.mark.asyncio
+async def test_replay_full_hit():
+    """Test a matching screen replays every step"""
+    cache = TrajectoryCache()
+    record(cache, "Open Safari, go to settings")
+
+    trajectory = cache.lookup(
+        "open safari go to settings!", "mac",
+        cache.candidates("open safari go to settings")[0].start_fingerprint,
+    )
+    assert trajectory is not None
+
+    tools = FakeTools([make_screen(label) for label in (1, 2, 3)])
+    replay = await cache.replay(trajectory, tools)
+    cache.record_lookup("open safari go to settings", replay)
+
+    assert replay.completed and replay.steps_replayed == 3
+    assert cache.hit_rate == 1.0
+
+@pytest.mark.asyncio
+async def test_replay_stops_at_divergence():
+    """Test replay hands back control at the first mismatched screen"""
+    cache = TrajectoryCache()
+    record(cache, "open safari")
+    trajectory = cache.candidates("open safari")[0]
+
+    tools = FakeTools([make_screen(1), make_screen(5), make_screen(3)])
+    replay = await cache.replay(trajectory, tools)
+
+    assert not replay.completed
+    assert replay.diverged_at == 1
+    assert len(tools.calls) == 2
+
+def test_recordings_with_failed_steps_are_not_stored():
+    """Test a task whose tool calls failed is never cached for replay"""
+    cache = TrajectoryCache()
+    recorder = TrajectoryRecorder()
+    recorder.set_start("mac", ToolResult(image=make_screen(0)))
+    recorder.record("mac", {"action": "click", "position": (1, 1)}, ToolResult(image=make_screen(1)))
+    recorder.record("mac", {"action": "click", "position": (2, 2)}, ToolResult(error="Action failed"))
+
+    cache.store("open safari", recorder)
+    assert recorder.failures == 1
+    assert not cache.candidates("open safari")
@@ -0,0 +1,96 @@
+"""UI worker tests with a fake client"""
+
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+from PIL import Image
+
+from src.tools.base import ToolResult
+from src.ui.worker import AgentWorker, ThumbnailCache
+from src.utils.imaging import ImagePayload
+
+class FakeClient:
+    """Client that reports a reply and one screenshot"""
+
+    def __init__(self, on_content, on_tool_result):
+        self.on_content = on_content
+        self.on_tool_result = on_tool_result
+        self.threads = []
+
+    async def send_message(self, message: str):
+        self.threads.append(threading.current_thread())
+        self.on_content("Working")
+        await asyncio.sleep(0.01)
+        self.on_tool_result(ToolResult(image=screenshot()))
+        self.on_content(f"Done: {message}")
+
+    def close(self):
+        pass
+
+async def fake_factory(on_content, on_tool_result) -> FakeClient:
+    return FakeClient(on_content, on_tool_result)
+
+def screenshot() -> ImagePayload:
+    return ImagePayload.from_image(Image.new("RGB", (1280, 800), "navy"))
+
+def test_worker_runs_tasks_off_the_calling_thread():
+    """Test tasks run on the worker loop and events reach the queue"""
+    worker = AgentWorker(fake_factory)
+    try:
+        future = worker.submit("open notes")
+        assert worker.busy
+        future.result(timeout=5)
+
+        events = worker.drain()
+        assert [event.kind for event in events] == ["content", "tool_result", "content", "done"]
+        assert events[2].text == "Done: open notes"
+        assert worker.client.threads == [worker.thread]
+    finally:
+        worker.stop()
+
+class DeadTool:
+    name = "mac"
+
+    async def heartbeat(self) -> bool:
+        return False
+
+class ToolsClient(FakeClient):
+    """Client whose only device stops answering"""
+
+    def __init__(self, on_content, on_tool_result):
+        super().__init__(on_content, on_tool_result)
+        self.tools = SimpleNamespace(tools=[DeadTool()])
+
+async def tools_factory(on_content, on_tool_result) -> ToolsClient:
+    return ToolsClient(on_content, on_tool_result)
+
+def test_worker_reports_device_transitions():
+    """Test heartbeat transitions of the client's devices reach the page"""
+    worker = AgentWorker(tools_factory, heartbeat_interval=0.01)
+    try:
+        deadline = time.monotonic() + 5
+        events = []
+        while time.monotonic() < deadline:
+            events += worker.drain()
+            if any(event.output == "error" for event in events):
+                break
+            time.sleep(0.01)
+
+        assert [(event.kind, event.text, event.output) for event in events] == [
+            ("device", "mac", "connected"),
+            ("device", "mac", "error"),
+        ]
+        assert events[-1].error == "Heartbeat lost"
+    finally:
+        worker.stop()
+
+def test_thumbnails_are_cached_by_content():
+    """Test identical screenshots share one downscaled thumbnail"""
+    cache = ThumbnailCache(width=320, max_entries=2)
+    first, second = screenshot(), screenshot()
+    key = cache.put(first)
+    assert cache.put(second) == key
+    assert len(cache.entries) == 1
+    assert ImagePayload(cache.get(key)).open().size == (320, 200)